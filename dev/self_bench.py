@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+
+# Self-benchmark of BenchPRO's own hot paths
+# Generates a synthetic $BP_HOME with N build/bench cfgs, M installed apps and K pending results,
+# puts stub sacct/sbatch/squeue/lmod executables on PATH and a sqlite stand-in for psycopg2 on PYTHONPATH,
+# then times each command and appends the timings to a JSON history file for comparing releases.
+#
+# Usage: ./dev/self_bench.py [--cfgs N] [--apps M] [--results K] [--repeat R] [--history FILE]
+
+# System Imports
+import argparse
+import json
+import os
+import platform
+import shutil as su
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Paths
+dev_path        = os.path.dirname(os.path.abspath(__file__))
+site_path       = os.path.dirname(dev_path)
+benchpro_exe    = os.path.join(site_path, "src", "benchpro")
+
+system          = "selfbench"
+compiler        = "gcc/12.2.0"
+mpi             = "impi/21.9.0"
+app_table       = "results_application"
+result_table    = "results_result"
+
+# Commands to time: [label, args, settings overloads]
+cases = [["avail",       ["--avail"]],
+         ["listApps",    ["--listApps"]],
+         ["bench",       ["--bench", "self_bench", "--overload", "dry_run=True"]],
+         ["listResults", ["--listResults"]],
+         ["capture",     ["--capture"]]]
+
+# Write file, creating parent dirs
+def write(path, content, mode=0o644):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+    os.chmod(path, mode)
+
+# Label for item idx
+def label(prefix, idx):
+    return prefix + str(idx).zfill(4)
+
+# $BP_HOME/settings.ini covering every key read by BenchPRO
+def make_settings(bp_home):
+    write(os.path.join(bp_home, "settings.ini"), "\n".join([
+        "[common]",
+        "debug               = False",
+        "sl                  = /",
+        "tree_depth          = 6",
+        "timeout             = 0",
+        "sync_staging        = False",
+        "print_hint          = False",
+        "skip_result_check   = False",
+        "dry_run             = False",
+        "exit_on_missing     = False",
+        "overwrite           = False",
+        "check_modules       = False",
+        "check_exe           = True",
+        "cache_downloads     = False",
+        "prefer_local_files  = True",
+        "clean_on_fail       = False",
+        "apply_system_rules  = True",
+        "system_env          = $BP_SYSTEM",
+        "mpi_blacklist       = login1,login2",
+        "",
+        "[paths]",
+        "home_path           = $BP_HOME",
+        "build_path          = ./apps",
+        "bench_path          = ./results",
+        "log_dir             = ./log",
+        "config_dir          = ./config",
+        "template_dir        = ./templates",
+        "resource_dir        = ./resources",
+        "local_repo_env      = ./repo",
+        "collection_path     = ./collection",
+        "ssh_key             = ./id_rsa",
+        "scp_path            = ",
+        "ssh_user            = ",
+        "",
+        "[files]",
+        "build_cfg_dir       = build",
+        "bench_cfg_dir       = bench",
+        "sched_cfg_dir       = sched",
+        "rules_dir           = rules",
+        "build_tmpl_dir      = build",
+        "bench_tmpl_dir      = bench",
+        "sched_tmpl_dir      = sched",
+        "system_cfg_file     = system.cfg",
+        "arch_cfg_file       = arch.cfg",
+        "compile_cfg_file    = compile.cfg",
+        "compile_tmpl_file   = compile.template",
+        "header_file         = header.template",
+        "pid_dep_file        = pid_dep.template",
+        "build_job_file      = build.job",
+        "bench_job_file      = bench.job",
+        "build_report_file   = build_report.txt",
+        "bench_report_file   = bench_report.txt",
+        "build_log_file      = build",
+        "bench_log_file      = bench",
+        "results_log_file    = capture",
+        "output_file         = output.log",
+        "build_subdir        = build",
+        "install_subdir      = install",
+        "pending_subdir      = pending",
+        "captured_subdir     = captured",
+        "failed_subdir       = failed",
+        "hw_utils_subdir     = hw_utils",
+        "script_subdir       = scripts",
+        "result_scripts_dir  = results",
+        "",
+        "[builder]",
+        "build_mode          = sched",
+        "build_if_missing    = True",
+        "max_build_jobs      = 5",
+        "",
+        "[bencher]",
+        "bench_mode          = sched",
+        "local_mpi           = mpirun",
+        "sched_mpi           = ibrun",
+        "",
+        "[results]",
+        "db_host             = localhost",
+        "db_name             = benchpro",
+        "db_user             = benchpro",
+        "db_passwd           = benchpro",
+        "app_table           = " + app_table,
+        "result_table        = " + result_table,
+        "file_copy_handler   = cp",
+        "move_failed_result  = True",
+        ""]))
+
+    write(os.path.join(bp_home, "id_rsa"), "", 0o600)
+
+# System, arch, compiler and scheduler cfgs
+def make_system_cfgs(config_path):
+    write(os.path.join(config_path, "system.cfg"), "\n".join([
+        "[" + system + "]",
+        "sockets         = 2",
+        "cores           = 56",
+        "default_arch    = x86",
+        "default_sched   = slurm_" + system + ".cfg",
+        ""]))
+
+    write(os.path.join(config_path, "arch.cfg"), "\n".join([
+        "[x86]",
+        "gcc             = -O3 -march=native",
+        ""]))
+
+    write(os.path.join(config_path, "compile.cfg"), "\n".join([
+        "[gcc]",
+        "C               = gcc",
+        "CXX             = g++",
+        "FC              = gfortran",
+        ""]))
+
+    write(os.path.join(config_path, "sched", "slurm_" + system + ".cfg"), "\n".join([
+        "[sched]",
+        "type            = slurm",
+        "queue           = normal",
+        "account         = selfbench",
+        "runtime         = 00:30:00",
+        "threads         = 1",
+        ""]))
+
+# N build cfgs, N bench cfgs and a suite containing all benchmarks
+def make_app_cfgs(bp_home, config_path, num_cfgs, num_apps):
+    for idx in range(num_cfgs):
+        write(os.path.join(config_path, "build", label("app", idx) + ".cfg"), "\n".join([
+            "[general]",
+            "code            = " + label("app", idx),
+            "version         = 1.0",
+            "system          = " + system,
+            "",
+            "[modules]",
+            "compiler        = " + compiler,
+            "mpi             = " + mpi,
+            "",
+            "[config]",
+            "exe             = " + label("app", idx) + ".x",
+            "bin_dir         = bin",
+            ""]))
+
+        # Benchmarks run installed apps, sweeping nodes
+        write(os.path.join(config_path, "bench", label("bench", idx) + ".cfg"), "\n".join([
+            "[requirements]",
+            "code            = " + label("app", idx % max(num_apps, 1)),
+            "",
+            "[runtime]",
+            "nodes           = 1,2",
+            "ranks_per_node  = 56",
+            "threads         = 1",
+            "",
+            "[config]",
+            "dataset         = " + label("dataset", idx),
+            "bench_label     = " + label("bench", idx),
+            "",
+            "[result]",
+            "method          = expr",
+            "expr            = grep 'Result' [output_file] | cut -d ' ' -f 2",
+            "unit            = ns/day",
+            ""]))
+
+    write(os.path.join(bp_home, "suites.ini"), "\n".join([
+        "[suites]",
+        "self_bench = " + " ".join([label("bench", idx) for idx in range(num_cfgs)]),
+        ""]))
+
+# Script templates
+def make_templates(template_path, num_cfgs):
+    write(os.path.join(template_path, "sched", "slurm.template"), "\n".join([
+        "#SBATCH -J <<<job_label>>>",
+        "#SBATCH -o <<<stdout>>>",
+        "#SBATCH -e <<<stderr>>>",
+        "#SBATCH -p <<<queue>>>",
+        "#SBATCH -t <<<runtime>>>",
+        "#SBATCH -N <<<nodes>>>",
+        "#SBATCH -n <<<ranks>>>",
+        "#SBATCH -A <<<account>>>",
+        ""]))
+
+    for subdir in ["build", "bench"]:
+        write(os.path.join(template_path, subdir, "header.template"), "\n".join([
+            "export working_path=<<<working_path>>>",
+            ""]))
+
+    write(os.path.join(template_path, "compile.template"), "export CC=<<<C>>>\n")
+    write(os.path.join(template_path, "pid_dep.template"), "while kill -0 <<<pid>>>; do sleep 10; done\n")
+
+    for idx in range(num_cfgs):
+        write(os.path.join(template_path, "build", label("app", idx) + ".template"), "make -j 8 install\n")
+        write(os.path.join(template_path, "bench", label("bench", idx) + ".template"), \
+                                        "${mpi_exec} ${exe} -in <<<dataset>>>\n")
+
+# Build report for installed app
+def get_build_report(idx, app_path):
+    return {'username':     "selfbench",
+            'system':       system,
+            'code':         label("app", idx),
+            'version':      "1.0",
+            'build_label':  "default",
+            'compiler':     compiler,
+            'mpi':          mpi,
+            'module_use':   "",
+            'modules':      compiler + ", " + mpi,
+            'opt_flags':    "-O3 -march=native",
+            'bin_dir':      "bin",
+            'exe_file':     label("app", idx) + ".x",
+            'build_prefix': app_path,
+            'submit_time':  "2023-01-01 00:00:00.000000",
+            'script':       "build.job",
+            'exec_mode':    "sched",
+            'task_id':      str(100000 + idx),
+            'app_id':       "%040x" % (idx + 1),
+            'stdout':       "stdout.log",
+            'stderr':       "stderr.log"}
+
+# Write report dict sections in BenchPRO's key = value format
+def write_report(path, sections):
+    content = []
+    for section in sections:
+        content.append("[" + section + "]")
+        for key in sections[section]:
+            content.append(key.ljust(15) + "= " + sections[section][key])
+    write(path, "\n".join(content) + "\n")
+
+# M installed apps with exe, module and build report
+def make_apps(bp_home, num_apps):
+    for idx in range(num_apps):
+        app_dir  = os.path.join(system, "x86", "gcc12", "impi21", label("app", idx), "1.0", "default")
+        app_path = os.path.join(bp_home, "apps", app_dir)
+        write(os.path.join(app_path, "install", "bin", label("app", idx) + ".x"), "", 0o755)
+        write(os.path.join(bp_home, "apps", "modulefiles", app_dir + ".lua"), "")
+        write_report(os.path.join(app_path, "build_report.txt"), {'build': get_build_report(idx, app_path)})
+
+# K pending results with completed jobs and valid output
+def make_results(bp_home, num_apps, num_results):
+    for idx in range(num_results):
+        app = idx % max(num_apps, 1)
+        result_path = os.path.join(bp_home, "results", "pending", system + "_" + label("bench", idx) + "_001N_56R_01T_")
+
+        write(os.path.join(result_path, "stdout.log"), "START 2023-01-01T00:00:00 1672531200\n" + \
+                                                        "END 2023-01-01T00:10:00 1672531800\n")
+        write(os.path.join(result_path, "output.log"), "Result " + str(10 + idx) + ".5\n")
+
+        write_report(os.path.join(result_path, "bench_report.txt"),
+                    {'build':   get_build_report(app, ""),
+                     'bench':   {'bench_prefix': result_path,
+                                 'system':       system,
+                                 'launch_node':  "login1",
+                                 'nodes':        "1",
+                                 'ranks':        "56",
+                                 'threads':      "1",
+                                 'gpus':         "0",
+                                 'dataset':      label("dataset", idx),
+                                 'start_time':   "2023-01-01 00:00:00.000000",
+                                 'script':       "bench.job",
+                                 'exec_mode':    "sched",
+                                 'task_id':      str(200000 + idx),
+                                 'stdout':       "stdout.log",
+                                 'stderr':       "stderr.log"},
+                     'result':  {'method':       "expr",
+                                 'expr':         "grep 'Result' [output_file] | cut -d ' ' -f 2",
+                                 'unit':         "ns/day",
+                                 'description':  "",
+                                 'output_file':  "output.log"}})
+
+# Local DB stand-in with the application and result tables
+def make_db(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.execute("CREATE TABLE " + app_table + " (" + ", ".join([key + " TEXT" for key in get_build_report(0, "")]) + ")")
+    conn.execute("CREATE TABLE " + result_table + " (" + ", ".join([key + " TEXT" for key in
+                    ['username', 'system', 'submit_time', 'elapsed_time', 'end_time', 'capture_time', 'description',
+                     'exec_mode', 'task_id', 'job_status', 'nodelist', 'nodes', 'ranks', 'threads', 'gpus', 'dataset',
+                     'result', 'result_unit', 'resource_path', 'app_id']]) + ")")
+    conn.commit()
+    conn.close()
+
+# psycopg2 module backed by sqlite, enough of the API used by db_handler
+def make_db_shim(lib_path):
+    write(os.path.join(lib_path, "psycopg2", "__init__.py"), "\n".join([
+        "# sqlite stand-in for psycopg2, generated by dev/self_bench.py",
+        "import os",
+        "import re",
+        "import sqlite3",
+        "",
+        "Error = sqlite3.Error",
+        "",
+        "columns_query = re.compile(r\"SELECT column_name FROM INFORMATION_SCHEMA.COLUMNS WHERE table_name='(\\w+)'\", re.I)",
+        "",
+        "class cursor(object):",
+        "    def __init__(self, conn):",
+        "        self.cur = conn.cursor()",
+        "",
+        "    def execute(self, statement):",
+        "        match = columns_query.match(statement)",
+        "        if match:",
+        "            return self.cur.execute(\"SELECT name FROM pragma_table_info(?)\", (match.group(1),))",
+        "        return self.cur.execute(statement)",
+        "",
+        "    def fetchall(self):",
+        "        return self.cur.fetchall()",
+        "",
+        "    def close(self):",
+        "        self.cur.close()",
+        "",
+        "class connection(object):",
+        "    def __init__(self):",
+        "        self.conn = sqlite3.connect(os.environ['BP_SELF_BENCH_DB'])",
+        "",
+        "    def cursor(self):",
+        "        return cursor(self.conn)",
+        "",
+        "    def commit(self):",
+        "        self.conn.commit()",
+        "",
+        "    def close(self):",
+        "        self.conn.close()",
+        "",
+        "def connect(dbname=None, user=None, host=None, password=None):",
+        "    return connection()",
+        ""]))
+
+# Scheduler and Lmod stubs: every job has completed on one node, no jobs are active
+def make_stubs(bin_path):
+    write(os.path.join(bin_path, "sacct"), "\n".join([
+        "#!/bin/sh",
+        "case \"$*\" in",
+        "    *ExitCode*)",
+        "        for id in $(echo \"$*\" | sed 's/.*-j *\\([0-9,]*\\).*/\\1/' | tr ',' ' '); do",
+        "            echo \"$id|COMPLETED|c001-001|2024-01-01T00:00:00|2024-01-01T00:01:00|2024-01-01T00:11:00|600|01:30:00|56||36000|0:0\"",
+        "            echo \"$id.batch|COMPLETED|c001-001|2024-01-01T00:01:00|2024-01-01T00:01:00|2024-01-01T00:11:00|600|01:30:00|56|2048M|36000|0:0\"",
+        "        done ;;",
+        "    *NodeList*) printf 'NodeList\\nc001-001\\n' ;;",
+        "    *JobName*)  ;;",
+        "    *)          printf '     State \\n---------- \\n COMPLETED \\n' ;;",
+        "esac",
+        ""]), 0o755)
+
+    write(os.path.join(bin_path, "sbatch"), "#!/bin/sh\necho \"Submitted batch job $$\"\n", 0o755)
+    write(os.path.join(bin_path, "squeue"), "#!/bin/sh\n", 0o755)
+    write(os.path.join(bin_path, "lmod"), "#!/bin/sh\nprintf '" + compiler + "\\n" + mpi + "\\n' >&2\n", 0o755)
+
+# Generate complete synthetic $BP_HOME
+def make_tree(bp_home, num_cfgs, num_apps, num_results):
+    make_settings(bp_home)
+    make_system_cfgs(os.path.join(bp_home, "config"))
+    make_app_cfgs(bp_home, os.path.join(bp_home, "config"), num_cfgs, num_apps)
+    make_templates(os.path.join(bp_home, "templates"), num_cfgs)
+    make_apps(bp_home, num_apps)
+    make_results(bp_home, num_apps, num_results)
+    make_db(os.path.join(bp_home, "db.sqlite"))
+
+    for subdir in ["log", "repo", "collection", "results/captured", "results/failed", "apps/modulefiles"]:
+        os.makedirs(os.path.join(bp_home, subdir), exist_ok=True)
+
+    write(os.path.join(bp_home, ".version"), "BenchPRO v" + get_site_version() + "\n" + \
+                                                datetime.now().strftime("%Y-%m-%d") + "\n")
+    write(os.path.join(bp_home, ".validated"), "")
+
+# Site version from setup.py
+def get_site_version():
+    with open(os.path.join(site_path, "setup.py")) as f:
+        for line in f:
+            if "version" in line and "=" in line:
+                return line.split("=")[1].strip().strip(",").strip("\"'")
+    return "0.0.0"
+
+# Current git revision of site package
+def get_git_rev():
+    try:
+        return subprocess.run(["git", "-C", site_path, "rev-parse", "--short", "HEAD"], check=True,
+                                capture_output=True, universal_newlines=True).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return ""
+
+# Environment for benchpro commands
+def get_env(bp_home, bin_path, lib_path):
+    env = dict(os.environ)
+    env['BP_HOME']          = bp_home
+    env['BP_SYSTEM']        = system
+    env['BP_SITE']          = site_path
+    env['BP_SITE_VERSION']  = get_site_version()
+    env['BP_BUILD_ID']      = "selfbench"
+    env['BP_BUILD_DATE']    = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    env['BP_SELF_BENCH_DB'] = os.path.join(bp_home, "db.sqlite")
+    env['LMOD_DIR']         = bin_path
+    env['MODULEPATH']       = os.path.join(bp_home, "apps", "modulefiles")
+    env['PATH']             = bin_path + ":" + env.get('PATH', "")
+    env['PYTHONPATH']       = ":".join([site_path, lib_path] + [env['PYTHONPATH']] if env.get('PYTHONPATH') else [site_path, lib_path])
+    return env
+
+# Time one command on a fresh copy of the tree, returns elapsed seconds
+def run_case(args, tree_path, work_path, bin_path, lib_path, verbose):
+
+    bp_home = os.path.join(work_path, "bp_home")
+    if os.path.isdir(bp_home):
+        su.rmtree(bp_home)
+    su.copytree(tree_path, bp_home, symlinks=True)
+
+    env = get_env(bp_home, bin_path, lib_path)
+
+    start = time.perf_counter()
+    cmd = subprocess.run([sys.executable, benchpro_exe] + args, cwd=bp_home, env=env,
+                            capture_output=True, universal_newlines=True)
+    elapsed = time.perf_counter() - start
+
+    if verbose or cmd.returncode:
+        print(cmd.stdout)
+        print(cmd.stderr)
+    if cmd.returncode:
+        print("'benchpro " + " ".join(args) + "' failed with exit code " + str(cmd.returncode))
+        sys.exit(1)
+
+    return elapsed
+
+# Print timings alongside previous history entry
+def print_results(entry, previous):
+    print()
+    print("Self-benchmark " + entry['version'] + " " + entry['git_rev'] + " (seconds, min of " + str(entry['repeat']) + "):")
+    for case in entry['cases']:
+        line = "  " + case.ljust(16) + "{:8.3f}".format(entry['cases'][case]['min'])
+        if previous and case in previous['cases']:
+            prev = previous['cases'][case]['min']
+            line += "   was " + "{:8.3f}".format(prev) + " (" + previous['version'] + " " + previous['git_rev'] + ")" + \
+                    "{:+8.1f}%".format(100 * (entry['cases'][case]['min'] - prev) / prev)
+        print(line)
+
+# Get cmdline arguments
+def get_arguments():
+    parser = argparse.ArgumentParser(description="Time BenchPRO commands against a synthetic $BP_HOME.")
+    parser.add_argument("--cfgs",    default=50,  type=int, help="Number of build and bench cfg files.")
+    parser.add_argument("--apps",    default=50,  type=int, help="Number of installed applications.")
+    parser.add_argument("--results", default=200, type=int, help="Number of pending results.")
+    parser.add_argument("--repeat",  default=3,   type=int, help="Number of runs per command, minimum is reported.")
+    parser.add_argument("--history", default=os.path.join(dev_path, "self_bench_history.json"),
+                        help="JSON history file timings are appended to.")
+    parser.add_argument("--keep",    default=False, action='store_true', help="Keep generated $BP_HOME.")
+    parser.add_argument("--verbose", default=False, action='store_true', help="Print output of each command.")
+    return parser.parse_args()
+
+def main():
+    args = get_arguments()
+
+    work_path = tempfile.mkdtemp(prefix="bp_self_bench_")
+    tree_path = os.path.join(work_path, "tree")
+    bin_path  = os.path.join(work_path, "bin")
+    lib_path  = os.path.join(work_path, "lib")
+
+    print("Generating $BP_HOME in " + work_path + ": " + str(args.cfgs) + " cfgs, " + str(args.apps) + \
+            " apps, " + str(args.results) + " results")
+    make_tree(tree_path, args.cfgs, args.apps, args.results)
+    make_stubs(bin_path)
+    make_db_shim(lib_path)
+
+    entry = {'version':  get_site_version(),
+             'git_rev':  get_git_rev(),
+             'time':     datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+             'host':     socket.gethostname(),
+             'python':   platform.python_version(),
+             'cfgs':     args.cfgs,
+             'apps':     args.apps,
+             'results':  args.results,
+             'repeat':   args.repeat,
+             'cases':    {}}
+
+    try:
+        for case, cmd_args in cases:
+            runs = [run_case(cmd_args, tree_path, work_path, bin_path, lib_path, args.verbose) for i in range(args.repeat)]
+            entry['cases'][case] = {'min':      min(runs),
+                                    'median':   statistics.median(runs),
+                                    'runs':     runs}
+            print("  " + case.ljust(16) + "{:8.3f}".format(min(runs)))
+
+    finally:
+        if not args.keep:
+            su.rmtree(work_path)
+
+    # Append to history
+    history = []
+    if os.path.isfile(args.history):
+        with open(args.history) as f:
+            history = json.load(f)
+
+    # Compare against last run with same tree size
+    previous = None
+    for prev in reversed(history):
+        if [prev[key] for key in ['cfgs', 'apps', 'results']] == [args.cfgs, args.apps, args.results]:
+            previous = prev
+            break
+
+    history.append(entry)
+    with open(args.history, 'w') as f:
+        json.dump(history, f, indent=1)
+
+    print_results(entry, previous)
+    print("History written to " + args.history)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# Result capture: watch mode retries, accounting records of jobs still completing, result bundles
+# Run from the package root: python -m pytest dev/tests
+
+# System Imports
+import os
+import shutil as su
+import sys
+import tempfile
+import time
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# Local Imports
+import src.library.sched_handler as sched_handler
+import src.result_manager as result_manager
+import src.staging as staging
+
+class Msg(object):
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+# inotify stand-in: every wait reports the result dir moved back into pending, as release_claim does
+class Watch(object):
+    def __init__(self, glob, waits, on_wait=None):
+        self.glob = glob
+        self.fd = 0
+        self.waits = waits
+        self.on_wait = on_wait
+
+    def start(self):
+        return True
+
+    def add(self, path):
+        pass
+
+    def remove(self, path):
+        pass
+
+    def stop(self):
+        pass
+
+    def wait(self, timeout):
+        if not self.waits:
+            raise KeyboardInterrupt
+        self.waits -= 1
+        if self.on_wait:
+            self.on_wait(self.waits)
+        return [[self.glob.stg['pending_path'], name, True] for name in os.listdir(self.glob.stg['pending_path'])]
+
+class Lib(object):
+    def __init__(self, glob):
+        self.glob = glob
+        self.msg = Msg()
+
+    def get_pending_results(self):
+        return sorted(os.listdir(self.glob.stg['pending_path']))
+
+    def read_done_marker(self, result_path):
+        path = os.path.join(result_path, self.glob.stg['done_marker'])
+        return {'status': "0"} if os.path.isfile(path) else None
+
+    def rel_path(self, path):
+        return path
+
+class Glob(object):
+    def __init__(self, pending_path):
+        self.stg = {'pending_path': pending_path, 'watch_interval': 60, 'done_marker': ".bp_done"}
+        self.lib = Lib(self)
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.pending = tempfile.mkdtemp()
+        self.glob = Glob(self.pending)
+        result_manager.glob = self.glob
+
+        # Every capture fails and returns the result to pending
+        self.captured = []
+        capture_batch = result_manager.capture_batch
+        result_manager.capture_batch = lambda results: self.captured.extend(results)
+        self.addCleanup(setattr, result_manager, 'capture_batch', capture_batch)
+
+    def tearDown(self):
+        su.rmtree(self.pending)
+
+    def add_result(self, name):
+        os.makedirs(os.path.join(self.pending, name))
+        self.mark(name, time.time() - 100)
+
+    def mark(self, name, mtime):
+        marker = os.path.join(self.pending, name, ".bp_done")
+        with open(marker, 'w') as f:
+            f.write("status=1\n")
+        os.utime(marker, (mtime, mtime))
+
+    def test_failed_result_not_retried(self):
+        self.add_result("result_a")
+        self.glob.lib.watch = Watch(self.glob, 20)
+        result_manager.watch_results([])
+        self.assertEqual(self.captured, ["result_a"])
+
+    def test_initial_capture_not_retried(self):
+        self.add_result("result_a")
+        self.add_result("result_b")
+        self.glob.lib.watch = Watch(self.glob, 5)
+        result_manager.watch_results(["result_a"])
+        self.assertEqual(self.captured, ["result_b"])
+
+    def test_rewritten_marker_retried(self):
+        self.add_result("result_a")
+        self.glob.lib.watch = Watch(self.glob, 10, lambda left: left == 5 and self.mark("result_a", time.time()))
+        result_manager.watch_results([])
+        self.assertEqual(self.captured, ["result_a", "result_a"])
+
+class TestAcctMetrics(unittest.TestCase):
+
+    def get_metrics(self, state):
+        glob = Glob("")
+        glob.lib.sched = sched = sched_handler.init(glob)
+        sched.acct["1001"] = {'JobID': "1001", 'State': state, 'NodeList': "c001", 'Submit': "2026-01-01T10:00:00",
+                              'Start': "2026-01-01T10:05:00", 'End': "Unknown", 'ElapsedRaw': "600",
+                              'TotalCPU': "00:00:00", 'AllocCPUS': "56", 'MaxRSS': "", 'ConsumedEnergyRaw': "",
+                              'ExitCode': "0:0"}
+        return sched.get_acct_metrics("1001")
+
+    def test_running_record_not_used(self):
+        for state in ["RUNNING", "COMPLETING"]:
+            self.assertEqual(self.get_metrics(state), {'queue_wait_sec': 300})
+
+    def test_final_record_used(self):
+        metrics = self.get_metrics("FAILED")
+        self.assertEqual(metrics['exit_code'], "0:0")
+        self.assertEqual(metrics['queue_wait_sec'], 300)
+        self.assertIn('cpu_efficiency', metrics)
+
+class TestBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.captured = os.path.join(self.tmp, "captured")
+        self.repo = os.path.join(self.tmp, "repo")
+        glob = Glob("")
+        glob.stg['captured_path'] = self.captured
+        result_manager.glob = glob
+
+    def tearDown(self):
+        su.rmtree(self.tmp)
+
+    # Result dir with outputs and an input staged from the repo in link mode
+    def get_bundled(self, mode):
+        result_path = os.path.join(self.captured, "result_" + mode)
+        os.makedirs(os.path.join(result_path, "bench_files"))
+        os.makedirs(self.repo, exist_ok=True)
+        with open(os.path.join(result_path, "bench_report.txt"), 'w') as f:
+            f.write("[bench]\n")
+        with open(os.path.join(result_path, "bench_files", "out.log"), 'w') as f:
+            f.write("Result 1.0\n")
+        os.symlink(self.tmp, os.path.join(result_path, "hw_report"))
+
+        asset = os.path.join(self.tmp, "input_" + mode + ".dat")
+        with open(asset, 'wb') as f:
+            f.write(b"x" * 100000)
+        staging.stage_asset("file://" + asset, self.repo, result_path, {}, mode)
+
+        bundle = os.path.join(self.tmp, "bundle_" + mode + ".zip")
+        with zipfile.ZipFile(bundle, 'w') as zf:
+            result_manager.add_to_bundle(zf, "result_" + mode)
+        with zipfile.ZipFile(bundle) as zf:
+            return sorted(zf.namelist())
+
+    def test_staged_inputs_left_out(self):
+        for mode in ["symlink", "auto", "copy"]:
+            self.assertEqual(self.get_bundled(mode), ["result_" + mode + "/" + name for name in
+                                                      [staging.staged_file, "bench_files/out.log", "bench_report.txt"]])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# Repo sync: incremental mirror from the staging change journal, short copies
+# Run from the package root: python -m pytest dev/tests
+
+# System Imports
+import hashlib
+import os
+import shutil as su
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# Local Imports
+import src.repo_sync as repo_sync
+import src.staging as staging
+
+class TestRepoSync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp  = tempfile.mkdtemp()
+        self.src  = os.path.join(self.tmp, "repo")
+        self.dest = os.path.join(self.tmp, "mirror")
+        self.assets = os.path.join(self.tmp, "assets")
+        for path in [self.src, self.dest, self.assets]:
+            os.makedirs(path)
+
+    def tearDown(self):
+        for root, dirs, files in os.walk(self.tmp):
+            os.chmod(root, 0o755)
+        su.rmtree(self.tmp)
+
+    # Fetch asset into source repo as a job would
+    def stage(self, name, data):
+        path = os.path.join(self.assets, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        staging.ensure_in_repo("file://" + path, self.src, hashlib.sha256(data).hexdigest())
+
+    def read(self, name):
+        with open(os.path.join(self.dest, name), 'rb') as f:
+            return f.read()
+
+    def test_incremental_sync_follows_journal(self):
+        self.stage("a.tar", b"a" * 1000)
+        self.assertEqual(repo_sync.sync(self.src, self.dest, 2, False, False), 0)
+        self.assertEqual(self.read("a.tar"), b"a" * 1000)
+
+        # Repo directory mtime restored, only the journal names the new asset
+        dir_mtime = os.stat(self.src).st_mtime_ns
+        self.stage("b.tar", b"b" * 2000)
+        os.utime(self.src, ns=(dir_mtime, dir_mtime))
+
+        self.assertEqual(repo_sync.sync(self.src, self.dest, 2, False, False), 0)
+        self.assertEqual(self.read("b.tar"), b"b" * 2000)
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "b.tar.sha256")))
+        self.assertIn("b.tar", repo_sync.load_manifest(self.dest)['files'])
+
+    def test_removed_asset_is_removed(self):
+        self.stage("a.tar", b"a" * 1000)
+        repo_sync.sync(self.src, self.dest, 2, False, False)
+
+        staging.remove_asset(self.src, "a.tar")
+        self.assertEqual(repo_sync.sync(self.src, self.dest, 2, False, False), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "a.tar")))
+        self.assertNotIn("a.tar", repo_sync.load_manifest(self.dest)['files'])
+
+    def test_short_copy_falls_back(self):
+        src_path = os.path.join(self.src, "a.tar")
+        with open(src_path, 'wb') as f:
+            f.write(b"a" * 5000)
+
+        copy_file_range = getattr(os, "copy_file_range", None)
+        os.copy_file_range = lambda *args: 0
+        try:
+            repo_sync.copy_file(src_path, os.path.join(self.dest, "a.tar"))
+        finally:
+            if copy_file_range:
+                os.copy_file_range = copy_file_range
+            else:
+                del os.copy_file_range
+        self.assertEqual(self.read("a.tar"), b"a" * 5000)
+
+    def test_truncated_copy_not_synced(self):
+        self.stage("a.tar", b"a" * 5000)
+
+        # Both copy paths stop short
+        copy_file_range = getattr(os, "copy_file_range", None)
+        copyfileobj = repo_sync.su.copyfileobj
+        os.copy_file_range = lambda *args: 0
+        repo_sync.su.copyfileobj = lambda fsrc, fdst, length: fdst.write(fsrc.read(100))
+        try:
+            self.assertEqual(repo_sync.sync(self.src, self.dest, 2, False, False), 1)
+        finally:
+            repo_sync.su.copyfileobj = copyfileobj
+            if copy_file_range:
+                os.copy_file_range = copy_file_range
+            else:
+                del os.copy_file_range
+
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "a.tar")))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, ".a.tar.sync.tmp")))
+        self.assertNotIn("a.tar", repo_sync.load_manifest(self.dest)['files'])
+
+        # Retried by next run
+        self.assertEqual(repo_sync.sync(self.src, self.dest, 2, False, False), 0)
+        self.assertEqual(self.read("a.tar"), b"a" * 5000)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+# Asset staging: repo locks, resumed downloads, checksum verification and eviction
+# Run from the package root: python -m pytest dev/tests
+
+# System Imports
+import hashlib
+import http.server
+import os
+import shutil as su
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# Local Imports
+import src.staging as staging
+
+payload = bytes(range(256)) * 4096
+
+# Serves payload with range requests, the first response for /drop stops half way through its body
+class handler(http.server.BaseHTTPRequestHandler):
+    requests = []
+    dropped = False
+
+    def do_GET(self):
+        handler.requests.append(self.headers.get("Range"))
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].split("-")[0])
+
+        body = payload[start:]
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if self.path == "/drop" and not handler.dropped:
+            handler.dropped = True
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class TestStaging(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = "http://127.0.0.1:" + str(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        handler.requests = []
+        handler.dropped = False
+
+    def tearDown(self):
+        su.rmtree(self.repo)
+
+    def test_stale_lock_takeover(self):
+        path = os.path.join(self.repo, "asset.tar")
+        holder = staging.asset_lock(path)
+        self.assertTrue(holder.acquire())
+
+        # Live lock is respected
+        waiter = staging.asset_lock(path)
+        self.assertFalse(waiter.acquire())
+        self.assertTrue(os.path.exists(waiter.path))
+
+        # Lock not refreshed for stale_age is removed, then taken
+        old = time.time() - staging.stale_age - 1
+        os.utime(holder.path, (old, old))
+        self.assertFalse(waiter.acquire())
+        self.assertTrue(waiter.acquire())
+
+    def test_keep_alive_refreshes_lock(self):
+        path = os.path.join(self.repo, "asset.tar")
+        lock = staging.asset_lock(path)
+        self.assertTrue(lock.acquire())
+        old = time.time() - staging.stale_age - 1
+        os.utime(lock.path, (old, old))
+
+        heartbeat = staging.heartbeat
+        staging.heartbeat = 0.05
+        try:
+            stop = lock.keep_alive()
+            time.sleep(0.3)
+            stop.set()
+        finally:
+            staging.heartbeat = heartbeat
+        self.assertLess(time.time() - os.path.getmtime(lock.path), staging.stale_age)
+
+    def test_resume_part_file(self):
+        part = os.path.join(self.repo, "asset.tar.part")
+        with open(part, 'wb') as f:
+            f.write(payload[:1000])
+
+        lock = staging.asset_lock(part[:-len(".part")])
+        lock.acquire()
+        staging.download(self.url + "/asset.tar", part, lock)
+
+        self.assertEqual(handler.requests, ["bytes=1000-"])
+        with open(part, 'rb') as f:
+            self.assertEqual(f.read(), payload)
+
+    def test_dropped_connection_resumes(self):
+        expected = hashlib.sha256(payload).hexdigest()
+        path = staging.ensure_in_repo(self.url + "/drop", self.repo, expected)
+
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), payload)
+        self.assertEqual(handler.requests[0], None)
+        self.assertEqual(handler.requests[1], "bytes=" + str(len(payload) // 2) + "-")
+        self.assertFalse(os.path.exists(path + ".part"))
+        self.assertFalse(os.path.exists(path + ".lock"))
+
+    def test_checksum_mismatch_fails(self):
+        retries = staging.retries
+        staging.retries = 1
+        try:
+            with self.assertRaises(RuntimeError):
+                staging.ensure_in_repo(self.url + "/asset.tar", self.repo, "0" * 64)
+        finally:
+            staging.retries = retries
+        self.assertFalse(os.path.exists(os.path.join(self.repo, "asset.tar")))
+
+    def test_evict_skips_linked_assets(self):
+        source = tempfile.mkdtemp()
+        self.addCleanup(su.rmtree, source)
+        for name in ["a.dat", "b.dat"]:
+            with open(os.path.join(source, name), 'wb') as f:
+                f.write(payload)
+
+        # Both staged by symlink into running jobs, a.dat used longer ago
+        jobs = []
+        for name in ["a.dat", "b.dat"]:
+            job = tempfile.mkdtemp(dir=source)
+            staging.stage_asset("file://" + os.path.join(source, name), self.repo, job, {}, "symlink")
+            jobs.append(job)
+        old = time.time() - staging.min_age - 10
+        os.utime(os.path.join(self.repo, "a.dat"), (old, old))
+        os.utime(os.path.join(self.repo, "b.dat"), (old + 1, old + 1))
+        os.remove(os.path.join(self.repo, staging.journal_file))
+
+        self.assertEqual(staging.evict(self.repo, 0), [])
+        self.assertTrue(os.path.exists(os.path.join(jobs[0], "a.dat")))
+
+        # Finished job releases its asset
+        with open(os.path.join(jobs[0], staging.done_marker), 'w') as f:
+            f.write("status=0\n")
+        self.assertEqual(staging.evict(self.repo, 0), [["a.dat", len(payload)]])
+        self.assertEqual(os.listdir(os.path.join(self.repo, staging.refs_dir)), ["b.dat." + \
+                         hashlib.sha1(jobs[1].encode()).hexdigest()[:16]])
+
+        # Removed working directory too
+        su.rmtree(jobs[1])
+        self.assertEqual(staging.evict(self.repo, 0), [["b.dat", len(payload)]])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# Sweep range grammar, sweep modes and constraints
+# Run from the package root: python -m pytest dev/tests
+
+# System Imports
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# Local Imports
+import src.library.sweep_handler as sweep_handler
+
+# Minimal glob: msg.error quits like the real handler
+class Msg(object):
+    def error(self, message):
+        raise SystemExit(message)
+
+    def log(self, message):
+        pass
+
+class Lib(object):
+    def __init__(self):
+        self.msg = Msg()
+
+    def rel_path(self, path):
+        return path
+
+class Glob(object):
+    def __init__(self):
+        self.lib = Lib()
+        self.system = {'system': "test", 'cores_per_node': "56", 'sockets': "2"}
+
+def get_cfg(**runtime):
+    cfg = {'metadata': {'cfg_file': "test.cfg"},
+           'runtime':  {'nodes': "1", 'threads': "1", 'ranks_per_node': "1", 'gpus': "0",
+                        'sweep': "default", 'constraint': ""}}
+    cfg['runtime'].update(runtime)
+    return cfg
+
+class TestRanges(unittest.TestCase):
+
+    def setUp(self):
+        self.sweep = sweep_handler.init(Glob())
+
+    def test_arithmetic(self):
+        self.assertEqual(self.sweep.parse_axis("1:4", "test.cfg"),      ["1", "2", "3", "4"])
+        self.assertEqual(self.sweep.parse_axis("2:10:4", "test.cfg"),   ["2", "6", "10"])
+        self.assertEqual(self.sweep.parse_axis("1,4:5, 8", "test.cfg"), ["1", "4", "5", "8"])
+
+    def test_geometric(self):
+        self.assertEqual(self.sweep.parse_axis("1:16:x2", "test.cfg"),  ["1", "2", "4", "8", "16"])
+        self.assertEqual(self.sweep.parse_axis("3:30:x3", "test.cfg"),  ["3", "9", "27"])
+
+    def test_invalid_step(self):
+        for term in ["1:8:0", "1:8:x1", "0:8:x2", "1:8:-1", "a:8", "1:"]:
+            with self.assertRaises(SystemExit):
+                self.sweep.parse_axis(term, "test.cfg")
+
+    def test_reversed_range_is_empty(self):
+        self.assertEqual(self.sweep.parse_axis("8:1", "test.cfg"), [])
+        self.assertEqual(self.sweep.parse_axis("8:1:x2", "test.cfg"), [])
+
+    def test_empty_axis(self):
+        with self.assertRaises(SystemExit):
+            self.sweep.parse_axes(get_cfg(nodes="8:1"))
+        with self.assertRaises(SystemExit):
+            self.sweep.parse_axes(get_cfg(nodes=" , "))
+
+class TestModes(unittest.TestCase):
+
+    def setUp(self):
+        self.sweep = sweep_handler.init(Glob())
+
+    def combos(self, cfg):
+        self.sweep.parse_axes(cfg)
+        return [tuple([combo[axis] for axis in self.sweep.axes]) for combo in self.sweep.combinations(cfg['runtime'])]
+
+    def test_default_pairs_threads_and_ranks(self):
+        combos = self.combos(get_cfg(nodes="1,2", threads="1,2", ranks_per_node="4,2"))
+        self.assertEqual(combos, [("1", "1", "4", "0"), ("1", "2", "2", "0"), ("2", "1", "4", "0"), ("2", "2", "2", "0")])
+
+    def test_cartesian(self):
+        self.assertEqual(len(self.combos(get_cfg(nodes="1:4", threads="1,2", ranks_per_node="1:3", sweep="cartesian"))), 24)
+
+    def test_zip_broadcasts_single_values(self):
+        combos = self.combos(get_cfg(nodes="1,2,4", threads="1", ranks_per_node="8,4,2", sweep="zip"))
+        self.assertEqual(combos, [("1", "1", "8", "0"), ("2", "1", "4", "0"), ("4", "1", "2", "0")])
+
+    def test_zip_mismatched_lengths(self):
+        with self.assertRaises(SystemExit):
+            self.sweep.parse_axes(get_cfg(nodes="1,2,4", ranks_per_node="8,4", sweep="zip"))
+        with self.assertRaises(SystemExit):
+            self.sweep.parse_axes(get_cfg(threads="1,2,4", ranks_per_node="8,4"))
+
+    def test_invalid_mode(self):
+        with self.assertRaises(SystemExit):
+            self.sweep.parse_axes(get_cfg(sweep="random"))
+
+class TestConstraints(unittest.TestCase):
+
+    def setUp(self):
+        self.sweep = sweep_handler.init(Glob())
+
+    def test_constraint_filters(self):
+        cfg = get_cfg(nodes="1:4", threads="1,2,4", ranks_per_node="1,2,4", sweep="cartesian",
+                      constraint="threads * ranks_per_node <= cores_per_node // 14")
+        self.sweep.parse_axes(cfg)
+        for combo in self.sweep.combinations(cfg['runtime']):
+            self.assertLessEqual(int(combo['threads']) * int(combo['ranks_per_node']), 4)
+        self.assertEqual(self.sweep.count(cfg['runtime'], lambda combo: 3600)[0], 4 * 6)
+
+    def test_unknown_name(self):
+        cfg = get_cfg(nodes="1,2", constraint="nodes < max_nodes")
+        self.sweep.parse_axes(cfg)
+        with self.assertRaises(SystemExit):
+            list(self.sweep.combinations(cfg['runtime']))
+
+    def test_no_builtins(self):
+        cfg = get_cfg(constraint="__import__('os').getpid() > 0")
+        self.sweep.parse_axes(cfg)
+        with self.assertRaises(SystemExit):
+            list(self.sweep.combinations(cfg['runtime']))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# Telemetry sampler and watchdog: prompt exit on SIGTERM from the job script
+# Run from the package root: python -m pytest dev/tests
+
+# System Imports
+import os
+import shutil as su
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# Local Imports
+import src.telemetry as telemetry
+
+src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src")
+
+class TestStopSignal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        su.rmtree(self.tmp)
+
+    # Start helper, send SIGTERM part way through its interval, return seconds it took to exit
+    def stop(self, cmd, ready):
+        proc = subprocess.Popen([sys.executable] + cmd)
+        deadline = time.time() + 10
+        while not ready() and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)
+
+        start = time.time()
+        proc.send_signal(signal.SIGTERM)
+        self.assertEqual(proc.wait(timeout=30), 0)
+        return time.time() - start
+
+    @unittest.skipUnless(os.path.isfile("/proc/stat"), "needs /proc")
+    def test_telemetry_stops_within_interval(self):
+        output = os.path.join(self.tmp, "telemetry")
+        elapsed = self.stop([os.path.join(src_path, "telemetry.py"), output, "20"],
+                            lambda: os.path.isdir(output) and any(name.endswith(".bin") for name in os.listdir(output)))
+        self.assertLess(elapsed, 5)
+
+        # First sample and final sample on SIGTERM
+        bin_file = [os.path.join(output, name) for name in os.listdir(output) if name.endswith(".bin")][0]
+        self.assertEqual(len(telemetry.read_records(bin_file)), 2)
+
+    def test_watchdog_stops_within_interval(self):
+        out_file = os.path.join(self.tmp, "stdout")
+        open(out_file, 'w').close()
+
+        # Nothing to watch for, give it time to start
+        started = time.time()
+        elapsed = self.stop([os.path.join(src_path, "watchdog.py"), "--parent", str(os.getpid()), "--output", out_file,
+                             "--reason", os.path.join(self.tmp, "reason"), "--interval", "20"],
+                            lambda: time.time() - started > 1)
+        self.assertLess(elapsed, 5)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "reason")))
+
+if __name__ == "__main__":
+    unittest.main()
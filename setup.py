@@ -30,5 +30,5 @@ setup (
         'Programming Language :: Python :: 3',
         'Programming Language :: Python :: 3.6',
     ],
-    scripts=['src/benchpro', 'src/stage'],
+    scripts=['src/benchpro', 'src/stage', 'src/benchpro-repo-sync'],
 )
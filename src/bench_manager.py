@@ -1,6 +1,5 @@
 # System Imports
 import configparser as cp
-import copy
 import datetime
 import os
 import shutil as su
@@ -8,6 +7,7 @@ import sys
 
 # Local Imports
 import src.build_manager as build_manager
+import src.context as context
 import src.logger as logger
 
 glob = glob_master = None
@@ -21,13 +21,19 @@ def get_app_info():
     # Check if code is installed
     glob.config['metadata']['code_path'] = glob.lib.check_if_installed(glob.config['requirements'])
 
+    # Plan mode: nothing is installed, a build already planned for these requirements is used as a real run
+    # would find its install dir
+    if not glob.config['metadata']['code_path'] and glob.args.plan and get_planned_builds():
+        set_planned_build(get_planned_builds())
+        return
+
     # If application is not installed, check if cfg file is available to build
     if not glob.config['metadata']['code_path']:
         glob.lib.msg.warning("No installed application meeting benchmark requirements: '" + "', '".join([i + "=" + glob.config['requirements'][i] for i in glob.config['requirements'].keys() if i]) + "'") 
         glob.lib.msg.high("Attempting to build now...")
 
         # Set build args
-        build_glob = copy.deepcopy(glob)
+        build_glob = context.fork(glob)
         build_glob.args.build = glob.config['requirements']
         build_glob.args.bench = None
         build_glob.quiet_build = True
@@ -35,6 +41,11 @@ def get_app_info():
         # Run build manager
         build_manager.init(build_glob)
 
+        # Plan mode: nothing was installed, use planned build task
+        if glob.args.plan:
+            set_planned_build(get_planned_builds())
+            return
+
         if glob.stg['dry_run']:
             glob.config['metadata']['build_running'] = False
         else:
@@ -91,8 +102,42 @@ def get_app_info():
             else:
                 glob.lib.msg.low("'check_exe=False' in $BP_HOME/settings.ini, skipping application exe check.")
 
-# Generate the bench script
-def gen_bench_script():
+# Planned build tasks whose install path meets the bench requirements, matched as check_if_installed does
+def get_planned_builds():
+    return [task for task in glob.task_graph if task['type'] == "build" and \
+            glob.lib.search_with_dict(glob.config['requirements'], os.path.relpath(task['working_path'], glob.stg['build_path']))]
+
+# Use planned build task in place of installed application (plan mode)
+def set_planned_build(build_tasks):
+
+    requirements = "', '".join([i + "=" + glob.config['requirements'][i] for i in glob.config['requirements'].keys() if i])
+    if not build_tasks:
+        glob.lib.msg.error("no build task was planned for requirements '" + requirements + "'")
+    if len(build_tasks) > 1:
+        glob.lib.msg.error(["Multiple planned builds match requirements '" + requirements + "':"] + \
+                           [os.path.relpath(task['working_path'], glob.stg['build_path']) for task in build_tasks] + \
+                           ["Please be more specific."])
+
+    task = build_tasks[0]
+    exe = task['params']['config']['exe']
+
+    glob.config['metadata']['code_path']        = os.path.relpath(task['working_path'], glob.stg['build_path'])
+    glob.config['metadata']['app_mod']          = glob.config['metadata']['code_path']
+    glob.config['metadata']['build_running']    = True
+
+    glob.build_report = {'code':        task['params']['general']['code'],
+                         'exe_file':    exe,
+                         'exec_mode':   glob.stg['build_mode'],
+                         'task_id':     task['id']}
+
+    if not glob.config['config']['exe']:
+        glob.config['config']['exe'] = exe
+
+    glob.ok_dep_list = [task['id']]
+    glob.lib.msg.low(glob.build_report['code'] + " build is planned, creating dependency")
+
+# Generate the bench script, cfg_runtime is the sched cfg time limit
+def gen_bench_script(cfg_runtime):
 
     # Evaluate math in cfg dict -
     glob.args.build = None
@@ -132,9 +177,26 @@ def gen_bench_script():
     glob.lib.msg.low(["Benchmark working directory:",
                     ">  " + glob.lib.rel_path(glob.config['metadata']['working_path'])])
 
+    glob.lib.event.emit("created", "bench", glob.config['metadata']['working_path'])
+
+    # Set job time limit from runtime history of this benchmark
+    if glob.stg['bench_mode'] == "sched":
+        glob.sched['sched']['runtime'], source = glob.lib.predict.get_time_limit(cfg_runtime, glob.config['runtime'])
+        if source:
+            glob.lib.msg.low("Job time limit " + source)
+
     # Generate benchmark template
     glob.lib.template.generate_bench_script()
 
+# Add bench to plan without writing any files (plan mode)
+def plan_task():
+
+    job_limit = 1
+    if glob.stg['bench_mode'] == "sched":
+        job_limit = int(glob.config['runtime']['max_running_jobs'])
+
+    glob.task_id = glob.lib.dag.add_task("bench", job_limit)
+
 # Execute the bench, locally or through sched
 def start_task():
     # Make bench path and move tmp bench script file
@@ -175,16 +237,8 @@ def start_task():
                 glob.lib.msg.error("'max_running_jobs' value '" + \
                                         glob.config['runtime']['max_running_jobs'] + "' is not an integer")
 
-            if len(glob.prev_task_id) >= job_limit:
-                glob.lib.msg.low("Max running jobs reached, creating dependency")
-                glob.any_dep_list.append(glob.prev_task_id[-1 * job_limit])
-
-            # Submit job
-            glob.lib.sched.submit()
-            #glob.task_id = glob.lib.submit_job( glob.lib.get_dep_str(), \
-            #                                glob.config['metadata']['working_path'], \
-            #                                glob.config['metadata']['job_script'])
-            glob.prev_task_id.append(glob.task_id)
+            # Add bench to task graph, submitted once all tasks are generated
+            glob.task_id = glob.lib.dag.add_task("bench", job_limit)
 
         # bench_mode = local
         elif glob.stg['bench_mode'] == "local":
@@ -197,6 +251,7 @@ def start_task():
 
             # Store PID for report
             glob.task_id = glob.prev_pid
+            glob.lib.event.emit("submitted", "bench", glob.config['metadata']['working_path'], glob.task_id)
 
     # Use stdout for output if not set
     if not glob.config['result']['output_file']:
@@ -205,6 +260,28 @@ def start_task():
     # Generate bench report
     glob.lib.report.bench()
 
+# Report number of tasks and node-hours in sweep without writing any scripts
+def count_sweep(input_str, glob_copy):
+
+    global glob
+    glob = glob_copy
+
+    # Get benchmark params from cfg file
+    input_dict = glob.lib.parse_bench_str(input_str)
+    glob.lib.cfg.ingest('bench', input_dict)
+
+    # Per task runtime from history or sched cfg
+    get_task_runtime = lambda combo: 0
+    if glob.stg['bench_mode'] == "sched":
+        glob.lib.cfg.ingest('sched', glob.lib.get_sched_cfg())
+        cfg_runtime = glob.sched['sched']['runtime']
+        get_task_runtime = lambda combo: glob.lib.sched.runtime_to_sec(glob.lib.predict.get_time_limit(cfg_runtime, combo)[0])
+
+    tasks, node_hours = glob.lib.sweep.count(glob.config['runtime'], get_task_runtime)
+
+    glob.lib.msg.high("'" + input_str + "': " + str(tasks) + " tasks, " + "{:.1f}".format(node_hours) + " node-hours")
+    return tasks, node_hours
+
 # Main function to check for installed application, setup benchmark and run it
 def run_bench(input_str, glob_copy):
 
@@ -221,6 +298,7 @@ def run_bench(input_str, glob_copy):
     glob.lib.msg.heading("Starting benchmark with criteria '" + input_str + "'")
 
     # Get benchmark params from cfg file
+    glob.lib.prof.next("ingest")
     glob.lib.cfg.ingest('bench', input_dict)
     
     # Directory to add to MODULEPATH
@@ -233,6 +311,7 @@ def run_bench(input_str, glob_copy):
     glob.lib.generate_requirements(input_dict)    
 
     # Get application info if there are >0 requirements 
+    glob.lib.prof.next("app_info")
     if glob.lib.needs_code(glob.config['requirements']):
         get_app_info()
 
@@ -243,6 +322,7 @@ def run_bench(input_str, glob_copy):
         glob.config['metadata']['build_running'] = False
 
     # Get bench config cfgs
+    glob.lib.prof.next("sched_ingest")
     if glob.stg['bench_mode'] == "sched":
         glob.lib.cfg.ingest('sched', glob.lib.get_sched_cfg())
 
@@ -267,45 +347,50 @@ def run_bench(input_str, glob_copy):
     glob.lib.send_inputs_to_log('Bencher')
 
     # Stage input files
+    glob.lib.prof.next("stage")
     glob.lib.files.stage()
 
-    glob.prev_task_id = glob.lib.sched.get_active_jobids('_bench')
     prev_pid = 0
 
-    # Create backup on benchmark cfg params, to be modified by each loop 
-    backup_dict = copy.deepcopy(glob.config) 
-
-    node_list = glob.config['runtime']['nodes']
-    thread_list = glob.config['runtime']['threads']
-    rank_list = glob.config['runtime']['ranks_per_node']
-
-    # for each nodes in list
-    for node in node_list:
-        glob.lib.msg.log("Write script for " + node + " nodes")
-
-        # Iterate over thread/rank pairs
-        for i in range(len(thread_list)):
-            # Grab a new copy of code_dict for this iteration (resets variables to be repopulated)
-            glob.config = copy.deepcopy(backup_dict)
-            glob.config['runtime']['nodes'] = node
-            glob.config['runtime']['threads'] = thread_list[i]
-            glob.config['runtime']['ranks_per_node'] = rank_list[i]
-
-            # Iterate over GPU values
-            gpu_list = glob.config['runtime']['gpus']
-            for gpu in gpu_list:
-                glob.config['runtime']['gpus'] = gpu
-
-                # Apply system rules if not running locally
-                if not glob.stg['bench_mode'] == "local":
-                    glob.lib.expr.apply_system_rules()
-
-                # Generate bench script
-                gen_bench_script()
-                start_task()
-                # Write to history file
-                glob.lib.files.write_cmd_history()
-                glob.lib.msg.brk()
+    # Shared benchmark cfg params, each loop writes to its own overlay
+    backup_dict = glob.config
+
+    node = None
+
+    # Time limit from sched cfg, replaced per task by prediction from runtime history
+    cfg_runtime = None
+    if glob.stg['bench_mode'] == "sched":
+        cfg_runtime = glob.sched['sched']['runtime']
+
+    # For each combination of nodes, threads, ranks and gpus in sweep
+    for combo in glob.lib.sweep.combinations(backup_dict['runtime']):
+        if not combo['nodes'] == node:
+            node = combo['nodes']
+            glob.lib.msg.log("Write script for " + node + " nodes")
+
+        # Layer a new overlay over code_dict for this iteration (resets variables to be repopulated)
+        glob.config = context.overlay({}, backup_dict)
+        glob.config['runtime'].update(combo)
+
+        # Apply system rules if not running locally
+        glob.lib.prof.next("rules")
+        if not glob.stg['bench_mode'] == "local":
+            glob.lib.expr.apply_system_rules()
+
+        # Generate bench script
+        glob.lib.prof.next("template")
+        gen_bench_script(cfg_runtime)
+
+        # Plan mode: nothing written
+        if glob.args.plan:
+            plan_task()
+            continue
+
+        glob.lib.prof.next("start_task")
+        start_task()
+        # Write to history file
+        glob.lib.files.write_cmd_history()
+        glob.lib.msg.brk()
 
     # Return number of tasks compeleted for this benchmark 
     return glob.counter
@@ -315,14 +400,16 @@ def init(glob):
 
     glob.counter = 1
 
-    # Start logger
-    logger.start_logging("RUN", glob.stg['bench_log_file'] + "_" + glob.stg['time_str'] + ".log", glob)
+    # Start logger (plan mode writes no log file)
+    if not glob.args.plan:
+        logger.start_logging("RUN", glob.stg['bench_log_file'] + "_" + glob.stg['time_str'] + ".log", glob)
 
     # Get list of avail cfgs
     glob.lib.set_bench_cfg_list()
 
     # Check for new results
-    glob.lib.msg.new_results()
+    if not glob.args.plan:
+        glob.lib.msg.new_results()
 
     # Overload settings.ini with cmd line args
     glob.lib.overload.replace(None)
@@ -333,15 +420,31 @@ def init(glob):
         input_list = glob.suite[glob.args.bench[0]].split(" ")
         glob.lib.msg.high("Running benchmark suite '" + glob.args.bench[0] + "' containing: '" + "' ,'".join(input_list) + "'")
 
+    # Only report sweep size
+    if glob.args.sweep_dry_count:
+        total_tasks = total_hours = 0
+        for inp in input_list:
+            tasks, node_hours = count_sweep(inp, context.fork(glob))
+            total_tasks += tasks
+            total_hours += node_hours
+
+        glob.lib.msg.heading("Sweep total: " + str(total_tasks) + " tasks, " + "{:.1f}".format(total_hours) + " node-hours")
+        if not glob.stg['bench_mode'] == "sched":
+            glob.lib.msg.low("Node-hours not estimated in local bench_mode")
+        return
+
     # Run benchmark on list of inputs
     for inp in input_list:
 
-        # Get a copy of the global object for use in this benchmark session
-        glob_copy = copy.deepcopy(glob)
-        glob_copy.overload_dict = copy.deepcopy(glob.overload_dict)
+        # Get a task context over the global object for use in this benchmark session
+        glob_copy = context.fork(glob)
         # Start benchmark session and collect number of runs
-        glob.counter = run_bench(inp, glob_copy)
+        with glob.lib.prof.phase("run_bench"):
+            glob.counter = run_bench(inp, glob_copy)
+
+    # Submit build and bench jobs for whole suite
+    with glob.lib.prof.phase("submit"):
+        glob.lib.dag.submit()
 
-        # Reset stage ops list because deepcopy is unreliable
-        glob.stage_ops = []
+    glob.lib.prof.report("bench")
 
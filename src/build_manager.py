@@ -1,5 +1,4 @@
 # System Imports
-import copy
 import datetime
 import os
 import shutil as su
@@ -8,6 +7,7 @@ import sys
 import time
 
 # Local Imports
+import src.context as context
 import src.logger as logger
 
 glob = None
@@ -18,6 +18,11 @@ def check_for_previous_install():
 
     # If existing installation is found
     if os.path.isdir(install_path):
+        # Plan mode: existing build would be replaced, nothing is deleted
+        if glob.stg['overwrite'] and glob.args.plan:
+            glob.lib.msg.low("Existing build in " + glob.lib.rel_path(install_path) + " would be replaced because 'overwrite=True'")
+            return False
+
         # Delete if overwrite=True
         if glob.stg['overwrite']:
 
@@ -42,20 +47,6 @@ def check_for_previous_install():
     else:
         return False
 
-# Get build job dependency
-def get_build_dep(job_limit):
-
-    # Reset dependency lists
-    glob.any_dep_list = []
-    glob.ok_dep_list = []
-
-    # Get queued/running build jobs
-    running_task_ids = glob.lib.sched.get_active_jobids('_build')
-
-    # Create dependency on apropriate running job 
-    if len(running_task_ids) >= job_limit:
-        glob.any_dep_list.append(str(running_task_ids[len(running_task_ids)-job_limit]))
-
 # Main method for generating and submitting build script
 def build_code(input_dict, glob_copy):
 
@@ -63,11 +54,16 @@ def build_code(input_dict, glob_copy):
     global glob
     glob = glob_copy
 
+    # Reset dependency lists
+    glob.any_dep_list = []
+    glob.ok_dep_list = []
+
     input_str = ",".join([key + "=" + input_dict[key] for key in input_dict.keys() if key])
 
     glob.lib.msg.heading("Building application:  '" + input_str + "'")
 
     # Parse config input files
+    glob.lib.prof.next("ingest")
     glob.lib.cfg.ingest('build',    input_dict)
     glob.lib.cfg.ingest('compiler', glob.stg['compile_cfg_file'])
 
@@ -79,7 +75,10 @@ def build_code(input_dict, glob_copy):
                     "Found matching application config file:",
                     ">  " + glob.lib.rel_path(glob.config['metadata']['cfg_file'])])
 
+    glob.lib.event.emit("created", "build", glob.config['metadata']['working_path'])
+
     # Get sched config dict if exec_mode=sched, otherwise set default threads for local build
+    glob.lib.prof.next("sched_ingest")
     if glob.stg['build_mode'] == "sched":
         # If sched config file not specified, use system default
         if not glob.config['general']['sched_cfg']:
@@ -98,6 +97,7 @@ def build_code(input_dict, glob_copy):
         glob.lib.overload.check_for_unused()
 
     # Apply system rules if not running locally
+    glob.lib.prof.next("rules")
     if not glob.stg['build_mode'] == "local":
         glob.lib.expr.apply_system_rules()
 
@@ -105,19 +105,31 @@ def build_code(input_dict, glob_copy):
     glob.lib.send_inputs_to_log('Builder')
 
     # Stage input files
+    glob.lib.prof.next("stage")
     glob.lib.files.stage()
 
     #============== GENERATE BUILD & MODULE TEMPLATE  ======================================
 
     # Generate build script
+    glob.lib.prof.next("template")
     glob.lib.template.generate_build_script()
 
+    # Plan mode: add build to plan without writing any files
+    if glob.args.plan:
+        job_limit = 1
+        if glob.stg['build_mode'] == "sched":
+            job_limit = int(glob.stg['max_build_jobs'])
+        glob.task_id = glob.lib.dag.add_task("build", job_limit)
+        return
+
     # Generate module file
+    glob.lib.prof.next("module")
     mod_path, mod_file = glob.lib.module.make_mod()
 
     # ================== COPY INSTALLATION FILES ===================================
 
     # Make build path and move tmp build script file
+    glob.lib.prof.next("copy_files")
     glob.lib.files.create_dir(glob.config['metadata']['working_path'])
     glob.lib.files.copy(glob.config['metadata']['working_path'], glob.tmp_job_file, None, True)
 
@@ -142,6 +154,7 @@ def build_code(input_dict, glob_copy):
     glob.lib.msg.high(glob.success)
 
     # If dry_run
+    glob.lib.prof.next("start_task")
     if glob.stg['dry_run']:
         glob.lib.msg.high(["This was a dryrun, skipping build step. Script created at:",
                         ">  " + glob.lib.rel_path(os.path.join(glob.config['metadata']['working_path'], glob.job_file))])
@@ -156,16 +169,15 @@ def build_code(input_dict, glob_copy):
             except:
                 glob.lib.msg.error("'max_build_jobs in $BP_HOME/settings.ini is not an integer")
 
-            get_build_dep(job_limit)
-
-            # Submit build script to scheduler
-            glob.lib.sched.submit()
+            # Add build to task graph, submitted once all tasks are generated
+            glob.task_id = glob.lib.dag.add_task("build", job_limit)
 
         # Or start local shell
         else:
             glob.lib.proc.start_local_shell()
             #Store PID for report
             glob.task_id = glob.prev_pid
+            glob.lib.event.emit("submitted", "build", glob.config['metadata']['working_path'], glob.task_id)
 
     # Write to history file
     glob.lib.files.write_cmd_history()
@@ -178,8 +190,9 @@ def build_code(input_dict, glob_copy):
 # Setup contants and get build label
 def init(glob):
 
-    # Init logger
-    logger.start_logging("BUILD", glob.stg['build_log_file'] + "_" + glob.stg['time_str'] + ".log", glob)
+    # Init logger (plan mode writes no log file)
+    if not glob.args.plan:
+        logger.start_logging("BUILD", glob.stg['build_log_file'] + "_" + glob.stg['time_str'] + ".log", glob)
 
     # Get list of avail cfgs
     glob.lib.set_build_cfg_list()
@@ -188,7 +201,7 @@ def init(glob):
     glob.lib.overload.replace(None)
 
     # Check for new results
-    if not glob.quiet_build:
+    if not glob.quiet_build and not glob.args.plan:
         glob.lib.msg.new_results()
 
     #Check build_mode in set correctly
@@ -210,20 +223,25 @@ def init(glob):
         # User build input (can be ' ' delimited)
         for build_str in build_list:
 
-            # Get a copy of the global object for use in this benchmark session
-            glob_copy = copy.deepcopy(glob)
+            # Get a task context over the global object for use in this build session
+            glob_copy = context.fork(glob)
 
+            with glob.lib.prof.phase("build_code"):
+                build_code(glob.lib.parse_build_str(build_str), glob_copy)
+            glob.lib.msg.brk()
 
-            glob_copy.overload_dict = copy.deepcopy(glob.overload_dict)
+        # Submit build jobs
+        with glob.lib.prof.phase("submit"):
+            glob.lib.dag.submit()
 
-            build_code(glob.lib.parse_build_str(build_str), glob_copy)
-            glob.lib.msg.brk()
+        glob.lib.prof.report("build")
 
     # ----------------- IF CODE LABEL IS A DICT (FROM BENCHER) --------------------------
     else:
-        # Get a copy of the global object for use in this benchmark session
-        glob_copy = copy.deepcopy(glob)
+        # Get a task context over the global object for use in this build session
+        glob_copy = context.fork(glob)
 
-        # Start build
-        build_code(glob.args.build, glob_copy)
+        # Start build, submitted by bench manager
+        with glob.lib.prof.phase("build_code"):
+            build_code(glob.args.build, glob_copy)
         
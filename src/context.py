@@ -0,0 +1,60 @@
+# System Imports
+from collections import ChainMap
+import copy
+
+# Layered dict: reads fall through to shared parent dicts, writes land in the top layer only
+class overlay(ChainMap):
+
+    # Wrap nested dicts on first read so writes into them stay local too
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, (dict, ChainMap)) and key not in self.maps[0]:
+            value = overlay({}, value)
+            self.maps[0][key] = value
+        return value
+
+    # Plain dict copy of the merged view
+    def to_dict(self):
+        return to_dict(self)
+
+# Recursively convert overlays to plain dicts (for JSON output, pickling, etc.)
+def to_dict(obj):
+    if isinstance(obj, (dict, ChainMap)):
+        return {key: to_dict(obj[key]) for key in obj}
+    return obj
+
+# Return task context layered over glob - shared state is referenced, not copied
+def fork(glob):
+
+    task = copy.copy(glob)
+
+    # Dicts modified per task
+    task.stg            = overlay({}, glob.stg)
+    task.config         = overlay({}, glob.config)
+    task.sched          = overlay({}, glob.sched)
+    task.compiler       = overlay({}, glob.compiler)
+    task.system         = overlay({}, glob.system)
+    task.modules        = overlay({}, glob.modules)
+    task.overload_dict  = dict(glob.overload_dict)
+
+    # Parsed cfg files are matched and processed in place
+    task.build_cfgs     = [overlay({}, cfg) for cfg in glob.build_cfgs]
+    task.bench_cfgs     = [overlay({}, cfg) for cfg in glob.bench_cfgs]
+
+    # Lists appended to per task
+    task.stage_ops      = list(glob.stage_ops)
+    task.any_dep_list   = list(glob.any_dep_list)
+    task.ok_dep_list    = list(glob.ok_dep_list)
+    task.overloaded     = list(glob.overloaded)
+    task.cleanup        = list(glob.cleanup)
+
+    # Build/bench inputs are rewritten per task
+    task.args           = copy.copy(glob.args)
+
+    # Shared between all tasks
+    task.task_graph     = glob.task_graph
+
+    # Library handlers bound to this context
+    task.lib            = glob.lib.bind(task)
+
+    return task
@@ -1,6 +1,7 @@
 # System Imports
 import configparser
 from datetime import datetime
+import getpass
 import os
 import socket
 import sys
@@ -43,13 +44,14 @@ class setup(object):
     config['runtime']           = {}
     config['result']            = {}
     config['files']             = {}
+    config['watchdog']          = {}
     # Scheduler dict
     sched                       = {}
     sched['sched']              = {}
     # Compiler dict
     compiler                    = {}
-    # suites.ini dict
-    suite                       = {}
+    # suites.ini dict, read on first access
+    suite_dict                  = None
     # System dict
     system                      = {}
     # Module dict
@@ -62,6 +64,8 @@ class setup(object):
     any_dep_list                = []
     # List of dependant 'ok' jobs
     ok_dep_list                 = []
+    # Build/bench tasks awaiting submission, shared by all copies of glob
+    task_graph                  = []
     # Process ID of previous task
     prev_pid                    = 0
     # Lists of avail config files
@@ -81,7 +85,11 @@ class setup(object):
     cmd                         = None
 
     # Context variables
-    user                        = str(os.getlogin())
+    # getlogin() fails without a controlling terminal (cron, CI), fall back to EV/passwd lookup
+    try:
+        user                    = str(os.getlogin())
+    except OSError:
+        user                    = getpass.getuser()
     home                        = os.path.expandvars("$HOME")
     hostname                    = str(socket.gethostname())
     # If FQDN - take first 2 fields
@@ -127,7 +135,10 @@ class setup(object):
         optional = ['scp_path',
                     'ssh_user',
                     'ssh_key',
-                    'collection_path']
+                    'collection_path',
+                    'repo_quota',
+                    'budget',
+                    'allocation_file']
 
         # Throw exception if required value is NULL
         if key not in optional and not value:
@@ -181,6 +192,24 @@ class setup(object):
                     self.stg[key] = self.process(
                         key, settings_parser[section][key])
 
+        # Defaults for optional keys missing from older settings.ini files
+        self.stg.setdefault('events_file',  "events.jsonl")
+        self.stg.setdefault('log_level',    "DEBUG")
+        self.stg.setdefault('log_buffer',   200)
+        self.stg.setdefault('hw_cache_dir', "./hw_cache")
+        self.stg.setdefault('watch_interval', 60)
+        self.stg.setdefault('claim_timeout', 3600)
+        self.stg.setdefault('stage_jobs',   4)
+        self.stg.setdefault('prefetch',     True)
+        self.stg.setdefault('repo_quota',   0)
+        self.stg.setdefault('stage_link',   "auto")
+        self.stg.setdefault('runtime_predict',  True)
+        self.stg.setdefault('runtime_quantile', 0.95)
+        self.stg.setdefault('runtime_margin',   0.2)
+        self.stg.setdefault('budget',           0)
+        self.stg.setdefault('allocation_file',  "")
+        self.stg.setdefault('budget_action',    "refuse")
+
         # Preserve enviroment variable labels
         self.stg['project_env']         = self.stg['home_path']
         self.stg['app_env']             = self.stg['build_path']
@@ -197,9 +226,14 @@ class setup(object):
         self.stg['local_repo']          = self.resolve(self.stg['local_repo_env'])
         self.stg['collection_path']     = self.resolve(self.stg['collection_path'])
         self.stg['resource_path']       = self.resolve(self.stg['resource_dir'])
+        self.stg['hw_cache_path']       = self.resolve(self.stg['hw_cache_dir'])
 
         # Derived variables
         self.stg['module_dir']          = "modulefiles"
+        self.stg['done_marker']         = ".bp_done"
+        self.stg['claim_file']          = ".bp_claim"
+        self.stg['prefetch_file']       = ".bp_prefetch"
+        self.stg['watchdog_file']       = ".bp_watchdog"
         self.stg['build_dir']           = os.path.basename(self.stg['build_path'])
         self.stg['pending_path']        = os.path.join(
                                         self.stg['bench_path'], self.stg['pending_subdir'])
@@ -207,6 +241,10 @@ class setup(object):
                                         self.stg['bench_path'], self.stg['captured_subdir'])
         self.stg['failed_path']         = os.path.join(
                                         self.stg['bench_path'], self.stg['failed_subdir'])
+        self.stg['claiming_path']       = os.path.join(
+                                        self.stg['bench_path'], "claiming")
+        self.stg['blob_path']           = os.path.join(
+                                        self.stg['collection_path'], "blobs")
         self.stg['module_path']         = os.path.join(
                                         self.stg['build_path'], self.stg['module_dir'])
         self.stg['utils_path']          = os.path.join(
@@ -226,7 +264,14 @@ class setup(object):
         suite_parser = self.read_ini(os.path.join(self.bp_home, "suites.ini"))
 
         # Read suites into own dict
-        self.suite = dict(suite_parser.items('suites'))
+        self.suite_dict = dict(suite_parser.items('suites'))
+
+    # Parse $BP_HOME/suites.ini only when a suite is looked up
+    @property
+    def suite(self):
+        if self.suite_dict is None:
+            self.read_suites()
+        return self.suite_dict
 
     # Get system EV
     def get_system_label(self):
@@ -259,9 +304,6 @@ class setup(object):
         # Parse $BP_HOME/settings.ini file
         self.read_settings()
 
-        # Parse $BP_HOME/suites.ini
-        self.read_suites()
-
         # Get system label
         self.get_system_label()
 
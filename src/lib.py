@@ -3,44 +3,70 @@ import configparser as cp
 import copy
 import glob         as gb
 import hashlib
-from packaging      import version
+import importlib
 from operator       import itemgetter
 import os
 import sys
 import time
 
 # Local Imports
-import src.library.cfg_handler          as cfg_handler
-import src.library.db_handler           as db_handler
-import src.library.expr_handler         as expr_handler
-import src.library.file_handler         as file_handler
-import src.library.misc_handler         as misc_handler
-import src.library.module_handler       as module_handler
 import src.library.msg_handler          as msg_handler
-import src.library.overload_handler     as overload_handler
-import src.library.process_handler      as proc_handler
-import src.library.report_handler       as report_handler
-import src.library.sched_handler        as sched_handler
-import src.library.template_handler     as template_handler
+import src.library.profile_handler      as profile_handler
+
+# Sub-library modules, imported and initialized on first access
+handlers = {'budget':   "src.library.budget_handler",
+            'cfg':      "src.library.cfg_handler",
+            'dag':      "src.library.dag_handler",
+            'db':       "src.library.db_handler",
+            'event':    "src.library.event_handler",
+            'expr':     "src.library.expr_handler",
+            'files':    "src.library.file_handler",
+            'misc':     "src.library.misc_handler",
+            'module':   "src.library.module_handler",
+            'overload': "src.library.overload_handler",
+            'predict':  "src.library.predict_handler",
+            'proc':     "src.library.process_handler",
+            'report':   "src.library.report_handler",
+            'sched':    "src.library.sched_handler",
+            'sweep':    "src.library.sweep_handler",
+            'template': "src.library.template_handler",
+            'watch':    "src.library.watch_handler"}
 
 # Contains several useful functions, mostly used by bench_manager and build_manager
 class init(object):
     def __init__(self, glob):
         self.glob = glob
 
-        # Init all sub-libraries
-        self.cfg      = cfg_handler.init(self.glob)
-        self.db       = db_handler.init(self.glob)
-        self.expr     = expr_handler.init(self.glob)
-        self.files    = file_handler.init(self.glob)
-        self.misc     = misc_handler.init(self.glob)
-        self.module   = module_handler.init(self.glob)
+        # Import and init time of each sub-library, for --profile-startup
+        self.init_times = {}
+
+        # Message handler is needed immediately to catch interrupts, others are loaded on demand
         self.msg      = msg_handler.init(self.glob)
-        self.overload = overload_handler.init(self.glob)
-        self.proc     = proc_handler.init(self.glob)
-        self.report   = report_handler.init(self.glob)
-        self.sched    = sched_handler.init(self.glob)
-        self.template = template_handler.init(self.glob)
+        # Profiler is created up front so all task contexts share its counters
+        self.prof     = profile_handler.init(self.glob)
+
+    # Load sub-library on first access
+    def __getattr__(self, name):
+
+        if name not in handlers:
+            raise AttributeError(name)
+
+        start = time.perf_counter()
+        handler = importlib.import_module(handlers[name]).init(self.glob)
+        self.init_times[name] = time.perf_counter() - start
+
+        setattr(self, name, handler)
+        return handler
+
+    # Return copy of library bound to another glob context, handlers are shallow copied rather than re-initialized
+    def bind(self, glob):
+        bound = copy.copy(self)
+        bound.glob = glob
+        for name, handler in vars(self).items():
+            if hasattr(handler, 'glob'):
+                setattr(bound, name, copy.copy(handler))
+                getattr(bound, name).glob = glob
+        return bound
 
     # Get relative paths for full paths before printing to stdout
     def rel_path(self, path):
@@ -119,6 +145,29 @@ class init(object):
         failed.sort()
         return failed
 
+    # Read key=value marker file written by job script in working path, returns {key: value} or None
+    def read_marker(self, path, marker_file):
+        try:
+            with open(os.path.join(path, marker_file), 'r') as f:
+                return dict([line.strip().split("=", 1) for line in f if "=" in line])
+        except OSError:
+            return None
+
+    # Read .bp_done completion marker written by the bench script in result_path
+    def read_done_marker(self, result_path):
+        return self.read_marker(result_path, self.glob.stg['done_marker'])
+
+    # Read .bp_watchdog abort reason written by the watchdog in build/bench working path
+    def read_watchdog_marker(self, path):
+        return self.read_marker(path, self.glob.stg['watchdog_file'])
+
+    # Abort reason as printable string
+    def get_abort_reason(self, path):
+        marker = self.read_watchdog_marker(path)
+        if not marker:
+            return None
+        return marker.get('reason', "unknown") + ": " + marker.get('detail', "")
+
     # Return list of results meeting task_id status, look_for_complete: True = complete, False = running
     def get_completed_results(self, search_list, look_for_complete):
         # List of results to return
@@ -126,23 +175,32 @@ class init(object):
 
         # For every result
         if search_list:
-            for result in copy.deepcopy(search_list):
 
-                # Get job type (sched/local/dry_run)
-                exec_mode = self.report.get_exec_mode("bench", result)
+            # Get job type (sched/local/dry_run), task_id and completion marker of each result
+            tasks = [[result, self.report.get_exec_mode("bench", result), self.report.get_task_id("bench", result),
+                        self.read_done_marker(os.path.join(self.glob.stg['pending_path'], result))] for result in search_list]
+
+            # Fetch accounting for scheduled jobs without a marker with one sacct call
+            self.sched.prefetch_acct([task_id for result, exec_mode, task_id, marker in tasks
+                                        if exec_mode == "sched" and not marker])
+
+            for result, exec_mode, task_id, marker in tasks:
+
                 complete = False
 
+                # Marker written at end of job script
+                if marker and exec_mode in ["sched", "local"]:
+                    complete = True
+
                 # Sched exec type - get status from task_id
-                if exec_mode == "sched":
-                    # Get task_id and check it is comeplete, if so append to return list and remove from provided list
-                    task_id = self.report.get_task_id("bench", result)
+                elif exec_mode == "sched":
+                    # Check task_id is comeplete, if so append to return list and remove from provided list
                     complete = self.sched.check_job_complete(task_id)
                 
                 # Local exec type - get status from PID
                 elif exec_mode == "local":
-                    pid = self.report.get_task_id("bench", result)
                     # pid_running=False -> complete=True
-                    complete = not self.proc.pid_running(pid)
+                    complete = not self.proc.pid_running(task_id)
 
 
                 # Dry_run - skip to next result
@@ -165,9 +223,9 @@ class init(object):
         self.glob.lib.msg.log("======================================")
         for cfg in cfg_list:
             for seg in cfg:
-                self.glob.lib.msg.log("[" + seg + "]")
+                self.glob.lib.msg.log("[%s]", seg)
                 for line in cfg[seg]:
-                    self.glob.lib.msg.log("  " + str(line) + "=" + str(cfg[seg][line]))
+                    self.glob.lib.msg.log("  %s=%s", line, cfg[seg][line])
         self.glob.lib.msg.log("======================================")
 
     # Check if host can run mpiexec
@@ -406,6 +464,17 @@ class init(object):
         return self.parse_input_str(input_str, "bench_label")
 
     def version_match(self):
+
+        # Read client version from $BP_HOME/.version
+        if not self.glob.version_client:
+            self.files.get_client_version()
+
+        # Skip version parsing if identical
+        if self.glob.version_site == self.glob.version_client:
+            return True
+
+        from packaging import version
+
         # Compare versions
         if version.parse(self.glob.version_site) > version.parse(self.glob.version_client):
             return False
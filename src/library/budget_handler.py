@@ -0,0 +1,191 @@
+# System Imports
+import os
+import shutil as su
+
+# Node-hour estimates for campaigns, enforcement of budget and allocation balance before submission,
+# and tracking of actual against estimated node-hours once results are captured
+class init(object):
+    def __init__(self, glob):
+        self.glob = glob
+
+    # Return expected runtime of current task in seconds and True if it came from runtime history
+    # Bench tasks use the predicted runtime quantile, capped at the time limit, other tasks the time limit
+    def estimate(self, task_type, time_limit):
+
+        if task_type == "bench":
+            predicted = self.glob.lib.predict.predict(self.glob.config['runtime'])[0]
+            if predicted:
+                return min(predicted, time_limit), True
+        return time_limit, False
+
+    # Estimated node-hours of task
+    def get_node_hours(self, task):
+        return task['nodes'] * task['est_runtime'] / 3600.
+
+    # Parse node-hour value from setting or argument
+    def to_node_hours(self, value, label):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            self.glob.lib.msg.error("invalid " + label + " '" + str(value) + "', expected node-hours.")
+
+    # Read remaining allocation balances from allocation_file, lines of 'account node-hours'
+    # Stand-in for the site allocation query, eg. written by a cron job
+    def read_balances(self):
+
+        balance_file = os.path.join(self.glob.bp_home, os.path.expandvars(self.glob.stg['allocation_file']))
+        if not os.path.isfile(balance_file):
+            self.glob.lib.msg.warning("Allocation file " + self.glob.lib.rel_path(balance_file) + " not found, balance not checked.")
+            return {}
+
+        balances = {}
+        with open(balance_file, 'r') as f:
+            for line in f:
+                fields = line.split("#")[0].split()
+                if len(fields) == 2:
+                    balances[fields[0]] = self.to_node_hours(fields[1], "balance for '" + fields[0] + "' in " + \
+                                                             self.glob.lib.rel_path(balance_file))
+        return balances
+
+    # Return list of [description, node-hour limit, account or None for all tasks]
+    def get_limits(self, tasks):
+
+        limits = []
+        if self.glob.args.budget and self.glob.args.budget != "report":
+            limits.append(["--budget", self.to_node_hours(self.glob.args.budget, "--budget"), None])
+        if self.glob.stg['budget']:
+            limits.append(["budget in settings.ini", self.to_node_hours(self.glob.stg['budget'], "budget"), None])
+
+        if self.glob.stg['allocation_file']:
+            balances = self.read_balances()
+            for account in sorted(set([task['account'] for task in tasks])):
+                if account in balances:
+                    limits.append(["allocation balance of " + account, balances[account], account])
+
+        return limits
+
+    # Return list of limits exceeded by tasks, with the node-hours charged to each
+    def get_exceeded(self, tasks, limits):
+
+        exceeded = []
+        for description, limit, account in limits:
+            total = sum([self.get_node_hours(task) for task in tasks if account in [None, task['account']]])
+            if total > limit:
+                exceeded.append([description, limit, total])
+        return exceeded
+
+    # Remove scripts and dirs written for unsubmitted task, a build's module file as well
+    def remove_task(self, task):
+
+        self.glob.task_graph.remove(task)
+        if self.glob.args.plan:
+            return
+
+        if task['type'] == "bench":
+            su.rmtree(task['working_path'], ignore_errors=True)
+        else:
+            mod_file = os.path.join(self.glob.stg['module_path'],
+                                    os.path.relpath(task['working_path'], self.glob.stg['build_path']) + ".lua")
+            self.glob.lib.files.cleanup([task['working_path'], mod_file])
+        self.glob.lib.msg.log("Removed unsubmitted " + task['type'] + " task " + task['id'] + ": " + task['label'])
+
+    # Drop bench tasks from the end of the campaign until within limits, and builds only their dropped benches needed
+    def trim(self, tasks, limits):
+
+        dependents = set([dep for task in tasks for dep in task['after_ok']])
+        kept = list(tasks)
+        dropped = []
+
+        while self.get_exceeded(kept, limits):
+            benches = [task for task in kept if task['type'] == "bench"]
+            if not benches:
+                break
+            kept.remove(benches[-1])
+            dropped.append(benches[-1])
+
+            needed = set([dep for task in kept for dep in task['after_ok']])
+            for task in [task for task in kept if task['id'] in dependents and task['id'] not in needed]:
+                kept.remove(task)
+                dropped.append(task)
+
+        return kept, dropped
+
+    # Print estimate of unsubmitted tasks, refuse or trim campaign if it exceeds budget or allocation balance
+    def check(self):
+
+        tasks = [task for task in self.glob.task_graph if not task['job_id']]
+        if not tasks:
+            return
+
+        total = sum([self.get_node_hours(task) for task in tasks])
+        history = len([task for task in tasks if task['from_history']])
+        self.glob.lib.msg.heading("Campaign estimate: " + str(len(tasks)) + " tasks, " + "{:.1f}".format(total) + \
+                                  " node-hours (" + str(history) + " from runtime history, " + \
+                                  str(len(tasks) - history) + " at time limit)")
+
+        limits = self.get_limits(tasks)
+        exceeded = self.get_exceeded(tasks, limits)
+        for description, limit, charged in exceeded:
+            self.glob.lib.msg.warning("Estimate of " + "{:.1f}".format(charged) + " node-hours exceeds " + description + \
+                                      " of " + "{:.1f}".format(limit) + " node-hours")
+
+        if not exceeded:
+            for description, limit, account in limits:
+                self.glob.lib.msg.low("Within " + description + " of " + "{:.1f}".format(limit) + " node-hours")
+            return
+
+        action = self.glob.stg['budget_action']
+        if action not in ["refuse", "trim"]:
+            self.glob.lib.msg.error("invalid budget_action '" + str(action) + "' in $BP_HOME/settings.ini, expected 'refuse' or 'trim'.")
+
+        if action == "trim":
+            kept, dropped = self.trim(tasks, limits)
+            if not self.get_exceeded(kept, limits) and kept:
+                for task in dropped:
+                    self.glob.lib.msg.high("Trimmed " + task['type'] + " task " + task['id'] + ": " + task['label'])
+                    self.remove_task(task)
+                self.glob.lib.msg.heading("Trimmed campaign to " + str(len(kept)) + " tasks, " + \
+                                          "{:.1f}".format(sum([self.get_node_hours(task) for task in kept])) + " node-hours")
+                return
+
+        # Nothing is submitted
+        for task in tasks:
+            self.remove_task(task)
+        self.glob.lib.msg.error("Campaign refused, " + str(len(tasks)) + " tasks not submitted. Reduce the sweep, " + \
+                                "raise the budget or set budget_action = trim.")
+
+    # Print actual against estimated node-hours of submitted campaigns, from event log
+    def report(self):
+
+        campaigns = {}
+        for record in self.glob.lib.event.records():
+            if record['type'] != "bench" or 'campaign' not in record:
+                continue
+            campaign = campaigns.setdefault(record['campaign'], {'submitted': 0, 'estimated': 0.,
+                                                                 'captured': 0, 'captured_est': 0., 'actual': 0.})
+            if record['event'] == "submitted":
+                campaign['submitted'] += 1
+                campaign['estimated'] += float(record.get('est_node_hours', 0))
+            elif record['event'] == "captured" and 'node_hours' in record:
+                campaign['captured'] += 1
+                campaign['captured_est'] += float(record.get('est_node_hours', 0))
+                campaign['actual'] += float(record['node_hours'])
+
+        if not campaigns:
+            self.glob.lib.msg.high("No campaign estimates found in " + self.glob.lib.rel_path(self.glob.lib.event.get_event_file()))
+            return
+
+        print("Node-hours by campaign, actual against estimated for captured results:")
+        print("| " + "Campaign".ljust(20) + "| " + " | ".join([col.rjust(9) for col in ["Submitted", "Estimated",
+                                                                                       "Captured", "Cap. est", "Actual", "Act/est"]]) + " |")
+        for name in sorted(campaigns):
+            campaign = campaigns[name]
+            ratio = "-"
+            if campaign['captured_est']:
+                ratio = "{:.2f}".format(campaign['actual'] / campaign['captured_est'])
+            print("| " + name.ljust(20) + "| " + " | ".join([str(campaign['submitted']).rjust(9),
+                                                             "{:.1f}".format(campaign['estimated']).rjust(9),
+                                                             str(campaign['captured']).rjust(9),
+                                                             "{:.1f}".format(campaign['captured_est']).rjust(9),
+                                                             "{:.1f}".format(campaign['actual']).rjust(9),
+                                                             ratio.rjust(9)]) + " |")
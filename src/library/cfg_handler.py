@@ -144,6 +144,27 @@ class init(object):
                     elif cfg_dict[sect][key].isdigit():
                         cfg_dict[sect][key] =  int(cfg_dict[sect][key])
 
+    # Defaults and checks for optional [watchdog] section: stall timeout (sec, 0 disables), heartbeat and fatal regexes
+    def check_watchdog(self, cfg_dict):
+        watchdog = cfg_dict['watchdog']
+        if not 'stall'      in watchdog.keys():   watchdog['stall']       = 0
+        if not 'heartbeat'  in watchdog.keys():   watchdog['heartbeat']   = ""
+        if not 'fatal'      in watchdog.keys():   watchdog['fatal']       = ""
+
+        try:
+            watchdog['stall'] = float(watchdog['stall'])
+        except ValueError:
+            self.glob.lib.msg.error("'stall' in [watchdog] section of " + self.glob.lib.rel_path(cfg_dict['metadata']['cfg_file']) + \
+                                " must be a number of seconds.")
+
+        for key in ['heartbeat', 'fatal']:
+            watchdog[key] = str(watchdog[key])
+            try:
+                re.compile(watchdog[key])
+            except re.error as e:
+                self.glob.lib.msg.error("invalid regex for '" + key + "' in [watchdog] section of " + \
+                                        self.glob.lib.rel_path(cfg_dict['metadata']['cfg_file']) + ": " + str(e))
+
     # Accept a 'overload' section in build/bench config file to overload global settings
     def add_overloads(self, overloads):
 
@@ -230,6 +251,7 @@ class init(object):
         if not 'result'           in cfg_dict.keys():              cfg_dict['result'] = {}
         if not 'files'            in cfg_dict.keys():              cfg_dict['files'] = {}
         if not 'overload'         in cfg_dict.keys():              cfg_dict['overload'] = {}
+        if not 'watchdog'         in cfg_dict.keys():              cfg_dict['watchdog'] = {}
 
         # --- Apply defaults ---
 
@@ -273,6 +295,8 @@ class init(object):
             else:
                 cfg_dict['config']['script_additions'] = os.path.join(self.glob.stg['template_path'], cfg_dict['config']['script_additions'])
         
+        self.check_watchdog(cfg_dict)
+
         # Parse architecture defaults config file 
         arch_file = self.find_cfg_file('arch', self.glob.stg['config_path'] + self.glob.stg['sl'] + self.glob.stg['arch_cfg_file'])
         arch_dict = self.glob.lib.files.read_cfg(arch_file)
@@ -377,12 +401,15 @@ class init(object):
         if not 'gpus'               in cfg_dict['runtime'].keys():  cfg_dict['runtime']['gpus']                 = 0
         if not 'hostfile'           in cfg_dict['runtime'].keys():  cfg_dict['runtime']['hostfile']             = ""
         if not 'hostlist'           in cfg_dict['runtime'].keys():  cfg_dict['runtime']['hostlist']             = ""
+        if not 'sweep'              in cfg_dict['runtime'].keys():  cfg_dict['runtime']['sweep']                = "default"
+        if not 'constraint'         in cfg_dict['runtime'].keys():  cfg_dict['runtime']['constraint']           = ""
 
         if not 'exe'                in cfg_dict['config'].keys():    cfg_dict['config']['exe']                  = ""
         if not 'template'           in cfg_dict['config'].keys():    cfg_dict['config']['template']             = ""
         if not 'collect_stats'      in cfg_dict['config'].keys():    cfg_dict['config']['collect_stats']        = False
         if not 'script_additions'   in cfg_dict['config'].keys():    cfg_dict['config']['script_additions']     = ""
         if not 'arch'               in cfg_dict['config'].keys():    cfg_dict['config']['arch']                 = ""
+        if not 'telemetry_interval' in cfg_dict['config'].keys():    cfg_dict['config']['telemetry_interval']   = 0
 
         if not 'description'        in cfg_dict['result'].keys():   cfg_dict['result']['description']           = ""
         if not 'output_file'        in cfg_dict['result'].keys():   cfg_dict['result']['output_file']           = ""
@@ -391,6 +418,7 @@ class init(object):
         if not 'general'          in cfg_dict.keys():              cfg_dict['general'] = {}
         if not 'files'            in cfg_dict.keys():              cfg_dict['files'] = {}
         if not 'overload'         in cfg_dict.keys():              cfg_dict['overload'] = {}
+        if not 'watchdog'         in cfg_dict.keys():              cfg_dict['watchdog'] = {}
 
         # Convert cfg keys to correct datatype
         self.get_val_types(cfg_dict)
@@ -422,6 +450,16 @@ class init(object):
 
             else:
                 cfg_dict['config']['script_additions'] = os.path.join(self.glob.stg['template_path'], cfg_dict['config']['script_additions'])
+
+        # Telemetry sample interval in seconds, 0 disables sampler
+        try:
+            cfg_dict['config']['telemetry_interval'] = float(cfg_dict['config']['telemetry_interval'])
+        except ValueError:
+            self.glob.lib.msg.error("'telemetry_interval' in [config] section of " + self.glob.lib.rel_path(cfg_dict['metadata']['cfg_file']) + \
+                                " must be a number of seconds.")
+
+        self.check_watchdog(cfg_dict)
+
         # Expression method
         if cfg_dict['result']['method'] == "expr":
             if not 'expr' in cfg_dict['result']:
@@ -442,21 +480,8 @@ class init(object):
         if not cfg_dict['runtime']['threads']:
             cfg_dict['runtime']['threads'] = self.glob.system['cores_per_socket']
 
-        # Handle comma-delimited lists
-        cfg_dict['runtime']['nodes']            = str(cfg_dict['runtime']['nodes']).split(",")
-        cfg_dict['runtime']['threads']          = str(cfg_dict['runtime']['threads']).split(",")
-        cfg_dict['runtime']['ranks_per_node']   = str(cfg_dict['runtime']['ranks_per_node']).split(",")
-        cfg_dict['runtime']['gpus']             = str(cfg_dict['runtime']['gpus']).split(",")
-
-        # num threads must equal num ranks
-        if not len(cfg_dict['runtime']['threads']) == len(cfg_dict['runtime']['ranks_per_node']):
-            if len(cfg_dict['runtime']['threads']) == 1:
-                cfg_dict['runtime']['threads'] = [cfg_dict['runtime']['threads'][0]] * len(cfg_dict['runtime']['ranks_per_node'])
-            elif len(cfg_dict['runtime']['ranks_per_node']) == 1:
-                cfg_dict['runtime']['ranks_per_node'] = [cfg_dict['runtime']['ranks_per_node'][0]] * len(cfg_dict['runtime']['threads'])
-            else:
-                self.glob.lib.msg.error("input mismatch: 'threads' and 'ranks_per_node' lists must be of equal length in " + \
-                                    self.glob.lib.rel_path(cfg_dict['metadata']['cfg_file']))
+        # Handle comma-delimited lists and ranges
+        self.glob.lib.sweep.parse_axes(cfg_dict)
     
         # Require label if code not set
         if not cfg_dict['requirements']['code'] and not cfg_dict['config']['bench_label']:
@@ -0,0 +1,246 @@
+# System Imports
+import json
+import os
+import sys
+
+# Local Imports
+import src.context as context
+
+# Task graph for a suite: build and bench tasks are added as scripts are generated, then submitted together
+# in topological order with precise afterok edges and max_build_jobs/max_running_jobs concurrency windows
+class init(object):
+    def __init__(self, glob):
+        self.glob = glob
+
+    # Placeholder task_id written to reports until the task is submitted, unique to this process so a
+    # placeholder left behind by an earlier or concurrent invocation is never replaced with our job IDs
+    def get_placeholder(self, idx):
+        return "queued_" + str(os.getpid()) + "_" + str(idx).zfill(5)
+
+    # Return True if task_id belongs to a task in the graph that has not been submitted yet
+    def is_queued(self, task_id):
+        for task in self.glob.task_graph:
+            if task['id'] == str(task_id):
+                return not task['job_id']
+        return False
+
+    # Add task for the current build/bench to the graph, returns placeholder task_id
+    def add_task(self, task_type, job_limit):
+
+        task_id = self.get_placeholder(len(self.glob.task_graph) + 1)
+        working_path = self.glob.config['metadata']['working_path']
+
+        nodes = 1
+        report_file = self.glob.stg['build_report_file']
+        if task_type == "bench":
+            nodes = int(self.glob.config['runtime']['nodes'])
+            report_file = self.glob.stg['bench_report_file']
+
+        runtime = self.glob.lib.sched.runtime_to_sec(self.glob.sched['sched'].get('runtime', ""))
+        est_runtime, from_history = self.glob.lib.budget.estimate(task_type, runtime)
+
+        task = {'id':           task_id,
+                'type':         task_type,
+                'label':        os.path.basename(working_path),
+                'script':       os.path.join(working_path, self.glob.job_file),
+                'working_path': working_path,
+                'stdout':       os.path.join(working_path, self.glob.config['config']['stdout']),
+                'stderr':       os.path.join(working_path, self.glob.config['config']['stderr']),
+                'nodes':        nodes,
+                'runtime':      runtime,
+                'est_runtime':  est_runtime,
+                'from_history': from_history,
+                'account':      self.glob.sched['sched'].get('account', ""),
+                'limit':        job_limit,
+                'after_ok':     [str(dep) for dep in self.glob.ok_dep_list],
+                'after_any':    [],
+                'files':        [os.path.join(working_path, report_file)],
+                'history':      None,
+                'assets':       self.glob.config['metadata'].get('assets', {}) if task_type == "bench" else {},
+                'job_id':       None}
+
+        # Keep resolved parameters for plan output
+        if self.glob.args.plan:
+            task['params'] = {section: context.to_dict(self.glob.config[section]) for section in self.glob.config}
+            task['params']['sched'] = context.to_dict(self.glob.sched['sched'])
+
+        self.glob.task_graph.append(task)
+        self.glob.lib.msg.log("Added " + task_type + " task " + task_id + " to task graph: " + task['label'])
+
+        for dep in task['after_ok']:
+            self.glob.lib.msg.low("Creating afterok dependency on " + dep)
+            self.glob.lib.event.emit("dependency", task_type, working_path, task_id, info={'kind': "afterok", 'on': dep})
+
+        return task_id
+
+    # Return task in graph with task_id, None if not found
+    def get_task(self, task_id):
+        for task in self.glob.task_graph:
+            if task['id'] == str(task_id):
+                return task
+        return None
+
+    # Order tasks so that every task follows the tasks it depends on
+    def topo_order(self):
+
+        order = []
+        done = set()
+        pending = [task for task in self.glob.task_graph if not task['job_id']]
+        queued = set([task['id'] for task in pending])
+
+        while pending:
+            ready = [task for task in pending if all(dep not in queued or dep in done for dep in task['after_ok'])]
+            if not ready:
+                self.glob.lib.msg.error("Cyclic dependency found in task graph: " + ", ".join([task['id'] for task in pending]))
+
+            for task in ready:
+                order.append(task)
+                done.add(task['id'])
+                pending.remove(task)
+
+        return order
+
+    # Seed concurrency window with queued/running jobs from previous invocations
+    def init_window(self, job_label, default_runtime):
+        return [[default_runtime, str(jobid)] for jobid in self.glob.lib.sched.get_active_jobids(job_label)]
+
+    # Assign task to a slot in its concurrency window, returns estimated start time
+    def place_task(self, task, window, finish):
+
+        # Earliest start once all afterok dependencies are expected to finish
+        dep_ready = max([finish[dep] for dep in task['after_ok'] if dep in finish] + [0])
+
+        # Free slot available
+        if len(window) < task['limit']:
+            window.append([dep_ready + task['runtime'], task['id']])
+            return dep_ready
+
+        # Pick slot that lets this task start soonest, prefer the latest-finishing of equal slots (best fit)
+        best = min(window, key=lambda slot: (max(slot[0], dep_ready), -slot[0]))
+        start = max(best[0], dep_ready)
+
+        task['after_any'].append(best[1])
+        self.glob.lib.msg.low("Max " + task['type'] + " jobs reached, " + task['id'] + " waits on " + best[1])
+        self.glob.lib.event.emit("dependency", task['type'], task['working_path'], task['id'], info={'kind': "afterany", 'on': best[1]})
+
+        best[0] = start + task['runtime']
+        best[1] = task['id']
+        return start
+
+    # Compute afterany window edges for all unsubmitted tasks, returns tasks in submission order
+    def schedule(self):
+
+        order = self.topo_order()
+        default_runtime = self.glob.lib.sched.runtime_to_sec("")
+
+        windows = {'build': self.init_window('_build', default_runtime),
+                   'bench': self.init_window('_bench', default_runtime)}
+        finish = {}
+
+        for task in order:
+            task['after_any'] = []
+            task['est_start'] = self.place_task(task, windows[task['type']], finish)
+            finish[task['id']] = task['est_start'] + task['runtime']
+
+        return order
+
+    # Replace placeholder task IDs with job IDs in task reports
+    def update_files(self, file_list, id_map):
+
+        for file_path in file_list:
+            if not os.path.isfile(file_path):
+                continue
+
+            with open(file_path, 'r') as f:
+                content = f.read()
+
+            for placeholder in id_map:
+                content = content.replace(placeholder, id_map[placeholder])
+
+            with open(file_path + ".tmp", 'w') as f:
+                f.write(content)
+            os.replace(file_path + ".tmp", file_path)
+
+    # Map dependency list to submitted job IDs
+    def resolve(self, dep_list, id_map):
+        return [id_map[dep] if dep in id_map else dep for dep in dep_list]
+
+    # Write execution plan as JSON to file, or stdout if '-'
+    def write_plan(self, order):
+
+        tasks = []
+        for task in order:
+            tasks.append({'id':             task['id'],
+                          'type':           task['type'],
+                          'label':          task['label'],
+                          'working_path':   task['working_path'],
+                          'script':         task['script'],
+                          'nodes':          task['nodes'],
+                          'runtime':        task['runtime'],
+                          'node_hours':     task['nodes'] * task['runtime'] / 3600.,
+                          'est_node_hours': self.glob.lib.budget.get_node_hours(task),
+                          'est_start':      task['est_start'],
+                          'after_ok':       task['after_ok'],
+                          'after_any':      task['after_any'],
+                          'params':         task['params']})
+
+        plan = {'system':       self.glob.system['system'],
+                'user':         self.glob.user,
+                'time':         self.glob.stg['time_str'],
+                'tasks':        tasks,
+                'node_hours':   sum([task['node_hours'] for task in tasks]),
+                'est_node_hours': sum([task['est_node_hours'] for task in tasks]),
+                'makespan':     max([task['est_start'] + task['runtime'] for task in tasks] + [0])}
+
+        if self.glob.args.plan == "-":
+            json.dump(plan, sys.__stdout__, indent=1, default=str)
+            sys.__stdout__.write("\n")
+        else:
+            with open(self.glob.args.plan, 'w') as f:
+                json.dump(plan, f, indent=1, default=str)
+
+        self.glob.lib.msg.high("Plan contains " + str(len(tasks)) + " tasks, " + "{:.1f}".format(plan['node_hours']) + " node-hours")
+
+    # Submit all tasks in graph
+    def submit(self):
+
+        # Estimate node-hours, refuse or trim campaign over budget
+        self.glob.lib.budget.check()
+
+        # Fetch input assets of the tasks left to submit while they wait in the queue
+        self.glob.lib.files.start_prefetch([task for task in self.glob.task_graph if not task['job_id']])
+
+        order = self.schedule()
+
+        # Plan mode: output plan instead of submitting
+        if self.glob.args.plan:
+            self.write_plan(order)
+            return
+
+        if not order:
+            return
+
+        self.glob.lib.msg.heading("Submitting " + str(len(order)) + " tasks to scheduler")
+
+        id_map = {task['id']: task['job_id'] for task in self.glob.task_graph if task['job_id']}
+
+        for task in order:
+
+            after_ok  = self.resolve(task['after_ok'], id_map)
+            after_any = self.resolve(task['after_any'], id_map)
+
+            task['job_id'] = self.glob.lib.sched.submit(task['script'], self.glob.lib.sched.get_dep_str(after_ok, after_any),
+                                                        task['stdout'], task['stderr'])
+            id_map[task['id']] = task['job_id']
+            self.glob.lib.msg.high("Task " + task['id'] + " submitted as job " + str(task['job_id']) + ": " + task['label'])
+            self.glob.lib.event.emit("submitted", task['type'], task['working_path'], task['job_id'],
+                                    info={'placeholder': task['id'], 'after_ok': after_ok, 'after_any': after_any,
+                                          'campaign': self.glob.stg['time_str'],
+                                          'est_node_hours': self.glob.lib.budget.get_node_hours(task)})
+
+            # Write job IDs into report files
+            self.update_files(task['files'], id_map)
+
+            # Record submitted task in history
+            if task['history']:
+                self.glob.lib.files.append_cmd_history(task['history'].replace(task['id'], str(task['job_id'])))
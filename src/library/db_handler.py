@@ -2,19 +2,25 @@
 # System Imports
 import sys
 
-try:
-    import psycopg2
-    from psycopg2 import sql
-except ImportError:
-    pass
+# psycopg2 is imported on first db connection, to keep CLI startup fast
+psycopg2 = None
 
 class init(object):
     def __init__(self, glob):
         self.glob = glob
         
-    # Create db connection
-    def connect(self):
-        
+    # Create db connection, if not required a failure is logged and False returned instead of quitting
+    def connect(self, required=True):
+
+        global psycopg2
+        try:
+            import psycopg2
+        except ImportError:
+            if not required:
+                self.glob.lib.msg.log("No psycopg2 module available, skipping db query.")
+                return False
+            self.glob.lib.msg.error("No psycopg2 module available, db access is not available!")
+
         # Create db connection
         try:
             self.conn = psycopg2.connect(
@@ -25,25 +31,33 @@ class init(object):
                             )
 
         except Exception as err:
+            if not required:
+                self.glob.lib.msg.log("psycopg2 connect() ERROR: " + str(err))
+                return False
             self.glob.lib.msg.error(["psycopg2 connect() ERROR: ", err])
 
         self.cur = self.conn.cursor()
+        return True
 
     # Close db connection
     def disconnect(self):
         self.cur.close()
         self.conn.close()
 
-    # Try to run query and return result
-    def exec_query(self, statement):
+    # Try to run query and return result, None if not required and the query failed
+    def exec_query(self, statement, required=True):
 
-        self.connect()
+        if not self.connect(required):
+            return None
 
         try:
             self.cur.execute(statement)
             rows = self.cur.fetchall()
         except psycopg2.Error as e:
-            self.glob.lib.msg.error(e)
+            if required:
+                self.glob.lib.msg.error(e)
+            self.glob.lib.msg.log("Query failed: " + str(e))
+            rows = None
 
         self.disconnect()
 
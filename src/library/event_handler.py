@@ -0,0 +1,117 @@
+# System Imports
+import json
+import math
+import os
+import time
+
+# Append-only JSON lifecycle event log in $BP_HOME/log, one event per line
+class init(object):
+    def __init__(self, glob):
+        self.glob = glob
+
+        # Lifecycle stage pairs reported by --events
+        self.intervals = [['created',   'rendered',     "render"],
+                          ['rendered',  'submitted',    "submit"],
+                          ['submitted', 'started',      "queue wait"],
+                          ['started',   'ended',        "run"],
+                          ['ended',     'captured',     "capture lag"],
+                          ['created',   'captured',     "end to end"]]
+
+    # Path to event log
+    def get_event_file(self):
+        return os.path.join(self.glob.stg['log_path'], self.glob.stg['events_file'])
+
+    # Task identifier: build path relative to $BP_APPS, bench result dir name
+    def get_task(self, task_type, working_path):
+        if task_type == "build":
+            return os.path.relpath(working_path, self.glob.stg['build_path'])
+        return os.path.basename(working_path)
+
+    # Append event to log, timestamp defaults to now (plan mode writes nothing)
+    def emit(self, event, task_type, working_path, job_id="", timestamp=None, info=None):
+
+        if self.glob.args.plan:
+            return
+
+        record = {'time':   timestamp if timestamp else time.time(),
+                  'event':  event,
+                  'type':   task_type,
+                  'task':   self.get_task(task_type, working_path),
+                  'job_id': str(job_id),
+                  'user':   self.glob.user,
+                  'host':   self.glob.hostname}
+        if info:
+            record.update(info)
+
+        try:
+            with open(self.get_event_file(), 'a') as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            self.glob.lib.msg.log("Failed to write event '" + event + "': " + str(e))
+
+    # Yield event records, skipping malformed lines
+    def records(self):
+
+        event_file = self.get_event_file()
+        if not os.path.isfile(event_file):
+            return
+
+        with open(event_file, 'r') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    # Read events, returns {(type, task): {event: first time}}
+    def read(self, task_type):
+
+        tasks = {}
+        for record in self.records():
+            if task_type not in ["all", record['type']]:
+                continue
+
+            events = tasks.setdefault((record['type'], record['task']), {})
+            if record['event'] not in events:
+                events[record['event']] = float(record['time'])
+
+        return tasks
+
+    # Nearest-rank percentile of sorted list
+    def percentile(self, values, pct):
+        return values[max(0, int(math.ceil(pct / 100. * len(values))) - 1)]
+
+    # Format seconds for table
+    def duration(self, sec):
+        if sec < 120:
+            return "{:.1f}s".format(sec)
+        if sec < 7200:
+            return "{:.1f}m".format(sec / 60)
+        return "{:.1f}h".format(sec / 3600)
+
+    # Print latency percentiles between lifecycle stages
+    def report(self):
+
+        task_type = self.glob.args.events
+        if task_type not in ["build", "bench", "all"]:
+            self.glob.lib.msg.error("Invalid input '" + task_type + "', --events accepts 'build', 'bench' or 'all'")
+
+        tasks = self.read(task_type)
+        if not tasks:
+            self.glob.lib.msg.high("No events found in " + self.glob.lib.rel_path(self.get_event_file()))
+            return
+
+        print("Lifecycle latency for " + str(len(tasks)) + " tasks (" + task_type + "):")
+        print("| " + "Interval".ljust(32) + "| " + "Count".rjust(6) + " | " + " | ".join([col.rjust(8) for col in ["p50", "p90", "p99", "max"]]) + " |")
+
+        for start, end, label in self.intervals:
+            values = sorted([events[end] - events[start] for events in tasks.values()
+                                                            if start in events and end in events and events[end] >= events[start]])
+            if not values:
+                continue
+
+            print("| " + (label + " (" + start + "->" + end + ")").ljust(32) + "| " + str(len(values)).rjust(6) + " | " + \
+                    " | ".join([self.duration(val).rjust(8) for val in [self.percentile(values, 50),
+                                                                       self.percentile(values, 90),
+                                                                       self.percentile(values, 99),
+                                                                       values[-1]]]) + " |")
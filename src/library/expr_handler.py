@@ -36,7 +36,7 @@ class init(object):
     # Evaulate arithamtic in string 
     def evaluate_arithmatic(self, expr):
 
-        self.glob.lib.msg.log("Evaluating arithmatic: " + str(expr) )
+        self.glob.lib.msg.log("Evaluating arithmatic: %s", expr)
         try:
             return int(eval(expr.replace("\\", "")))
         except:
@@ -108,7 +108,7 @@ class init(object):
     # Evaluate logical expression
     def eval_logic_expr(self, expr):
 
-        self.glob.lib.msg.log("Evaluating logical " +  str(expr))
+        self.glob.lib.msg.log("Evaluating logical %s", expr)
         try:
             return eval(expr)
         except:
@@ -141,7 +141,7 @@ class init(object):
     # Evaluate a rule's condition, apply updates 
     def eval_rule(self, rule):
 
-        self.glob.lib.msg.log("Evaluating rule: " + str(rule))
+        self.glob.lib.msg.log("Evaluating rule: %s", rule)
 
         rule = rule.replace("AND", "and")
         rule = rule.replace("OR", "or")
@@ -1,21 +1,22 @@
 # System imports
-import cgi
 import configparser as cp
-from ftplib import FTP
 import glob as gb
+import hashlib
+import json
 import os
 import pwd
+import shlex
 import shutil as su
-import tarfile
+import subprocess
+import sys
 import time
-from urllib.request import urlopen
-from urllib.request import urlretrieve
+
+# Network and archive modules are imported when needed, to keep CLI startup fast
 
 
 class init(object):
     def __init__(self, glob):
         self.glob = glob
-        self.get_client_version()
 
     # Read non-cfg file into list
     def read(self, file_path):
@@ -211,6 +212,39 @@ class init(object):
         if clean:
             os.remove(src)
 
+    # SHA-256 of file contents
+    def sha256(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # Add file to content-addressed store, returns digest, blob path and whether the blob is new
+    # Blobs are written under a tmp name and renamed, concurrent captures storing the same content are safe
+    def store_blob(self, store_path, src):
+        digest = self.sha256(src)
+        blob = os.path.join(store_path, digest[:2], digest)
+        if os.path.isfile(blob):
+            return digest, blob, False
+
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        tmp = blob + "." + str(os.getpid()) + ".tmp"
+        su.copyfile(src, tmp)
+        # Blobs are shared by hardlinks, keep them read-only
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, blob)
+        return digest, blob, True
+
+    # Hardlink file to dest, copy if hardlinks are unsupported, cross-device or at the link limit
+    def link_or_copy(self, src, dest):
+        tmp = dest + "." + str(os.getpid()) + ".tmp"
+        try:
+            os.link(src, tmp)
+        except OSError:
+            su.copyfile(src, tmp)
+        os.replace(tmp, dest)
+
     # Extract tar file list to working dir
     def untar_file(self, src):
 
@@ -223,6 +257,8 @@ class init(object):
                 self.glob.lib.msg.error("Input file '" + src + "' not found in repo " + \
                                         self.glob.lib.rel_path(self.glob.stg['local_repo']))
 
+            import tarfile
+
             # Extract to working dir
             tar = tarfile.open(src)
             tar.extractall(self.glob.config['metadata']['copy_path'])
@@ -301,6 +337,7 @@ class init(object):
 
         # Test if URL is FTP
         if "ftp" in url:
+            from ftplib import FTP
 
             try:
                 # Check server is reachable
@@ -316,6 +353,8 @@ class init(object):
 
         # Assume HTTP
         else:
+            import cgi
+            from urllib.request import urlopen
 
             retries = 0
             while retries < 3:
@@ -353,6 +392,7 @@ class init(object):
 
         # Download now
         if self.glob.stg['sync_staging']:
+            from urllib.request import urlretrieve
             try:
                 self.glob.lib.msg.low("Fetching file " + filename + "...")
                 urlretrieve(url, dest)
@@ -403,10 +443,104 @@ class init(object):
             self.glob.lib.expr.eval_dict(self.glob.config['files'])
 
             # Parse through supported file operations - local, download
+            # 'sha256' holds name:digest pairs used to verify assets, not assets
+            assets      = []
+            checksums   = []
             for op in self.glob.config['files'].keys():
 
-                assets = self.glob.config['files'][op].split(',')
-                [self.glob.stage_ops.append("stage " + asset) for asset in assets]
+                values = [value.strip() for value in str(self.glob.config['files'][op]).split(',') if value.strip()]
+                if op == "sha256":
+                    for value in values:
+                        if ":" not in value:
+                            self.glob.lib.msg.error("invalid sha256 entry '" + value + "' in [files], expected name:digest")
+                    checksums += values
+                else:
+                    assets += values
+
+            # All assets staged by one command, fetched in parallel
+            if assets:
+                self.glob.stage_ops.append(self.get_staging_cmd(assets, checksums))
+
+                # Fetched ahead of the job by start_prefetch, recorded on each task in the graph
+                self.glob.config['metadata']['assets'] = dict([[asset, checksums] for asset in assets])
+
+    # Command to run staging.py from job script
+    def get_staging_cmd(self, assets, checksums, prefetch=None):
+        cmd = sys.executable + " " + os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "staging.py") + \
+                " --repo " + self.glob.stg['local_repo'] + \
+                " --jobs " + str(self.glob.stg['stage_jobs'])
+        if not self.glob.stg['stage_link'] == "auto":
+            if self.glob.stg['stage_link'] not in ["reflink", "symlink", "copy"]:
+                self.glob.lib.msg.error("invalid stage_link '" + str(self.glob.stg['stage_link']) + \
+                                        "' in $BP_HOME/settings.ini, expected auto, reflink, symlink or copy.")
+            cmd += " --link " + self.glob.stg['stage_link']
+        if self.get_repo_quota():
+            cmd += " --quota " + str(self.get_repo_quota())
+        if prefetch:
+            cmd += " --prefetch " + prefetch
+        if checksums:
+            cmd += " --sha256 " + " ".join(checksums)
+        return cmd + " -- " + " ".join([shlex.quote(asset) for asset in assets])
+
+    # repo_quota setting in bytes, accepts K/M/G/T suffix, 0 for no quota
+    def get_repo_quota(self):
+        quota = str(self.glob.stg['repo_quota']).strip().upper().rstrip("B")
+        scale = {'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+        try:
+            if quota and quota[-1] in scale:
+                return int(float(quota[:-1]) * scale[quota[-1]])
+            return int(float(quota or 0))
+        except ValueError:
+            self.glob.lib.msg.error("invalid repo_quota '" + str(self.glob.stg['repo_quota']) + \
+                                    "' in $BP_HOME/settings.ini, expected size such as 500G.")
+
+    # Fetch staged assets of tasks about to be submitted into $BP_REPO from this host in the background, while
+    # the jobs wait in the queue
+    # The in-job staging step then finds them in the repo, or waits on the prefetcher's lock
+    # Status file is linked from each result dir via .bp_prefetch, for --listResults
+    def start_prefetch(self, tasks):
+
+        assets = {}
+        for task in tasks:
+            assets.update(task['assets'])
+
+        if not assets or not self.glob.stg['prefetch'] or self.glob.args.plan or self.glob.stg['dry_run']:
+            return
+
+        checksums = []
+        for asset in assets:
+            checksums += [entry for entry in assets[asset] if entry not in checksums]
+
+        status   = os.path.join(self.glob.stg['log_path'], "prefetch_" + self.glob.stg['time_str'] + ".json")
+        log_file = os.path.join(self.glob.stg['log_path'], "prefetch_" + self.glob.stg['time_str'] + ".log")
+        cmd = self.get_staging_cmd(list(assets), checksums, status)
+
+        self.glob.lib.msg.log("Starting prefetch: " + cmd)
+        try:
+            with open(log_file, 'w') as out:
+                subprocess.Popen(shlex.split(cmd), stdout=out, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                 cwd=self.glob.stg['local_repo'], start_new_session=True)
+        except OSError as e:
+            self.glob.lib.msg.warning("Unable to start asset prefetch: " + str(e))
+            return
+
+        for task in tasks:
+            if task['assets'] and os.path.isdir(task['working_path']):
+                with open(os.path.join(task['working_path'], self.glob.stg['prefetch_file']), 'w') as f:
+                    f.write(status + "\n")
+
+        self.glob.lib.msg.high("Prefetching " + str(len(assets)) + " input assets into " + \
+                                self.glob.stg['local_repo_env'] + ", log: " + self.glob.lib.rel_path(log_file))
+
+    # Read prefetch status for result dir, returns dict or None
+    def get_prefetch_status(self, result_path):
+        try:
+            with open(os.path.join(result_path, self.glob.stg['prefetch_file']), 'r') as f:
+                status_path = f.read().strip()
+            with open(status_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
 
 #                # Copy local file [from BP_REPO or local path]
 #                if op == 'local':
@@ -428,10 +562,20 @@ class init(object):
                 f.write(line)
 
     # Write command line to history file
+    # Tasks waiting in the task graph are recorded once submitted, with their job ID
     def write_cmd_history(self):
+        line = self.glob.lib.misc.get_input_str()
+        task = self.glob.lib.dag.get_task(self.glob.task_id)
+        if task and not task['job_id']:
+            task['history'] = line
+            return
+        self.append_cmd_history(line)
+
+    # Append line to shared history file, never rewritten
+    def append_cmd_history(self, line):
         history_file = os.path.join(self.glob.bp_home, ".history")
         with open(history_file, "a") as hist:
-            hist.write(self.glob.lib.misc.get_input_str() + "\n")
+            hist.write(line + "\n")
 
     # Get list of config files by type
     def get_cfg_list(self, cfg_type):
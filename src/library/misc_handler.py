@@ -198,6 +198,12 @@ class init(object):
         print("-------------------------------------------")
         print()
 
+        # Build stopped early by watchdog
+        abort_reason = self.glob.lib.get_abort_reason(app_path)
+        if abort_reason:
+            print("\033[1;31mBuild aborted by watchdog\033[0m, " + abort_reason)
+            print()
+
         status = ""
         gap = max(len(report_dict['build']['exe_file']) + 9, 20)
 
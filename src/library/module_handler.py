@@ -23,9 +23,11 @@ class init(object):
             args = [args]
        
         try:
-            proc = subprocess.Popen(([os.path.join(os.environ.get('LMOD_DIR'),'lmod')] + args), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            status         = proc.returncode
-            stdout, stderr = proc.communicate()
+            # Profile by lmod subcommand (first non-flag arg)
+            with self.glob.lib.prof.command("lmod:" + [arg for arg in args if not arg.startswith("-")][0]):
+                proc = subprocess.Popen(([os.path.join(os.environ.get('LMOD_DIR'),'lmod')] + args), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                status         = proc.returncode
+                stdout, stderr = proc.communicate()
             err_out        = sys.stderr
             if (os.environ.get('LMOD_REDIRECT','@redirect@') != 'no'):
                 err_out=sys.stdout
@@ -41,6 +43,11 @@ class init(object):
         if module_use:
             os.environ["MODULEPATH"] = module_use + ":" + os.environ["MODULEPATH"]
 
+        # Plan mode does not query Lmod
+        if self.glob.args.plan:
+            self.glob.default_module_list = []
+            return
+
         self.glob.default_module_list = self.lmod_query(['-t', '-d', 'av']).split("\n")
 
 
@@ -61,8 +68,8 @@ class init(object):
     # Check if module is available on the system
     def check_module_exists(self, key, value):
 
-        # Module check enabled
-        if self.glob.stg['check_modules']:
+        # Module check enabled (skipped in plan mode)
+        if self.glob.stg['check_modules'] and not self.glob.args.plan:
 
             # If module is non Null
             if value:
@@ -138,7 +145,7 @@ class init(object):
         pop_dict = {**mod, **self.glob.config['metadata'], **self.glob.config['general'], **self.glob.config['config'], **{'site_path': self.glob.site_path}}
 
         for key in pop_dict:
-            self.glob.lib.msg.log("replace " + "<<<" + key + ">>> with " + str(pop_dict[key]))
+            self.glob.lib.msg.log("replace <<<%s>>> with %s", key, pop_dict[key])
             mod_obj = [line.replace("<<<" + str(key) + ">>>", str(pop_dict[key])) for line in mod_obj]
         
         return mod_obj
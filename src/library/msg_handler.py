@@ -1,7 +1,9 @@
 
 # System imports
 import copy
+import logging
 import os
+import random
 import signal
 import sys
 import time
@@ -36,21 +38,22 @@ class init(object):
             return [message]
         return message
    
-    # Write message to log 
-    def log(self, message):
+    # Write debug message to log, %-style args are only formatted if the record is kept
+    def log(self, message, *args):
         # If initialized
         if self.glob.log:
-            self.glob.log.debug(message)
+            self.glob.log.debug(message, *args)
 
     # Log and print to stdout
-    def log_and_print(self, message, priority):
+    def log_and_print(self, message, priority, level=logging.INFO):
         message = self.listify(message)
 
         # For each line of message
         for line in message:
             if line:
                 # Write to log 
-                self.log(line)
+                if self.glob.log:
+                    self.glob.log.log(level, line)
                 # Print to stdout if debug=True or high priority message
                 if self.glob.stg['debug'] or priority: 
                     print(line)
@@ -65,11 +68,11 @@ class init(object):
 
     # Low priority message, conditional on debug=True
     def low(self, message):
-        self.log_and_print(message, False)            
+        self.log_and_print(message, False, logging.DEBUG)
 
     # Print message to log and stdout then continue
     def warning(self, message):
-        self.log_and_print([self.glob.warning] + self.listify(message), True)
+        self.log_and_print([self.glob.warning] + self.listify(message), True, logging.WARNING)
 
     # Print message to log and stdout then quit
     def error(self, message):
@@ -80,7 +83,7 @@ class init(object):
                             [self.glob.error] + 
                             self.listify(message) +
                             ["Check log for details."],
-                            True)
+                            True, logging.ERROR)
 
         # Clean tmp files
         if self.glob.stg['clean_on_fail']:
@@ -197,15 +200,12 @@ class init(object):
             time.sleep(1)
         print()
 
-	# Print random hint
-	def print_hint(self):
-	"""
+    # Print random hint
+    def print_hint(self):
 
-	"""
+        if self.glob.stg['print_hint']:
+            with open(os.path.join(self.glob.site_path, "hints.txt")) as hint_file:
+                hints = hint_file.readlines()
 
-		if self.glob.stg['print_hint']:
-		    with open(os.path.join(bp_site, "hints.txt")) as hint_file:
-		        hints = hint_file.readlines()
-
-	    	hint = hints[rand(0:len(hints))]
-			print(hint)
+            if hints:
+                print(random.choice(hints).strip())
@@ -27,7 +27,7 @@ class init(object):
 
         if overload_key in search_dict.keys():
 
-            self.glob.lib.msg.log("Overload key '" + overload_key + "' found in dict!")
+            self.glob.lib.msg.log("Overload key '%s' found in dict!", overload_key)
             old = search_dict[overload_key]
 
             # If cfg value is a list, skip datatype check
@@ -73,7 +73,7 @@ class init(object):
 
         # For each overload key
         for overload_key in list(self.glob.overload_dict):
-            self.glob.lib.msg.log("Overloading key " + overload_key + "...")            
+            self.glob.lib.msg.log("Overloading key %s...", overload_key)
             # Search for match in searchable dicts
             for search_dict in self.search_space:
                 # Attempt to replace matching key
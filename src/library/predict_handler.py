@@ -0,0 +1,140 @@
+# System Imports
+import math
+
+# Predict bench job time limits from the elapsed_time of completed runs captured to the database
+class init(object):
+    def __init__(self, glob):
+        self.glob = glob
+
+        # Completed runs per (system, code, dataset), queried once and shared by task contexts
+        self.history = {}
+
+        # Most recent runs used for each prediction
+        self.max_runs = 100
+        # Minimum headroom added above the predicted quantile, in seconds
+        self.min_margin = 300
+
+    # Read quantile and margin from settings
+    def get_settings(self):
+        try:
+            quantile = float(self.glob.stg['runtime_quantile'])
+            margin   = float(self.glob.stg['runtime_margin'])
+            if not 0 < quantile <= 1 or margin < 0:
+                raise ValueError
+        except ValueError:
+            self.glob.lib.msg.error("invalid runtime_quantile '" + str(self.glob.stg['runtime_quantile']) + \
+                                    "' or runtime_margin '" + str(self.glob.stg['runtime_margin']) + \
+                                    "' in $BP_HOME/settings.ini, expected a quantile in (0, 1] and a fraction >= 0.")
+        return quantile, margin
+
+    # Return list of (nodes, ranks_per_node, threads, elapsed seconds) of completed runs, most recent first
+    def get_history(self, code, dataset):
+
+        key = (self.glob.system['system'], code, dataset)
+        if key in self.history:
+            return self.history[key]
+
+        clean = lambda value: str(value).replace("'", "").replace("\"", "")
+        statement = "SELECT r.nodes, r.ranks, r.threads, r.elapsed_time FROM " + self.glob.stg['result_table'] + " r" + \
+                    " LEFT JOIN " + self.glob.stg['app_table'] + " a ON r.app_id = a.app_id" + \
+                    " WHERE r.system='" + clean(key[0]) + "' AND r.dataset='" + clean(dataset) + "'" + \
+                    " AND r.job_status='COMPLETED' AND r.elapsed_time IS NOT NULL"
+        if code:
+            statement += " AND a.code='" + clean(code) + "'"
+        statement += " ORDER BY r.capture_time DESC LIMIT " + str(self.max_runs) + ";"
+
+        # Prediction is optional, an unreachable database leaves the cfg time limit in place
+        rows = self.glob.lib.db.exec_query(statement, False) or []
+
+        runs = []
+        for row in rows:
+            try:
+                run = tuple([int(float(value)) for value in row])
+            except (TypeError, ValueError):
+                continue
+            if run[0] > 0 and run[3] > 0:
+                runs.append(run)
+
+        self.glob.lib.msg.log("Found " + str(len(runs)) + " completed runs of " + (code or "-") + "/" + dataset + \
+                              " on " + key[0] + " in database")
+        self.history[key] = runs
+        return runs
+
+    # Quantile of values, interpolating between closest ranks
+    def quantile(self, values, q):
+        values = sorted(values)
+        pos = (len(values) - 1) * q
+        low = int(pos)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (pos - low)
+
+    # Fit log(time) = a + b*log(nodes) across node counts, return quantile of time at nodes, None if under 2 node counts
+    def fit(self, runs, nodes, q):
+
+        if len(set([run[0] for run in runs])) < 2:
+            return None
+
+        xs = [math.log(run[0]) for run in runs]
+        ys = [math.log(run[3]) for run in runs]
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+
+        b = sum([(x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)]) / sum([(x - mean_x) ** 2 for x in xs])
+        # Never extrapolate better than ideal strong scaling
+        b = max(b, -1.)
+        a = mean_y - b * mean_x
+
+        # Spread of runs about the fit gives the quantile
+        residuals = [y - (a + b * x) for x, y in zip(xs, ys)]
+        return math.exp(a + b * math.log(nodes) + self.quantile(residuals, q))
+
+    # Return quantile of elapsed time in seconds for task and description of its source, None if there is no history
+    def predict(self, runtime):
+
+        quantile = self.get_settings()[0]
+        try:
+            nodes, ranks, threads = [int(runtime[key]) for key in ['nodes', 'ranks_per_node', 'threads']]
+        except (KeyError, ValueError):
+            return None, None
+
+        runs = self.get_history(self.glob.config['requirements'].get('code', ""), self.glob.config['config']['dataset'])
+        if not runs:
+            return None, None
+
+        pct = "p" + "{:g}".format(quantile * 100)
+
+        # Same nodes, ranks and threads
+        exact = [run[3] for run in runs if run[:3] == (nodes, ranks, threads)]
+        if exact:
+            return self.quantile(exact, quantile), pct + " of " + str(len(exact)) + " runs"
+
+        # Scaling fit across node counts, same ranks and threads first
+        for subset in [[run for run in runs if run[1:3] == (ranks, threads)], runs]:
+            predicted = self.fit(subset, nodes, quantile)
+            if predicted:
+                return predicted, pct + " of scaling fit to " + str(len(subset)) + " runs on " + \
+                        str(len(set([run[0] for run in subset]))) + " node counts"
+
+        return None, None
+
+    # Return job time limit for task: predicted quantile plus margin, capped at the sched cfg runtime
+    # Returns cfg runtime if prediction is disabled, runtime was overloaded, or there is no history
+    def get_time_limit(self, cfg_runtime, runtime):
+
+        if not self.glob.stg['runtime_predict'] or 'runtime' in self.glob.overloaded or self.glob.stg['dry_run']:
+            return cfg_runtime, None
+
+        predicted, source = self.predict(runtime)
+        if not predicted:
+            self.glob.lib.msg.log("No runtime history for task, using time limit " + str(cfg_runtime))
+            return cfg_runtime, None
+
+        margin = self.get_settings()[1]
+        limit = max(predicted * (1 + margin), predicted + self.min_margin)
+        limit = min(limit, self.glob.lib.sched.runtime_to_sec(cfg_runtime))
+
+        time_limit = self.glob.lib.sched.sec_to_runtime(limit)
+        source = time_limit + " from " + source + " (" + self.glob.lib.sched.sec_to_runtime(predicted) + \
+                 " plus margin), cfg " + str(cfg_runtime)
+        self.glob.lib.msg.log("Predicted time limit " + source)
+        return time_limit, source
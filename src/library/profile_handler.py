@@ -0,0 +1,101 @@
+# System Imports
+import contextlib
+import os
+import time
+
+# Phase timers and external command counters, reported with --profile
+class init(object):
+    def __init__(self, glob):
+        self.glob = glob
+        self.start_time = time.perf_counter()
+
+        # [name, start] of open phases, innermost last
+        self.stack = []
+        # Stack depth of each open phase() context
+        self.levels = []
+
+        # path -> {'count', 'time'}
+        self.phases = {}
+        # command kind -> {'count', 'time'}
+        self.commands = {}
+
+    # Add timing to counter dict
+    def add(self, counters, key, elapsed):
+        if key not in counters:
+            counters[key] = {'count': 0, 'time': 0.}
+        counters[key]['count'] += 1
+        counters[key]['time'] += elapsed
+
+    # Start timing phase nested in the current one
+    def start(self, name):
+        self.stack.append([name, time.perf_counter()])
+
+    # Stop innermost phase
+    def stop(self):
+        path = "/".join([phase[0] for phase in self.stack])
+        name, start = self.stack.pop()
+        self.add(self.phases, path, time.perf_counter() - start)
+
+    # End previous sibling phase (if any) and start the next one
+    def next(self, name):
+        if self.levels and len(self.stack) > self.levels[-1]:
+            self.stop()
+        self.start(name)
+
+    # Time a block as a phase, sub-phases left open by early returns are closed on exit
+    @contextlib.contextmanager
+    def phase(self, name):
+        self.start(name)
+        self.levels.append(len(self.stack))
+        try:
+            yield
+        finally:
+            level = self.levels.pop()
+            while len(self.stack) >= level:
+                self.stop()
+
+    # Time an external command
+    @contextlib.contextmanager
+    def command(self, kind):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(self.commands, kind, time.perf_counter() - start)
+
+    # Write per-phase breakdown to log and JSON profile to log dir
+    def report(self, label):
+
+        if not self.glob.args.profile:
+            return
+
+        total = time.perf_counter() - self.start_time
+
+        self.glob.lib.msg.log("Profile for " + label + ", total " + "{:.3f}".format(total) + "s:")
+        for path in self.phases:
+            self.glob.lib.msg.log("  " + path.ljust(50) + str(self.phases[path]['count']).rjust(6) + \
+                                    "{:10.3f}s".format(self.phases[path]['time']) + \
+                                    "{:7.1f}%".format(100 * self.phases[path]['time'] / total))
+        for kind in self.commands:
+            self.glob.lib.msg.log("  cmd " + kind.ljust(46) + str(self.commands[kind]['count']).rjust(6) + \
+                                    "{:10.3f}s".format(self.commands[kind]['time']))
+
+        # Plan mode writes no files
+        if self.glob.args.plan:
+            return
+
+        import json
+
+        profile = {'label':     label,
+                   'user':      self.glob.user,
+                   'hostname':  self.glob.hostname,
+                   'time':      self.glob.stg['time_str'],
+                   'total':     total,
+                   'phases':    self.phases,
+                   'commands':  self.commands}
+
+        profile_file = os.path.join(self.glob.stg['log_path'], "profile_" + label + "_" + self.glob.stg['time_str'] + ".json")
+        with open(profile_file, 'w') as f:
+            json.dump(profile, f, indent=1)
+
+        self.glob.lib.msg.high("Profile written to " + self.glob.lib.rel_path(profile_file))
@@ -35,6 +35,13 @@ class init(object):
         # Return dict of report file sections
         return {section: dict(report_parser.items(section)) for section in report_parser.sections()}
 
+    # Read report text into dict, eg. report extracted from a results bundle
+    def read_string(self, text):
+        report_parser    = cp.ConfigParser()
+        report_parser.optionxform=str
+        report_parser.read_string(text)
+        return {section: dict(report_parser.items(section)) for section in report_parser.sections()}
+
     # Write generic report to file
     def write(self, content, report_file):
         with open(report_file, 'a') as out:
@@ -100,6 +107,12 @@ class init(object):
                         "stderr         = "+ self.glob.config['config']['stderr']
                         ])
 
+        # Node-hour estimate of scheduled task, compared with actual node-hours at capture
+        task = self.glob.lib.dag.get_task(self.glob.task_id)
+        if task:
+            content.extend(["est_node_hours = " + "{:.3f}".format(self.glob.lib.budget.get_node_hours(task)),
+                            "campaign       = " + self.glob.stg['time_str']])
+
         # Add result details from cfg file
         content.append("[result]")
         for key in self.glob.config['result']:
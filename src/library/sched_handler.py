@@ -3,17 +3,27 @@ import os
 import sys
 import subprocess
 import time
+from datetime import datetime
 
 class init(object):
     def __init__(self, glob):
             self.glob = glob
 
+            # Accounting records from the last batch sacct query, {jobid: {field: value}}
+            self.acct = {}
+            self.acct_fields = ["JobID", "State", "NodeList", "Submit", "Start", "End", "ElapsedRaw",
+                                "TotalCPU", "AllocCPUS", "MaxRSS", "ConsumedEnergyRaw", "ExitCode"]
+            # Job states after which the accounting record is final
+            self.final_states = ["COMPLETED", "CANCELLED", "FAILED", "TIMEOUT", "OUT_OF_MEMORY", "NODE_FAIL",
+                                 "PREEMPTED", "BOOT_FAIL", "DEADLINE"]
+
     # Run schduler related command 
     def slurm_exec(self, cmd_line):
 
         try:
-            cmd = subprocess.run(cmd_line, shell=True, check=True, \
-                                    capture_output=True, universal_newlines=True)
+            with self.glob.lib.prof.command("slurm:" + cmd_line.split(" ")[0]):
+                cmd = subprocess.run(cmd_line, shell=True, check=True, \
+                                        capture_output=True, universal_newlines=True)
 
         # If command failed
         except subprocess.CalledProcessError as e:
@@ -34,6 +44,18 @@ class init(object):
             if "local" in jobid:
                 return "COMPLETED"
 
+            # Task not yet submitted from task graph
+            if self.glob.lib.dag.is_queued(jobid):
+                return "PENDING"
+
+            # Plan mode does not query the scheduler, assume submitted jobs are complete
+            if self.glob.args.plan:
+                return "COMPLETED"
+
+            # Use batch accounting record if fetched
+            if jobid in self.acct:
+                return self.acct[jobid]['State']
+
             # Query Slurm accounting with job ID
             success, stdout, stderr = self.slurm_exec("sacct -j " + jobid + " --format State")
 
@@ -73,23 +95,25 @@ class init(object):
     def get_active_jobids(self, job_label):
         # Get list of jobs from sacct
         running_jobs_list = []
-        job_list = None
 
-        success, stdout, stderr = self.slurm_exec("sacct -u mcawood")
-        job_list = stdout.split("\n")
+        # Plan mode does not query the scheduler
+        if self.glob.args.plan:
+            return running_jobs_list
+
+        success, stdout, stderr = self.slurm_exec("sacct -X -n -P -u " + self.glob.user + " --format JobID,JobName,State")
 
         # Add RUNNING job IDs to list
-        for job in job_list:
-            if "RUNNING" in job or "PENDING" in job:
+        for job in stdout.split("\n"):
+            fields = job.split("|")
+            if len(fields) == 3 and fields[2] in ["RUNNING", "PENDING"]:
                 # Check if job label matches
-                if job_label in job:
-                    running_jobs_list.append(int(job.split(" ")[0]))
+                if job_label in fields[1]:
+                    running_jobs_list.append(int(fields[0]))
 
         # Sort
         running_jobs_list.sort()
         return running_jobs_list
 
-
     # Get node suffixes from brackets: "[094-096]" => ['094', '095', '096']
     def expand_range(self, suffix_str):
         suffix_list = []
@@ -129,41 +153,162 @@ class init(object):
         node_list.sort()
         return node_list
 
+    # Convert sacct [D-][HH:]MM:SS[.mmm] duration to seconds
+    def acct_time_to_sec(self, duration):
+        days = 0
+        if "-" in duration:
+            days, duration = duration.split("-")
+        sec = 0.
+        for field in duration.split(":"):
+            sec = sec * 60 + float(field)
+        return int(days) * 86400 + sec
+
+    # Convert sacct memory string (eg. 1024K, 1.5G) to kB
+    def acct_mem_to_kb(self, mem):
+        scale = {'K': 1, 'M': 1024, 'G': 1024**2, 'T': 1024**3}
+        if mem and mem[-1] in scale:
+            return int(float(mem[:-1]) * scale[mem[-1]])
+        return int(float(mem) / 1024) if mem else 0
+
+    # Fetch accounting records for list of job IDs with a single sacct call, updates records of these jobs
+    # Job steps are read too as MaxRSS is only reported per step, the peak is folded into the job record
+    def prefetch_acct(self, jobids):
+
+        jobids = [jobid for jobid in set(jobids) if str(jobid).isdigit()]
+        if not jobids or self.glob.args.plan:
+            return
+
+        success, stdout, stderr = self.slurm_exec("sacct -P -n -j " + ",".join(sorted(jobids)) + \
+                                                    " --format " + ",".join(self.acct_fields))
+        if not success:
+            return
+
+        steps = {}
+        for line in stdout.split("\n"):
+            fields = line.split("|")
+            if len(fields) != len(self.acct_fields):
+                continue
+
+            record = dict(zip(self.acct_fields, fields))
+            jobid, step = (record['JobID'].split(".", 1) + [""])[:2]
+            if step:
+                steps.setdefault(jobid, []).append(record)
+            else:
+                record['State'] = ''.join(c for c in record['State'].split(" ")[0] if c not in ['*', '+'])
+                self.acct[jobid] = record
+
+        for jobid in steps:
+            if jobid in self.acct:
+                self.acct[jobid]['MaxRSS'] = str(max([self.acct_mem_to_kb(step['MaxRSS']) for step in steps[jobid]] + \
+                                                     [self.acct_mem_to_kb(self.acct[jobid]['MaxRSS'])])) + "K"
+
+        self.glob.lib.msg.log("Fetched accounting for " + str(len(self.acct)) + " of " + str(len(jobids)) + " jobs")
+
+    # Derived accounting metrics for job ID: queue wait, CPU efficiency, energy, peak memory, exit code
+    # A job found complete by its completion marker may still be RUNNING or COMPLETING, its exit code, CPU time,
+    # energy and memory are only read once the record is final
+    def get_acct_metrics(self, jobid):
+
+        if jobid not in self.acct:
+            return {}
+
+        record = self.acct[jobid]
+        metrics = {}
+
+        try:
+            if record['Submit'][:1].isdigit() and record['Start'][:1].isdigit():
+                metrics['queue_wait_sec'] = int((datetime.strptime(record['Start'], "%Y-%m-%dT%H:%M:%S") - \
+                                                 datetime.strptime(record['Submit'], "%Y-%m-%dT%H:%M:%S")).total_seconds())
+
+            if record['State'] not in self.final_states:
+                self.glob.lib.msg.log("Accounting record for job " + jobid + " is not final (" + record['State'] + \
+                                      "), using queue wait only")
+                return metrics
+
+            metrics['exit_code'] = record['ExitCode']
+
+            core_sec = int(record['ElapsedRaw'] or 0) * int(record['AllocCPUS'] or 0)
+            if core_sec and record['TotalCPU']:
+                metrics['cpu_efficiency'] = round(100. * self.acct_time_to_sec(record['TotalCPU']) / core_sec, 2)
+
+            if record['ConsumedEnergyRaw'] and int(record['ConsumedEnergyRaw']) > 0:
+                metrics['energy_j'] = int(record['ConsumedEnergyRaw'])
+
+            if record['MaxRSS']:
+                metrics['max_rss_kb'] = self.acct_mem_to_kb(record['MaxRSS'])
+
+        except ValueError as e:
+            self.glob.lib.msg.log("Failed to parse accounting record for job " + jobid + ": " + str(e))
+
+        return metrics
+
     # Get NODELIST from sacct  using JOBID
     def get_nodelist(self, jobid):
 
+        # Use batch accounting record if fetched
+        if jobid in self.acct and self.acct[jobid]['NodeList']:
+            return self.parse_nodelist(self.acct[jobid]['NodeList'])
+
         success, stdout, stderr = self.slurm_exec("sacct -X -P -j  " + jobid + " --format NodeList")
         if success:
             return self.parse_nodelist(stdout.split("\n")[1])
 
         return ""
 
-    # Set job dependency if max_running_jobs is reached
-    def get_dep_str(self):
+    # Convert Slurm time limit string [D-]HH:MM:SS to seconds, uses default runtime if unset
+    def runtime_to_sec(self, runtime):
+
+        if not runtime:
+            runtime = '02:00:00'
+
+        days = 0
+        runtime = str(runtime)
+        if "-" in runtime:
+            days, runtime = runtime.split("-")
+
+        fields = [int(x) for x in runtime.split(":")]
+        # MM or MM:SS formats
+        if len(fields) == 1:
+            fields = [0, fields[0], 0]
+        elif len(fields) == 2:
+            fields = [0] + fields
+
+        return int(days) * 86400 + fields[0] * 3600 + fields[1] * 60 + fields[2]
+
+    # Convert seconds to HH:MM:SS time limit, rounded up to the minute
+    def sec_to_runtime(self, seconds):
+
+        minutes = -(-int(seconds) // 60)
+        return str(minutes // 60).zfill(2) + ":" + str(minutes % 60).zfill(2) + ":00"
+
+    # Generate dependency string from lists of afterok and afterany job IDs
+    def get_dep_str(self, ok_list, any_list):
+
+        deps = []
 
-        dep = ""
+        if ok_list:
+            deps.append("afterok:" + ":".join([str(x) for x in ok_list]))
 
-        if self.glob.any_dep_list:
-            dep += "--dependency=afterany:" + ":".join([str(x) for x in self.glob.any_dep_list]) + " "
+        if any_list:
+            deps.append("afterany:" + ":".join([str(x) for x in any_list]))
 
-        if self.glob.ok_dep_list:
-            dep += "--dependency=afterok:" + ":".join([str(x) for x in self.glob.ok_dep_list]) + " " 
+        if not deps:
+            return ""
 
-        if dep:
-            self.glob.lib.msg.low("Job dependency string: " + dep)
+        dep = "--dependency=" + ",".join(deps) + " "
+        self.glob.lib.msg.low("Job dependency string: " + dep)
 
         return dep
 
-    # Submit script to scheduler
-    def submit(self):
+    # Submit script to scheduler, return job ID
+    def submit(self, script_path, dep_str, stdout_path, stderr_path):
 
-        script_path = os.path.join(self.glob.config['metadata']['working_path'], self.glob.job_file)
         self.glob.lib.msg.low(["Job script:",
                                 ">  " + self.glob.lib.rel_path(script_path),
                                 "",
                                 "Submitting to scheduler..."])
 
-        success, stdout, stderr = self.slurm_exec("sbatch " + self.get_dep_str() + script_path)
+        success, stdout, stderr = self.slurm_exec("sbatch " + dep_str + script_path)
 
         if not success:
             self.glob.lib.msg.error(["failed to submit job to scheduler:", stdout, stderr])
@@ -180,24 +325,22 @@ class init(object):
                 jobid = line.split(" ")[-1]
 
         # Wait for slurm to generate jobid
-        time.sleep(self.glob.stg['timeout'])
+        with self.glob.lib.prof.phase("submit_wait"):
+            time.sleep(self.glob.stg['timeout'])
             
         # Get job in queue
         success, stdout, stderr = self.slurm_exec("squeue -a --job " + jobid)
 
         self.glob.lib.msg.low([stdout,
                     "Job stdout:",
-                    ">  "+ self.glob.lib.rel_path(
-                        os.path.join(self.glob.config['metadata']['working_path'], self.glob.config['config']['stdout'])),
+                    ">  "+ self.glob.lib.rel_path(stdout_path),
                     "Job stderr:",
-                    ">  "+ self.glob.lib.rel_path(
-                        os.path.join(self.glob.config['metadata']['working_path'], self.glob.config['config']['stderr']))])
+                    ">  "+ self.glob.lib.rel_path(stderr_path)])
 
         self.glob.lib.msg.log(stdout)
         self.glob.lib.msg.log(stderr)
 
-        # Store jobid in shared global object
-        self.glob.task_id = jobid
+        return jobid
 
     # Get usable string of application status
     def get_status_str(self, app):
@@ -0,0 +1,144 @@
+# System Imports
+import itertools
+
+# Expand [runtime] sweep axes into task combinations
+class init(object):
+    def __init__(self, glob):
+        self.glob = glob
+
+        # Runtime keys that may be swept
+        self.axes = ['nodes', 'threads', 'ranks_per_node', 'gpus']
+
+    # Expand a single range term 'start:stop[:step]' or 'start:stop:xfactor' (inclusive)
+    def expand_range(self, term, cfg_file):
+
+        fields = term.split(":")
+        try:
+            start, stop = int(fields[0]), int(fields[1])
+            step = fields[2] if len(fields) > 2 else "1"
+
+            # Geometric series
+            if step[0] == "x":
+                factor = int(step[1:])
+                if factor < 2 or start < 1:
+                    raise ValueError
+                values = []
+                while start <= stop:
+                    values.append(str(start))
+                    start *= factor
+                return values
+
+            # Arithmetic series
+            step = int(step)
+            if step < 1:
+                raise ValueError
+            return [str(val) for val in range(start, stop + 1, step)]
+
+        except (ValueError, IndexError):
+            self.glob.lib.msg.error("invalid sweep range '" + term + "' in " + self.glob.lib.rel_path(cfg_file) + \
+                                    ", expected start:stop[:step] or start:stop:x[factor]")
+
+    # Parse axis value into list of strings: comma delimited list of values and/or ranges
+    def parse_axis(self, value, cfg_file):
+
+        values = []
+        for term in str(value).split(","):
+            term = term.strip()
+            if ":" in term:
+                values.extend(self.expand_range(term, cfg_file))
+            elif term:
+                values.append(term)
+        return values
+
+    # Convert sweep axes in runtime section to lists and check sweep mode
+    def parse_axes(self, cfg_dict):
+
+        cfg_file = cfg_dict['metadata']['cfg_file']
+        runtime  = cfg_dict['runtime']
+
+        for axis in self.axes:
+            runtime[axis] = self.parse_axis(runtime[axis], cfg_file)
+            if not runtime[axis]:
+                self.glob.lib.msg.error("empty sweep axis '" + axis + "' in " + self.glob.lib.rel_path(cfg_file))
+
+        if runtime['sweep'] not in ["default", "cartesian", "zip"]:
+            self.glob.lib.msg.error("unsupported sweep mode '" + str(runtime['sweep']) + "' in " + \
+                                    self.glob.lib.rel_path(cfg_file) + ", please specify 'default', 'cartesian' or 'zip'.")
+
+        # Check zipped axes have matching lengths (length 1 is broadcast)
+        zipped = []
+        if runtime['sweep'] == "default":
+            zipped = ['threads', 'ranks_per_node']
+        elif runtime['sweep'] == "zip":
+            zipped = self.axes
+
+        lengths = set([len(runtime[axis]) for axis in zipped if len(runtime[axis]) > 1])
+        if len(lengths) > 1:
+            self.glob.lib.msg.error("input mismatch: '" + "', '".join(zipped) + "' lists must be of equal length in " + \
+                                    self.glob.lib.rel_path(cfg_file))
+
+    # Zip lists, broadcasting length 1 lists
+    def zip_axes(self, lists):
+        length = max([len(values) for values in lists])
+        return zip(*[values * length if len(values) == 1 else values for values in lists])
+
+    # Generate raw (nodes, threads, ranks_per_node, gpus) tuples for the sweep mode
+    def product(self, runtime):
+
+        nodes, threads, ranks, gpus = [runtime[axis] for axis in self.axes]
+
+        if runtime['sweep'] == "cartesian":
+            return itertools.product(nodes, threads, ranks, gpus)
+
+        elif runtime['sweep'] == "zip":
+            return self.zip_axes([nodes, threads, ranks, gpus])
+
+        # Nodes x (threads, ranks) pairs x gpus
+        return ((node, thread, rank, gpu) for node in nodes
+                                          for thread, rank in self.zip_axes([threads, ranks])
+                                          for gpu in gpus)
+
+    # Namespace for constraint expressions: swept values and numeric system variables
+    def get_namespace(self, combo):
+
+        namespace = {}
+        for key in self.glob.system:
+            try:
+                namespace[key] = int(self.glob.system[key])
+            except (ValueError, TypeError):
+                pass
+
+        for key in combo:
+            namespace[key] = int(combo[key])
+        return namespace
+
+    # Return True if combination satisfies constraint expression
+    def check_constraint(self, constraint, combo):
+
+        if not constraint:
+            return True
+        try:
+            return bool(eval(constraint, {'__builtins__': {}}, self.get_namespace(combo)))
+        except Exception as e:
+            self.glob.lib.msg.error("failed to evaluate sweep constraint '" + constraint + "': " + str(e))
+
+    # Lazily yield combination dicts satisfying constraint
+    def combinations(self, runtime):
+
+        for values in self.product(runtime):
+            combo = dict(zip(self.axes, values))
+            if self.check_constraint(runtime['constraint'], combo):
+                yield combo
+            else:
+                self.glob.lib.msg.log("Skipping combination excluded by constraint: " + \
+                                      ", ".join([key + "=" + combo[key] for key in self.axes]))
+
+    # Return number of tasks and node-hours for sweep, get_task_runtime returns seconds for a combination
+    def count(self, runtime, get_task_runtime):
+
+        tasks = node_hours = 0
+        for combo in self.combinations(runtime):
+            tasks += 1
+            node_hours += int(combo['nodes']) * get_task_runtime(combo) / 3600.
+
+        return tasks, node_hours
@@ -3,6 +3,7 @@ import copy
 import glob as gb
 import os
 import re
+import shlex
 import shutil as su
 import sys
 
@@ -103,10 +104,12 @@ class init(object):
         # Add module loads if application must be loaded
         if self.glob.config['metadata']['app_mod']:
             template_obj.append("# Load Modules \n")
+            template_obj.append("bp_phase modules begin \n")
             template_obj.append("ml reset \n")
             template_obj.append("ml use ${base_module} \n")
             template_obj.append("ml ${app_module} \n")
             template_obj.append("ml \n")
+            template_obj.append("bp_phase modules end \n")
             template_obj.append("\n")
 
         template_obj.append("# Create working directory \n")
@@ -115,24 +118,134 @@ class init(object):
     # Get input files asynchronously
     def stage_input_files(self, template_obj):
 
+        if not self.glob.stage_ops:
+            return
+
+        template_obj.append("bp_phase staging begin \n")
         for op in self.glob.stage_ops:
-            self.glob.lib.msg.log("Adding file op to template: " + op + "...")
+            self.glob.lib.msg.log("Adding file op to template: %s...", op)
             template_obj.append(op + "\n")
+        template_obj.append("bp_phase staging end \n")
 
         template_obj.append("\n")
 
+    # Define phase marker function, prints 'BP_PHASE <name> <begin|end> <epoch ns>' to job output, preserves $?
+    def add_phase_function(self, template_obj):
+        template_obj.append("bp_start=$(date +%s) \n")
+        template_obj.append("bp_phase() { local rc=$?; echo \"BP_PHASE $1 $2 $(date +%s%N)\"; return $rc; } \n")
+
+    # Write completion marker with exit status of user section, tmp + mv so capture never sees a partial file
+    def add_done_marker(self, template_obj):
+        marker = os.path.join(self.glob.config['metadata']['working_path'], self.glob.stg['done_marker'])
+        template_obj.append("\n# Completion marker \n")
+        template_obj.append("printf \"status=%s\\nstart=%s\\nend=%s\\nhost=%s\\n\" ${bp_status} ${bp_start} $(date +%s) $(hostname) > " + \
+                            marker + ".tmp && mv " + marker + ".tmp " + marker + " \n")
+
+    # Wrap each mpi_exec command of the user section in 'run' phase markers, skipping lines continued with '\'
+    def mark_mpi_exec(self, user_script):
+
+        marked = []
+        line_num = 0
+        while line_num < len(user_script):
+            line = user_script[line_num]
+            continued = marked and marked[-1].rstrip().endswith("\\")
+
+            if "mpi_exec" in line and not continued:
+                marked.append("bp_phase run begin \n")
+                marked.append(line)
+                # Include continuation lines of this command
+                while user_script[line_num].rstrip().endswith("\\") and line_num + 1 < len(user_script):
+                    line_num += 1
+                    marked.append(user_script[line_num])
+                if not marked[-1].endswith("\n"):
+                    marked[-1] += "\n"
+                marked.append("bp_phase run end \n")
+            else:
+                marked.append(line)
+            line_num += 1
+
+        return marked
+
+    # Hardware report is collected once per node boot into the per-system cache and linked into the working dir,
+    # cache entry is keyed on boot_id + hostname hash, jobs that lose the race for the lock collect their own copy
+    def add_cached_hw_report(self, template_obj):
+
+        collect   = os.path.join(self.glob.stg['script_path'], "collect_hw_info") + " " + self.glob.stg['utils_path']
+        cache_dir = os.path.join(self.glob.stg['hw_cache_path'], self.glob.system['system'])
+        hw_report = os.path.join(self.glob.config['metadata']['working_path'], "hw_report")
+
+        template_obj.extend(["\n# Provenance data collection script, cached per node boot \n",
+                             "hw_key=$(cat /proc/sys/kernel/random/boot_id)-$(hostname | sha1sum | cut -c 1-12) \n",
+                             "hw_cache=" + cache_dir + "/${hw_key} \n",
+                             "if [ ! -d ${hw_cache} ] && mkdir -p " + cache_dir + " && mkdir ${hw_cache}.lock 2>/dev/null; then \n",
+                             "    " + collect + " ${hw_cache}.tmp && mv ${hw_cache}.tmp ${hw_cache} || rm -rf ${hw_cache}.tmp \n",
+                             "    rmdir ${hw_cache}.lock \n",
+                             "fi \n",
+                             "if [ -d ${hw_cache} ]; then \n",
+                             "    ln -sfn ${hw_cache} " + hw_report + " \n",
+                             "else \n",
+                             "    " + collect + " " + hw_report + " \n",
+                             "fi \n"])
+
     # If the setting in enabled, add the provenance data collection script to the script
     def collect_stats(self, template_obj):
         if self.glob.config['config']['collect_stats']:
             if self.glob.lib.files.file_owner(os.path.join(self.glob.stg['utils_path'], "lshw")) == "root":
-                template_obj.append("\n# Provenance data collection script \n")
-                template_obj.append(os.path.join(self.glob.stg['script_path'], "collect_hw_info") + " " + \
-                                    self.glob.stg['utils_path'] + " " + \
-                                    os.path.join(self.glob.config['metadata']['working_path'], "hw_report") + "\n")
+                self.add_cached_hw_report(template_obj)
             else:
                 self.glob.lib.msg.warning(["Requested hardware stats but script permissions not set",
                                                 "Run 'sudo -E $BP_HOME/resources/scripts/change_permissions'"])
 
+    # Start telemetry sampler in the background, one per node
+    def start_telemetry(self, template_obj):
+
+        sampler = sys.executable + " " + os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "telemetry.py") + " " + \
+                    os.path.join(self.glob.config['metadata']['working_path'], "telemetry") + " " + \
+                    str(self.glob.config['config']['telemetry_interval'])
+
+        template_obj.append("\n# Telemetry sampler \n")
+        if self.glob.stg['bench_mode'] == "sched":
+            template_obj.append("srun --overlap --ntasks-per-node=1 -N ${SLURM_NNODES} " + sampler + " & \n")
+        else:
+            template_obj.append(sampler + " & \n")
+        template_obj.append("telemetry_pid=$! \n\n")
+
+    # Stop telemetry sampler, it writes a final sample on SIGTERM
+    def stop_telemetry(self, template_obj):
+        template_obj.append("\n# Stop telemetry sampler \n")
+        template_obj.append("kill -TERM ${telemetry_pid} \n")
+        template_obj.append("wait ${telemetry_pid} 2>/dev/null \n")
+
+    # Start watchdog in the background, follows job output and stops the main command if it stalls or prints a fatal error
+    def start_watchdog(self, template_obj, exclude=None):
+
+        watchdog = self.glob.config['watchdog']
+        cmd = sys.executable + " " + os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "watchdog.py") + \
+                " --parent $$" + \
+                " --output " + os.path.join(self.glob.config['metadata']['working_path'], self.glob.config['config']['stdout']) + \
+                " --output " + os.path.join(self.glob.config['metadata']['working_path'], self.glob.config['config']['stderr']) + \
+                " --reason " + os.path.join(self.glob.config['metadata']['working_path'], self.glob.stg['watchdog_file'])
+        if watchdog['stall']:
+            cmd += " --stall " + str(watchdog['stall'])
+        if watchdog['heartbeat']:
+            cmd += " --heartbeat " + shlex.quote(watchdog['heartbeat'])
+        if watchdog['fatal']:
+            cmd += " --fatal " + shlex.quote(watchdog['fatal'])
+        if exclude:
+            cmd += " --exclude " + exclude
+
+        template_obj.append("\n# Watchdog \n")
+        template_obj.append(cmd + " & \n")
+        template_obj.append("watchdog_pid=$! \n\n")
+
+    def stop_watchdog(self, template_obj):
+        template_obj.append("\n# Stop watchdog \n")
+        template_obj.append("kill -TERM ${watchdog_pid} 2>/dev/null \n")
+        template_obj.append("wait ${watchdog_pid} 2>/dev/null \n")
+
+    def watchdog_enabled(self):
+        return bool(self.glob.config['watchdog']['stall'] or self.glob.config['watchdog']['fatal'])
+
     # Add things to the bottom of the build script
     def build_epilog(self, template_obj):
 
@@ -170,7 +283,7 @@ class init(object):
             # For each key, find and replace <<<key>>> in template file
             for key in cfg:
                 template_obj = [line.replace("<<<" + str(key) + ">>>", str(cfg[key])) for line in template_obj]
-                self.glob.lib.msg.log("Replacing " + "<<<" + str(key) + ">>> with " + str(cfg[key]))
+                self.glob.lib.msg.log("Replacing <<<%s>>> with %s", key, cfg[key])
 
         return template_obj
 
@@ -257,14 +370,24 @@ class init(object):
             # Add reservation line to SLURM params if set
             self.add_reservation(template_obj)
 
+        # Plan mode: parameters resolved, no script written
+        if self.glob.args.plan:
+            return
+
         # Timestamp
         template_obj.append("echo \"START `date +\"%Y\"-%m-%dT%T` `date +\"%s\"`\" \n")
+        # Staging step is marked with phases
+        self.add_phase_function(template_obj)
 
         # Add standard lines to template
         self.add_standard_build_definitions(template_obj)
 
         # Copy user portion of build template
+        if self.watchdog_enabled():
+            self.start_watchdog(template_obj)
         self.add_user_section(template_obj, self.glob.config['template'])
+        if self.watchdog_enabled():
+            self.stop_watchdog(template_obj)
 
         self.build_epilog(template_obj)
 
@@ -289,6 +412,7 @@ class init(object):
         # Write populated script to file
         self.glob.lib.msg.low(["Writing template... ", ""])
         self.glob.lib.files.write_list_to_file(template_obj, self.glob.tmp_job_file)
+        self.glob.lib.event.emit("rendered", "build", self.glob.config['metadata']['working_path'])
 
     # Get template files required to construct bench script
     def set_bench_files(self):
@@ -349,7 +473,7 @@ class init(object):
     def add_bench(self, template_obj):
 
         # Get template file contents
-        user_script = self.read_template(self.glob.config['template']) 
+        user_script = self.mark_mpi_exec(self.read_template(self.glob.config['template']))
 
         # Add start time line
         template_obj.append("#-------USER SECTION------\n\n")
@@ -368,6 +492,10 @@ class init(object):
         # Set MPI cmd
         self.set_mpi_exec_str()
 
+        # Plan mode: parameters resolved, no script written
+        if self.glob.args.plan:
+            return
+
         template_obj = []
 
         template_obj.append("#!/bin/bash \n")
@@ -385,6 +513,7 @@ class init(object):
 
         # Timestamp
         template_obj.append("echo \"START `date +\"%Y\"-%m-%dT%T` `date +\"%s\"`\" \n")
+        self.add_phase_function(template_obj)
 
         # Add standard lines to script
         self.add_standard_bench_definitions(template_obj)
@@ -400,14 +529,32 @@ class init(object):
         if not self.glob.stg['sync_staging']:
             self.stage_input_files(template_obj)
 
+        # Sample node telemetry while benchmark runs
+        if self.glob.config['config']['telemetry_interval'] > 0:
+            self.start_telemetry(template_obj)
+
+        # Abort stalled or failing benchmark early
+        if self.watchdog_enabled():
+            self.start_watchdog(template_obj, "${telemetry_pid}" if self.glob.config['config']['telemetry_interval'] > 0 else None)
+
         # Add bench template to script
         template_obj = self.add_bench(template_obj)
+        template_obj.append("bp_status=$? \n")
+
+        if self.watchdog_enabled():
+            self.stop_watchdog(template_obj)
+
+        if self.glob.config['config']['telemetry_interval'] > 0:
+            self.stop_telemetry(template_obj)
 
         # Add epilog to end of script
+        template_obj.append("bp_phase epilog begin \n")
         self.bench_epilog(template_obj)
+        template_obj.append("bp_phase epilog end \n")
 
         # Timestamp
         template_obj.append("echo \"END `date +\"%Y\"-%m-%dT%T` `date +\"%s\"`\" \n")
+        self.add_done_marker(template_obj)
 
         self.glob.lib.msg.low("Populating template...")
         # Take multiple config dicts and populate script template
@@ -437,4 +584,4 @@ class init(object):
         # Write populated script to file
         self.glob.lib.msg.low(["Writing template... ", ""])
         self.glob.lib.files.write_list_to_file(template_obj, self.glob.tmp_job_file)
-
+        self.glob.lib.event.emit("rendered", "bench", self.glob.config['metadata']['working_path'])
@@ -0,0 +1,89 @@
+# System Imports
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+
+# Minimal inotify wrapper for watching result directories (Linux only)
+class init(object):
+    def __init__(self, glob):
+        self.glob = glob
+
+        # inotify flags, from <sys/inotify.h>
+        self.IN_CLOSE_WRITE = 0x00000008
+        self.IN_MOVED_TO    = 0x00000080
+        self.IN_CREATE      = 0x00000100
+        self.IN_IGNORED     = 0x00008000
+        self.IN_ISDIR       = 0x40000000
+        self.IN_NONBLOCK    = 0o4000
+        self.IN_CLOEXEC     = 0o2000000
+
+        self.event          = struct.Struct("iIII")
+        self.fd             = None
+        self.watches        = {}
+
+    # Open inotify instance, returns False if unavailable on this platform
+    def start(self):
+        try:
+            self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            self.glob.lib.msg.log("inotify unavailable: " + str(e))
+            return False
+
+        if self.fd < 0:
+            self.glob.lib.msg.log("inotify_init1 failed: " + os.strerror(ctypes.get_errno()))
+            self.fd = None
+            return False
+        return True
+
+    # Watch directory for new files and subdirectories, re-adding a watched inode returns the same descriptor
+    def add(self, path):
+        if self.fd is None:
+            return
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                         self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE)
+        if wd < 0:
+            self.glob.lib.msg.log("Failed to watch " + path + ": " + os.strerror(ctypes.get_errno()))
+            return
+        self.watches[wd] = path
+
+    # Stop watching directory, needed for directories moved away as they keep their watch
+    def remove(self, path):
+        for wd in [wd for wd in self.watches if self.watches[wd] == path]:
+            self.libc.inotify_rm_watch(self.fd, wd)
+            self.watches.pop(wd)
+
+    # Block until events arrive or timeout (sec), returns list of [dir, name, is_dir]
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        events = []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return events
+
+        offset = 0
+        while offset + self.event.size <= len(data):
+            wd, mask, cookie, length = self.event.unpack_from(data, offset)
+            name = data[offset + self.event.size:offset + self.event.size + length].rstrip(b"\0").decode(errors='replace')
+            offset += self.event.size + length
+
+            # Watched directory removed (eg. result moved to captured)
+            if mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+            elif wd in self.watches:
+                events.append([self.watches[wd], name, bool(mask & self.IN_ISDIR)])
+
+        return events
+
+    # Close inotify instance
+    def stop(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.watches = {}
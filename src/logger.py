@@ -1,10 +1,42 @@
 # System imports
+import atexit
 import logging as lg
+import logging.handlers as lh
 import os
+import queue
 
 # Local Imports
 import src.splash as splash
 
+# Background listeners writing queued records, stopped (and flushed) at exit
+listeners = []
+
+# Queue records unformatted, message formatting happens on the listener thread
+class deferred_queue_handler(lh.QueueHandler):
+    def prepare(self, record):
+        # Mutable args may change before the listener gets to them, format those now
+        if isinstance(record.args, tuple) and \
+                not all(isinstance(arg, (str, int, float, bool, type(None))) for arg in record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+# Flush and close all log files
+def stop_logging():
+    while listeners:
+        listener = listeners.pop()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+# Get numeric level from log_level setting
+def get_level(glob):
+    level = lg.getLevelName(str(glob.stg['log_level']).upper())
+    if not isinstance(level, int):
+        glob.lib.msg.error("invalid log_level '" + str(glob.stg['log_level']) + "' in $BP_HOME/settings.ini, " + \
+                            "expected DEBUG, INFO, WARNING or ERROR.")
+    return level
+
 # Start logger and return obj
 def start_logging(log_label, log_file, glob):
 
@@ -16,12 +48,24 @@ def start_logging(log_label, log_file, glob):
 
     # Init logger
     glob.log = lg.getLogger(log_label)
-    glob.log.setLevel(1)
+    glob.log.setLevel(get_level(glob))
+    glob.log.propagate = False
 
+    # File writes are buffered, flushed every log_buffer records, on errors and at exit
     file_handler = lg.FileHandler(log_path, mode="w", encoding="utf8")
     file_handler.setFormatter(formatter)
+    buffer_handler = lh.MemoryHandler(glob.stg['log_buffer'], flushLevel=lg.ERROR, target=file_handler)
+
+    # Records are handed to a listener thread so slow filesystems don't block the main path
+    log_queue = queue.SimpleQueue()
+    glob.log.addHandler(deferred_queue_handler(log_queue))
+
+    listener = lh.QueueListener(log_queue, buffer_handler)
+    listener.start()
+    if not listeners:
+        atexit.register(stop_logging)
+    listeners.append(listener)
 
-    glob.log.addHandler(file_handler)
     glob.log.debug(log_label + " log started")
 
     # Print info
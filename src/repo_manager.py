@@ -0,0 +1,128 @@
+# System Imports
+import os
+import time
+from datetime import datetime
+
+# Local Imports
+import src.staging as staging
+
+glob = None
+
+# Human readable size
+def format_size(size):
+    for unit in ["B", "K", "M", "G"]:
+        if size < 1024:
+            return "{:.1f}".format(size) + unit
+        size /= 1024.
+    return "{:.1f}".format(size) + "T"
+
+# Print assets in repo, least recently used first
+def print_stats():
+    index = staging.read_index(glob.stg['local_repo'])
+    quota = glob.lib.files.get_repo_quota()
+    total = sum([index[name]['size'] for name in index])
+
+    if not index:
+        print("No assets found in " + glob.stg['local_repo_env'])
+        return
+
+    print("Assets in " + glob.stg['local_repo_env'] + ", least recently used first:")
+    print("  " + "Asset".ljust(40) + "Size".rjust(10) + "  " + "Last used".ljust(18) + "Flags")
+    for name in sorted(index, key=lambda name: index[name]['last_used']):
+        entry = index[name]
+        flags = []
+        if entry['pinned']:
+            flags.append("pinned")
+        if entry['locked']:
+            flags.append("fetching")
+        if entry['linked']:
+            flags.append("linked")
+        print("  " + name.ljust(40) + format_size(entry['size']).rjust(10) + "  " + \
+                datetime.fromtimestamp(entry['last_used']).strftime("%Y-%m-%d %H:%M").ljust(18) + ",".join(flags))
+
+    print()
+    print("Total: " + str(len(index)) + " assets, " + format_size(total) + \
+            (" of " + format_size(quota) + " quota" if quota else ", no repo_quota set"))
+
+# Evict unpinned assets down to quota, remove abandoned partial downloads and compact journal
+def run_gc():
+    repo  = glob.stg['local_repo']
+    quota = glob.lib.files.get_repo_quota()
+
+    # Partial downloads and locks left by killed jobs
+    removed = 0
+    for name in os.listdir(repo):
+        path = os.path.join(repo, name)
+        if name.endswith((".part", ".lock", ".tmp")) and time.time() - os.path.getmtime(path) > staging.stale_age:
+            if name.endswith(".part") and os.path.exists(path[:-len(".part")] + ".lock"):
+                continue
+            os.remove(path)
+            removed += 1
+
+    # Extractions left by killed jobs, and of archives no longer in repo
+    extract_path = os.path.join(repo, staging.extract_dir)
+    if os.path.isdir(extract_path):
+        digests = set()
+        for name in os.listdir(repo):
+            extracted = staging.get_extracted(repo, os.path.join(repo, name))
+            if staging.is_asset(name) and extracted:
+                digests.add(os.path.basename(extracted))
+        for name in os.listdir(extract_path):
+            path = os.path.join(extract_path, name)
+            if name.endswith(".lock"):
+                continue
+            if name.endswith(".tmp") and time.time() - os.path.getmtime(path) < staging.stale_age:
+                continue
+            if name.endswith(".tmp") or name not in digests:
+                staging.remove_extracted(path)
+                removed += 1
+
+    if removed:
+        print("Removed " + str(removed) + " abandoned partial downloads, locks and extractions.")
+
+    if quota:
+        evicted = staging.evict(repo, quota)
+        for name, size in evicted:
+            print("Evicted " + name + " (" + format_size(size) + ")")
+        print("Evicted " + str(len(evicted)) + " assets, freed " + format_size(sum([size for name, size in evicted])))
+    else:
+        print("No repo_quota set in $BP_HOME/settings.ini, nothing to evict.")
+
+    staging.compact_journal(repo, staging.read_index(repo))
+
+# Add or remove assets from pin list, pinned assets are never evicted
+def set_pins(names, pin):
+    repo = glob.stg['local_repo']
+    pins = staging.read_pins(repo)
+
+    for name in names:
+        if pin and not os.path.exists(os.path.join(repo, name)):
+            glob.lib.msg.warning("Asset '" + name + "' not found in " + glob.stg['local_repo_env'] + ", pinning anyway.")
+    pins = pins | set(names) if pin else pins - set(names)
+
+    tmp = os.path.join(repo, staging.pins_file + ".tmp")
+    with open(tmp, 'w') as f:
+        f.write("".join([name + "\n" for name in sorted(pins)]))
+    os.replace(tmp, os.path.join(repo, staging.pins_file))
+
+    print(("Pinned " if pin else "Unpinned ") + ", ".join(names))
+
+# Handle --repo command
+def init(glob_obj):
+    global glob
+    glob = glob_obj
+
+    if not os.path.isdir(glob.stg['local_repo']):
+        glob.lib.msg.error("Local file repository " + glob.stg['local_repo_env'] + " not found.")
+
+    cmd = glob.args.repo[0]
+    if cmd == "stats":
+        print_stats()
+    elif cmd == "gc":
+        run_gc()
+    elif cmd in ["pin", "unpin"]:
+        if len(glob.args.repo) < 2:
+            glob.lib.msg.error("--repo " + cmd + " requires asset names.")
+        set_pins(glob.args.repo[1:], cmd == "pin")
+    else:
+        glob.lib.msg.error("Invalid --repo command '" + cmd + "', provide 'stats', 'gc', 'pin' or 'unpin'.")
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+# Incremental mirror of an asset repo (eg. master $BP_REPO on /work to scratch), run from cron as benchpro-repo-sync
+# Both sides keep a manifest, <repo>/.bp_manifest.json, of mirrored files: relative path -> [size, mtime_ns, sha256]
+#   - the source manifest caches file hashes, a file is only hashed again when its size or mtime changes
+#   - the destination manifest records what was copied and how far the source change journal has been read
+# SRC is the repo jobs stage into ($BP_REPO), only assets named in the change journal staging.py writes there
+# since the last run are scanned, plus any assets added or removed by hand at the top level of the repo
+# (noticed from the repo directory mtime).
+# Files changed by hand inside existing asset directories need a --full rescan.
+# Files are copied in parallel with copy_file_range to a temporary name and renamed into place, so readers
+# never see a partial file, the destination manifest is replaced last.
+# Usage: benchpro-repo-sync [--jobs N] [--full] [--dry-run] SRC DEST
+
+# System Imports
+import argparse
+import concurrent.futures
+import json
+import os
+import shutil as su
+import sys
+
+# Local Imports
+import src.staging as staging
+
+manifest_file = ".bp_manifest.json"
+
+def log(message):
+    print("repo-sync: " + message, flush=True)
+
+# Repo entries to mirror: assets and their checksum files
+def is_mirrored(name):
+    return staging.is_asset(name) or (name.endswith(".sha256") and not name.startswith("."))
+
+def load_manifest(repo):
+    try:
+        with open(os.path.join(repo, manifest_file), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault('files', {})
+    return manifest
+
+# The source manifest is only a hash cache, it is rewritten in place so the source repo directory mtime
+# keeps tracking added and removed assets only
+def write_manifest(repo, manifest, in_place=False):
+    if in_place:
+        with open(os.path.join(repo, manifest_file), 'a+') as f:
+            f.seek(0)
+            f.truncate()
+            json.dump(manifest, f)
+        return
+
+    tmp = os.path.join(repo, manifest_file + "." + str(os.getpid()) + ".tmp")
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(repo, manifest_file))
+
+# Names in change journal since last read, returns set of names and new journal position
+# Returns None for names if the journal was replaced or truncated, a full rescan is needed
+def read_changes(src, position):
+    path = os.path.join(src, staging.changes_file)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return set(), {'inode': None, 'offset': 0}
+
+    offset = position.get('offset', 0)
+    if position.get('inode') not in [None, st.st_ino] or offset > st.st_size:
+        return None, {'inode': st.st_ino, 'offset': 0}
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+
+    # Ignore partly written last line, read on next run
+    data = data[:data.rfind(b"\n") + 1]
+    names = set()
+    for line in data.decode(errors='replace').splitlines():
+        fields = line.split(" ", 2)
+        if len(fields) == 3:
+            names.add(fields[2])
+
+    return names, {'inode': st.st_ino, 'offset': offset + len(data)}
+
+# Files of asset in repo: relative path -> [size, mtime_ns]
+def scan(repo, name):
+    path = os.path.join(repo, name)
+    files = {}
+    if not os.path.lexists(path):
+        return files
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        for root, dirs, names in os.walk(path):
+            for file_name in names:
+                st = os.lstat(os.path.join(root, file_name))
+                files[os.path.relpath(os.path.join(root, file_name), repo)] = [st.st_size, st.st_mtime_ns]
+    else:
+        st = os.lstat(path)
+        files[name] = [st.st_size, st.st_mtime_ns]
+    return files
+
+# Copy file with copy_file_range, falling back to a userspace copy where it is unsupported
+def copy_file(src_path, dest_path):
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp = os.path.join(os.path.dirname(dest_path), "." + os.path.basename(dest_path) + ".sync.tmp")
+
+    with open(src_path, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        try:
+            copied = 0
+            while copied < size:
+                n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(size - copied, 1 << 30))
+                # Stopped short, start again in userspace
+                if n == 0:
+                    raise OSError("copy_file_range stopped after " + str(copied) + " of " + str(size) + " bytes")
+                copied += n
+        except (AttributeError, OSError):
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            su.copyfileobj(fsrc, fdst, staging.chunk_size)
+
+    # Source changed during copy, leave it for the next run
+    written = os.path.getsize(tmp)
+    if written != size:
+        os.remove(tmp)
+        raise OSError("copied " + str(written) + " of " + str(size) + " bytes")
+
+    su.copystat(src_path, tmp)
+    os.replace(tmp, dest_path)
+
+# Hash source file (unless cached in source manifest) and copy it, returns manifest entry
+def sync_file(src, dest, rel, stat, cached, dry_run):
+    if cached and cached[:2] == stat:
+        digest = cached[2]
+    else:
+        digest = staging.sha256(os.path.join(src, rel))
+
+    if not dry_run:
+        copy_file(os.path.join(src, rel), os.path.join(dest, rel))
+    return stat + [digest]
+
+# Remove file from destination, and its asset directory once empty
+def remove_file(dest, rel):
+    try:
+        os.remove(os.path.join(dest, rel))
+    except FileNotFoundError:
+        pass
+
+    parent = os.path.dirname(rel)
+    while parent:
+        try:
+            os.rmdir(os.path.join(dest, parent))
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+def sync(src, dest, jobs, full, dry_run):
+
+    src_manifest  = load_manifest(src)
+    dest_manifest = load_manifest(dest)
+
+    # Assets to scan: from journal and top level changes, or everything
+    names, position = read_changes(src, dest_manifest.get('journal', {}))
+    dir_mtime = os.stat(src).st_mtime_ns
+    if full or names is None or not dest_manifest.get('journal'):
+        names = set([name for name in os.listdir(src) if is_mirrored(name)])
+        names |= set([rel.split("/")[0] for rel in dest_manifest['files']])
+        log("scanning all " + str(len(names)) + " assets")
+    else:
+        if dir_mtime != dest_manifest.get('dir_mtime'):
+            listed  = set([name for name in os.listdir(src) if is_mirrored(name)])
+            known   = set([rel.split("/")[0] for rel in dest_manifest['files']])
+            names  |= listed ^ known
+        names |= set([name + ".sha256" for name in names])
+        log(str(len(names)) + " changed assets since last sync")
+
+    # Delta against what the destination holds
+    current = {}
+    for name in names:
+        current.update(scan(src, name))
+    previous = dict([[rel, entry] for rel, entry in dest_manifest['files'].items() if rel.split("/")[0] in names])
+
+    to_copy   = sorted([rel for rel in current if rel not in previous or previous[rel][:2] != current[rel]])
+    to_delete = sorted([rel for rel in previous if rel not in current])
+
+    copied_bytes = 0
+    failed = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {pool.submit(sync_file, src, dest, rel, current[rel], src_manifest['files'].get(rel), dry_run): rel
+                   for rel in to_copy}
+        for future in concurrent.futures.as_completed(futures):
+            rel = futures[future]
+            try:
+                entry = future.result()
+            except OSError as e:
+                log("failed to copy " + rel + ": " + str(e))
+                failed += 1
+                continue
+            src_manifest['files'][rel] = entry
+            dest_manifest['files'][rel] = entry
+            copied_bytes += entry[0]
+            if dry_run:
+                log("would copy " + rel)
+
+    for rel in to_delete:
+        if dry_run:
+            log("would remove " + rel)
+            continue
+        remove_file(dest, rel)
+        dest_manifest['files'].pop(rel, None)
+        src_manifest['files'].pop(rel, None)
+
+    log(("would copy " if dry_run else "copied ") + str(len(to_copy) - failed) + " files (" + str(copied_bytes) + \
+        " bytes), " + ("would remove " if dry_run else "removed ") + str(len(to_delete)))
+
+    # Journal position only advances once everything it named is mirrored
+    if dry_run:
+        return 0
+    if not failed:
+        dest_manifest['journal']   = position
+        dest_manifest['dir_mtime'] = dir_mtime
+    write_manifest(dest, dest_manifest)
+    write_manifest(src, src_manifest, True)
+    return 1 if failed else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally mirror BenchPRO asset repo SRC to DEST")
+    parser.add_argument("--jobs", type=int, default=8, help="Parallel copies.")
+    parser.add_argument("--full", default=False, action='store_true', help="Rescan all assets, not just changed ones.")
+    parser.add_argument("--dry-run", default=False, action='store_true', help="Report changes without copying.")
+    parser.add_argument("src")
+    parser.add_argument("dest")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.src):
+        log("source repo " + args.src + " not found")
+        return 1
+    os.makedirs(args.dest, exist_ok=True)
+
+    return sync(os.path.abspath(args.src), os.path.abspath(args.dest), args.jobs, args.full, args.dry_run)
+
+if __name__ == "__main__":
+    sys.exit(main())
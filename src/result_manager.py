@@ -3,24 +3,26 @@ import configparser as cp
 import copy
 import csv
 import glob as gb
+import json
 import os
 import shutil as su
+import socket
 import subprocess
 import sys
 import time
+import zipfile
 from datetime import datetime
 
-try:
-    import psycopg2
-    from psycopg2 import sql
-except ImportError:
-    pass
-
 # Local Imports
 import src.logger as logger
+import src.staging as staging
+import src.telemetry as telemetry
 
 glob = None
 
+# Parsed output file markers of the result being captured
+marker_cache = {}
+
 # Move benchmark directory from complete to captured/failed, once processed
 def move_to_archive(result_path, dest):
     if not os.path.isdir(result_path):
@@ -37,22 +39,90 @@ def move_to_archive(result_path, dest):
         # Try again
         move_to_archive(result_path + ".dup", dest)
 
+# Atomically claim pending result by renaming it into claiming/, returns claimed path or None if another capture has it
+def claim_result(result_dir):
+    claim_path = os.path.join(glob.stg['claiming_path'], result_dir)
+    os.makedirs(glob.stg['claiming_path'], exist_ok=True)
+    try:
+        os.rename(os.path.join(glob.stg['pending_path'], result_dir), claim_path)
+    except OSError as e:
+        glob.lib.msg.log("Unable to claim " + result_dir + ", skipping: " + str(e))
+        return None
+
+    # Claim owner, used to expire claims of crashed captures
+    with open(os.path.join(claim_path, glob.stg['claim_file']), 'w') as f:
+        f.write(glob.hostname + " " + str(os.getpid()) + " " + str(time.time()) + "\n")
+    return claim_path
+
+# Return claimed result to pending, eg. failed results that are not moved to failed/
+def release_claim(result_path):
+    try:
+        os.remove(os.path.join(result_path, glob.stg['claim_file']))
+    except OSError:
+        pass
+    try:
+        os.rename(result_path, os.path.join(glob.stg['pending_path'], os.path.basename(result_path)))
+    except OSError as e:
+        glob.lib.msg.warning("Failed to return " + glob.lib.rel_path(result_path) + " to pending: " + str(e))
+
+# Return results claimed longer than claim_timeout ago to pending, their capture has died
+def release_stale_claims():
+    if not os.path.isdir(glob.stg['claiming_path']):
+        return
+
+    for result_dir in glob.lib.files.get_subdirs(glob.stg['claiming_path']):
+        result_path = os.path.join(glob.stg['claiming_path'], result_dir)
+        claim_file = os.path.join(result_path, glob.stg['claim_file'])
+        try:
+            claim_time = os.path.getmtime(claim_file) if os.path.isfile(claim_file) else os.path.getctime(result_path)
+        except OSError:
+            continue
+        if time.time() - claim_time > glob.stg['claim_timeout']:
+            glob.lib.msg.warning("Releasing stale capture claim on " + result_dir)
+            release_claim(result_path)
+
+# Job ID from report of result being captured, if read
+def get_job_id():
+    try:
+        return glob.report_dict['bench']['task_id']
+    except (AttributeError, KeyError, TypeError):
+        return ""
+
+# Actual node-hours of result, and the estimate made at submission if there was one
+def get_node_hours():
+    node_hours = {}
+    elapsed_time = get_elapsed_time()
+    if elapsed_time is not None:
+        node_hours['node_hours'] = round(int(get_required_key('bench', 'nodes')) * elapsed_time / 3600., 3)
+    if get_optional_key('bench', 'est_node_hours'):
+        node_hours['est_node_hours'] = float(get_optional_key('bench', 'est_node_hours'))
+    return node_hours
+
 # Create .capture-complete file in result dir
 def capture_complete(result_path):
     glob.lib.msg.low("Successfully captured result in " + glob.lib.rel_path(result_path))
+    info = get_node_hours()
+    if info and get_optional_key('bench', 'campaign'):
+        info['campaign'] = get_optional_key('bench', 'campaign')
+    glob.lib.event.emit("captured", "bench", result_path, get_job_id(), info=info)
     move_to_archive(result_path, glob.stg['captured_path'])
 
 # Create .capture-failed file in result dir
 def capture_failed(result_path):
     glob.lib.msg.high("Failed to capture result in " + glob.lib.rel_path(result_path))
+    glob.lib.event.emit("failed", "bench", result_path, get_job_id())
     # Move failed result to subdir if 'move_failed_result' is set
     if glob.stg['move_failed_result']:
         move_to_archive(result_path, glob.stg['failed_path'])
+    else:
+        release_claim(result_path)
 
 def capture_skipped(result_path):
     glob.lib.msg.low("Skipping this dryrun result in " + glob.lib.rel_path(result_path))
     if glob.stg['move_failed_result']:
         move_to_archive(result_path, glob.stg['failed_path'])
+    else:
+        release_claim(result_path)
 
 # Function to test if benchmark produced valid result
 def validate_result(result_path):
@@ -87,8 +157,9 @@ def validate_result(result_path):
         # Run validation expression on output file
         try:
             glob.lib.msg.log("Running: '" + glob.report_dict['result']['expr'] + "'")
-            cmd = subprocess.run(glob.report_dict['result']['expr'], shell=True,
-                                         check=True, capture_output=True, universal_newlines=True)
+            with glob.lib.prof.command("expr"):
+                cmd = subprocess.run(glob.report_dict['result']['expr'], shell=True,
+                                             check=True, capture_output=True, universal_newlines=True)
             result_str = cmd.stdout.strip()
             glob.lib.msg.log("Pulled result from " + glob.output_path + ":  " + result_str + \
                             " " + glob.report_dict['result']['unit'])
@@ -109,8 +180,9 @@ def validate_result(result_path):
         # Run validation script on output file
         try:
             glob.lib.msg.log("Running: '" + result_script + " " + glob.output_path + "'")
-            cmd = subprocess.run(result_script + " " + glob.output_path, shell=True,
-                                check=True, capture_output=True, universal_newlines=True)
+            with glob.lib.prof.command("script"):
+                cmd = subprocess.run(result_script + " " + glob.output_path, shell=True,
+                                    check=True, capture_output=True, universal_newlines=True)
             result_str = cmd.stdout.strip()
             glob.lib.msg.log("Pulled result from " + glob.output_path + ":  " + result_str + " " + \
                             glob.report_dict['result']['unit'])
@@ -159,18 +231,52 @@ def get_optional_key(section, key):
     except:
         return ""
 
-# Get timestamp from output file
-def get_timestamp(line_id):
+# Parse START/END lines and BP_PHASE markers from job output file in one pass
+# Returns {'START': line, 'END': line, 'phases': {name: seconds}}, repeated phases are summed
+def read_markers():
     output_file = os.path.join(glob.result_path, glob.report_dict['bench']['stdout'])
 
-    # Search for tiem line and return in
-    with open(output_file, 'r') as f:
-        for line in f.readlines():
-            if line.startswith(line_id):
-                return line
-
-    # Time line not found 
-    return None
+    markers = {'START': None, 'END': None, 'phases': {}}
+    begin = {}
+    with open(output_file, 'r', errors='replace') as f:
+        for line in f:
+            if line.startswith("BP_PHASE "):
+                fields = line.split()
+                if len(fields) != 4 or not fields[3].isdigit():
+                    continue
+                if fields[2] == "begin":
+                    begin[fields[1]] = int(fields[3])
+                elif fields[2] == "end" and fields[1] in begin:
+                    markers['phases'][fields[1]] = markers['phases'].get(fields[1], 0) + \
+                                                    (int(fields[3]) - begin.pop(fields[1])) / 1e9
+
+            elif line.startswith("START") and not markers['START']:
+                markers['START'] = line
+            elif line.startswith("END") and not markers['END']:
+                markers['END'] = line
+
+    return markers
+
+# Get markers for current result, output file is read once
+def get_markers():
+    if glob.result_path not in marker_cache:
+        marker_cache.clear()
+        marker_cache[glob.result_path] = read_markers()
+    return marker_cache[glob.result_path]
+
+# Get timestamp line from output file
+def get_timestamp(line_id):
+    return get_markers()[line_id]
+
+# Per-phase durations in seconds, written to phases.txt alongside the result
+def get_phase_times():
+    phases = get_markers()['phases']
+    if phases:
+        with open(os.path.join(glob.result_path, "phases.txt"), 'w') as f:
+            for phase in phases:
+                f.write(phase.ljust(18) + "= " + str(round(phases[phase], 3)) + "\n")
+        glob.lib.msg.low("Phases: " + ", ".join([phase + " " + str(round(phases[phase], 1)) + "s" for phase in phases]))
+    return {"phase_" + phase + "_sec": round(phases[phase], 3) for phase in phases}
 
 # Return start time from job output file
 def get_start_time():
@@ -186,6 +292,13 @@ def get_end_time():
         return get_timestamp("END").split(" ")[1]
     return None
 
+# Get epoch seconds from START/END line of job output file
+def get_epoch(line_id):
+    line = get_timestamp(line_id)
+    if line:
+        return float(line.split(" ")[2])
+    return None
+
 # Get difference of end and start times from job output file
 def get_elapsed_time():
     start_sec = get_timestamp("START")
@@ -195,6 +308,16 @@ def get_elapsed_time():
         return int(end_sec.split(" ")[2]) - int(start_sec.split(" ")[2])
     return None
 
+# Reduce sampler records to summary metrics, written to telemetry.txt alongside the result
+def get_telemetry_summary():
+    summary = telemetry.summarize(os.path.join(glob.result_path, "telemetry"))
+    if summary:
+        with open(os.path.join(glob.result_path, "telemetry.txt"), 'w') as f:
+            for key in summary:
+                f.write(key.ljust(18) + "= " + str(summary[key]) + "\n")
+        glob.lib.msg.log("Telemetry summary: " + str(summary))
+    return summary
+
 # Generate dict for postgresql 
 def get_insert_dict(result_path, result, unit):
     
@@ -242,6 +365,24 @@ def get_insert_dict(result_path, result, unit):
     insert_dict['resource_path']    = os.path.join(glob.user, insert_dict['system'], insert_dict['task_id'])
     insert_dict['app_id']           = get_optional_key('build', 'app_id')
 
+    model_fields = glob.lib.db.get_table_fields(glob.stg['result_table'])
+
+    # Exit status from completion marker where there is no final accounting record (local runs, or jobs still
+    # completing when their marker was seen)
+    acct_metrics = glob.lib.sched.get_acct_metrics(task_id)
+    marker = glob.lib.read_done_marker(glob.result_path)
+    if marker and 'status' in marker and 'exit_code' not in acct_metrics:
+        acct_metrics['exit_code'] = marker['status']
+
+    # Watchdog abort reason
+    abort_reason = glob.lib.get_abort_reason(glob.result_path)
+    if abort_reason:
+        acct_metrics['abort_reason'] = abort_reason
+
+    # Accounting metrics, node-hours, phase times and telemetry summaries are stored where the results table has columns for them
+    for key, value in {**acct_metrics, **get_node_hours(), **get_phase_times(), **get_telemetry_summary()}.items():
+        if key in model_fields:
+            insert_dict[key] = value
 
     # Remove None values
     insert_fields = list(insert_dict.keys())
@@ -250,7 +391,6 @@ def get_insert_dict(result_path, result, unit):
         if insert_dict[key] is None:
             insert_dict.pop(key)
 
-    model_fields = glob.lib.db.get_table_fields(glob.stg['result_table'])
     insert_fields = insert_dict.keys()
 
     for key in insert_fields:
@@ -272,7 +412,8 @@ def make_remote_dir(dest_dir):
         expr = "ssh -i " + glob.stg['ssh_key_path'] +" " + glob.stg['ssh_user'] + "@" + glob.stg['db_host'] + " -t mkdir -p " + dest_dir
         glob.lib.msg.log("Running: '" + expr + "'")
         # ssh -i [key] [user]@[db_host] -t mkdir -p [dest_dir]
-        cmd = subprocess.run(expr, shell=True, check=True, capture_output=True, universal_newlines=True)
+        with glob.lib.prof.command("ssh"):
+            cmd = subprocess.run(expr, shell=True, check=True, capture_output=True, universal_newlines=True)
 
         glob.lib.msg.log("Directory " + dest_dir  + " created on " + glob.stg['db_host'])
 
@@ -291,7 +432,8 @@ def scp_files(src_dir, dest_dir):
         expr = "scp -i " + glob.stg['ssh_key_path'] + " -r " + src_dir + " " + glob.stg['ssh_user'] + "@" + glob.stg['db_host'] + ":" + dest_dir + "/"
         glob.lib.msg.log("Running: '" + expr + "'")
         # scp -i [key] -r [src_dir] [user]@[server]:[dest_dir]
-        cmd = subprocess.run(expr, shell=True, check=True, capture_output=True, universal_newlines=True)
+        with glob.lib.prof.command("scp"):
+            cmd = subprocess.run(expr, shell=True, check=True, capture_output=True, universal_newlines=True)
 
         glob.lib.msg.log("Copied " + src_dir + " to " + glob.stg['db_host'] + ":" + dest_dir)
 
@@ -302,9 +444,43 @@ def scp_files(src_dir, dest_dir):
 
     return True
 
+# Return per-node cache key if hw_report is linked into the hardware report cache
+def get_hw_key():
+    hw_report = os.path.join(glob.result_path, "hw_report")
+    if os.path.islink(hw_report) and os.path.isdir(hw_report):
+        return os.path.basename(os.path.realpath(hw_report))
+    return None
+
+# Record which shared hardware report belongs to this result, sent along with the other *.txt files
+def write_hw_ref(hw_key, hw_path):
+    with open(os.path.join(glob.result_path, "hw_report.txt"), 'w') as f:
+        f.write("hw_key  = " + hw_key + "\n")
+        f.write("hw_path = " + os.path.join(hw_path, hw_key) + "\n")
+
+# Check if cached hardware report was already sent to destination
+def hw_report_sent(hw_cache, dest):
+    sent_file = hw_cache + ".sent"
+    if not os.path.isfile(sent_file):
+        return False
+    with open(sent_file, 'r') as f:
+        return dest in f.read().splitlines()
+
+# Mark cached hardware report as sent, best effort - an unwritable cache just means it is sent again
+def mark_hw_report_sent(hw_cache, dest):
+    try:
+        with open(hw_cache + ".sent", 'a') as f:
+            f.write(dest + "\n")
+    except OSError as e:
+        glob.lib.msg.log("Unable to mark " + hw_cache + " as sent: " + str(e))
+
 # Send benchmark provenance files to db server
 def send_files(result_dir, dest_dir):
 
+    # Hardware reports linked from the per-node cache are sent once to a shared dir, not per result
+    hw_key    = get_hw_key()
+    hw_shared = os.path.join("hw_reports", get_required_key('build', 'system'))
+    hw_cache  = os.path.realpath(os.path.join(glob.result_path, "hw_report"))
+
     # Use SCP
     if glob.stg['file_copy_handler'] == "scp":
         if not glob.user or not glob.stg['ssh_key']:
@@ -316,6 +492,10 @@ def send_files(result_dir, dest_dir):
         if not glob.lib.files.find_exact(glob.stg['ssh_key_path'], ""):
             glob.lib.msg.error("Unable to access ssh key " + glob.stg('ssh_key'))
 
+        # Reference shared hardware report from this result
+        if hw_key:
+            write_hw_ref(hw_key, os.path.join(glob.stg['scp_path'], hw_shared))
+
         # Create directory on remote server
         if make_remote_dir(server_path):
 
@@ -333,8 +513,20 @@ def send_files(result_dir, dest_dir):
             if os.path.isdir(os.path.join(glob.result_path, "bench_files")):
                 scp_files(os.path.join(glob.result_path, "bench_files"), server_path)
 
-            # SCP hw_utils to server
-            if os.path.isdir(os.path.join(glob.result_path, "hw_report")):
+            # SCP telemetry records to server
+            if os.path.isdir(os.path.join(glob.result_path, "telemetry")):
+                scp_files(os.path.join(glob.result_path, "telemetry"), server_path)
+
+            # SCP cached hw_report to shared dir on server, once per destination
+            if hw_key:
+                hw_dest = glob.stg['db_host'] + ":" + os.path.join(glob.stg['scp_path'], hw_shared)
+                if not hw_report_sent(hw_cache, hw_dest):
+                    if make_remote_dir(os.path.join(glob.stg['scp_path'], hw_shared)) and \
+                            scp_files(hw_cache, os.path.join(glob.stg['scp_path'], hw_shared)):
+                        mark_hw_report_sent(hw_cache, hw_dest)
+
+            # SCP uncached hw_report to server
+            elif os.path.isdir(os.path.join(glob.result_path, "hw_report")):
                 scp_files(os.path.join(glob.result_path, "hw_report"), server_path)
 
 
@@ -353,30 +545,198 @@ def send_files(result_dir, dest_dir):
         # File destination
         copy_path = os.path.join(glob.stg['collection_path'], dest_dir)
         glob.lib.files.create_dir(copy_path) 
-        
-        # Copy files to local directory
-        glob.lib.files.copy(copy_path, glob.output_path, "", False)
 
-        # Copy matching files to server
+        # Reference shared hardware report from this result
+        if hw_key:
+            write_hw_ref(hw_key, os.path.join(glob.stg['collection_path'], hw_shared))
+        
+        # Files to collect, keyed by path relative to result dir
+        files = {os.path.basename(glob.output_path): glob.output_path}
         search_substrings = ["*.err", "*.out", "*.sched", "*.job", "*.txt", "*.log"]
         for substring in search_substrings:
-            matching_files = gb.glob(os.path.join(glob.result_path, substring))
-            for match in matching_files:
-                glob.lib.files.copy(copy_path, os.path.join(glob.result_path, match), "", False)
-
-        # SCP bench_files to server
-        if os.path.isdir(os.path.join(glob.result_path, "bench_files")):
-            glob.lib.files.copy(copy_path, os.path.join(glob.result_path, "bench_files"), "", False)
-
-        # SCP hw_utils to server
-        if os.path.isdir(os.path.join(glob.result_path, "hw_report")):
+            for match in gb.glob(os.path.join(glob.result_path, substring)):
+                files[os.path.basename(match)] = match
+
+        # bench_files, telemetry records and uncached hw_report
+        for subdir in ["bench_files", "telemetry"] + ([] if hw_key else ["hw_report"]):
+            for root, dirs, names in os.walk(os.path.join(glob.result_path, subdir)):
+                for name in names:
+                    files[os.path.relpath(os.path.join(root, name), glob.result_path)] = os.path.join(root, name)
+
+        # Store each unique file once in the blob store, result files are hardlinks to blobs
+        manifest = {}
+        new_blobs = 0
+        for rel_path in sorted(files):
+            digest, blob, new = glob.lib.files.store_blob(glob.stg['blob_path'], files[rel_path])
+            dest = os.path.join(copy_path, rel_path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            glob.lib.files.link_or_copy(blob, dest)
+            manifest[rel_path] = digest
+            new_blobs += new
+
+        # Per-result manifest of path -> SHA-256
+        with open(os.path.join(copy_path, "manifest.json"), 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+        glob.lib.msg.log("Collected " + str(len(manifest)) + " files into " + copy_path + ", " + str(new_blobs) + " new blobs")
+
+        # Copy cached hw_report to shared dir if not already there
+        if hw_key:
+            hw_path = os.path.join(glob.stg['collection_path'], hw_shared)
+            if not os.path.isdir(os.path.join(hw_path, hw_key)):
+                glob.lib.files.create_dir(hw_path)
+                glob.lib.files.copy(hw_path, hw_cache, hw_key, False)
+
+        # Copy uncached hw_report
+        elif os.path.isdir(os.path.join(glob.result_path, "hw_report")):
             glob.lib.files.copy(copy_path, os.path.join(glob.result_path, "hw_report"), "", False)
 
     # Transmission method neither 'scp' or 'cp'
     else:
        glob.lib.msg.error("unknown 'file_copy_handler' option in settings.cfg. Accepts 'scp' or 'cp'.") 
        
-# Look for results and send them to db
+# Capture single result, returns 1 if captured
+def capture_one(result_dir):
+
+    # Claim result so concurrent captures never process it twice
+    glob.result_path = claim_result(result_dir)
+    if not glob.result_path:
+        return 0
+
+    # Capture application profile for this result to db if not already present
+    glob.lib.msg.log("Capturing " + result_dir)
+    glob.lib.prof.next("db_application")
+    glob.lib.db.capture_application(glob.result_path)
+
+    # Benchmark stopped early by watchdog
+    abort_reason = glob.lib.get_abort_reason(glob.result_path)
+    if abort_reason:
+        glob.lib.msg.warning("Benchmark in " + glob.lib.rel_path(glob.result_path) + " was aborted by watchdog, " + abort_reason)
+
+    glob.lib.prof.next("validate")
+    result, unit = validate_result(glob.result_path)
+
+    # If unable to get valid result, skipping this result
+    if result == "failed":
+        capture_failed(glob.result_path)
+        return 0
+
+    if result == "skipped":
+        capture_skipped(glob.result_path)
+        return 0
+
+    glob.lib.msg.low("Result: " + str(result) + " " + unit)
+
+    # Job start and end events from output file timestamps
+    for event, line_id in [["started", "START"], ["ended", "END"]]:
+        timestamp = get_epoch(line_id)
+        if timestamp:
+            glob.lib.event.emit(event, "bench", glob.result_path, get_job_id(), timestamp)
+
+    # 1. Get insert_dict
+    glob.lib.prof.next("insert_dict")
+    insert_dict = get_insert_dict(glob.result_path, result, unit)
+
+    # If insert_dict failed
+    if not insert_dict:
+        capture_failed(glob.result_path)
+        return 0
+
+    # 2. Insert result into db
+    glob.lib.msg.low("Inserting into database...")
+    glob.lib.prof.next("db_insert")
+    glob.lib.db.capture_result(insert_dict)
+
+    # 3. Copy files to collection dir
+    glob.lib.msg.low("Sending provenance data...")
+    glob.lib.prof.next("send_files")
+    send_files(glob.result_path, insert_dict['resource_path'])
+    glob.lib.event.emit("transferred", "bench", glob.result_path, get_job_id(), info={'dest': insert_dict['resource_path']})
+
+    # 4. Touch .capture-complete file
+    capture_complete(glob.result_path)
+    return 1
+
+# Capture list of completed results and send them to db
+def capture_batch(results):
+
+    glob.lib.msg.log("Capturing " + str(len(results)) + " results")
+    captured = 0
+    if len(results) == 1: glob.lib.msg.heading("Starting capture for " + str(len(results)) + " new result.")
+    else: glob.lib.msg.heading("Starting capture for " + str(len(results)) + " new results.")
+
+    # Accounting for jobs found complete by marker, without a sacct state check
+    task_ids = [glob.lib.report.get_task_id("bench", result) for result in results]
+    glob.lib.sched.prefetch_acct([task_id for task_id in task_ids if task_id not in glob.lib.sched.acct])
+
+    for result_dir in results:
+        with glob.lib.prof.phase("capture"):
+            captured += capture_one(result_dir)
+
+    glob.lib.msg.high(["", "Done. " + str(captured) + " results sucessfully captured"])
+
+# Pending results with a completion marker, less those already tried with the same marker
+# tried maps result to the marker mtime it was last tried with and is updated, a failed capture returned to
+# pending (move_failed_result=False) is only tried again once its job rewrites the marker
+def get_marked_results(tried):
+
+    results = []
+    for result in glob.lib.get_pending_results():
+        result_path = os.path.join(glob.stg['pending_path'], result)
+        try:
+            mtime = os.path.getmtime(os.path.join(result_path, glob.stg['done_marker']))
+        except OSError:
+            continue
+        if tried.get(result) != mtime and glob.lib.read_done_marker(result_path):
+            tried[result] = mtime
+            results.append(result)
+    return results
+
+# Capture results as their completion markers appear, until interrupted
+# inotify may miss markers written from other nodes on network filesystems, so markers are also rescanned every watch_interval
+# Results already tried by capture_result are left alone until their marker is rewritten
+def watch_results(results):
+
+    pending_path = glob.stg['pending_path']
+    if not glob.lib.watch.start():
+        glob.lib.msg.warning("inotify not available, checking for completion markers every " + str(glob.stg['watch_interval']) + "s")
+
+    glob.lib.watch.add(pending_path)
+    for result in glob.lib.get_pending_results():
+        glob.lib.watch.add(os.path.join(pending_path, result))
+
+    glob.lib.msg.heading("Watching " + glob.lib.rel_path(pending_path) + " for completed results, Ctrl+C to stop.")
+    tried = {}
+    for result in results:
+        try:
+            tried[result] = os.path.getmtime(os.path.join(pending_path, result, glob.stg['done_marker']))
+        except OSError:
+            pass
+
+    try:
+        while True:
+            if glob.lib.watch.fd is not None:
+                events = glob.lib.watch.wait(glob.stg['watch_interval'])
+            else:
+                events = []
+                time.sleep(glob.stg['watch_interval'])
+
+            # Watch new result directories
+            for path, name, is_dir in events:
+                if is_dir and path == pending_path:
+                    glob.lib.watch.add(os.path.join(pending_path, name))
+
+            results = get_marked_results(tried)
+            if results:
+                capture_batch(results)
+                for result in results:
+                    glob.lib.watch.remove(os.path.join(pending_path, result))
+
+    except KeyboardInterrupt:
+        glob.lib.msg.high("Stopped watching.")
+
+    glob.lib.watch.stop()
+
 def capture_result(glob_obj):
     global glob
     glob = glob_obj
@@ -384,59 +744,25 @@ def capture_result(glob_obj):
     # Start logger
     logger.start_logging("CAPTURE", glob.stg['results_log_file'] + "_" + glob.stg['time_str'] + ".log", glob)
 
+    # Return results left claimed by crashed captures
+    release_stale_claims()
+
     # Get list of results in $BP_RESULTS/complete with a COMPLETE job state
-    results = glob.lib.get_completed_results(glob.lib.get_pending_results(), True)
+    with glob.lib.prof.phase("find_results"):
+        results = glob.lib.get_completed_results(glob.lib.get_pending_results(), True)
 
     # No outstanding results
     if not results:
         glob.lib.msg.high("No new results found in " + glob.lib.rel_path(glob.stg['pending_path']))
 
     else:
-        glob.lib.msg.log("Capturing " + str(len(results)) + " results")
-        captured = 0
-        if len(results) == 1: glob.lib.msg.heading("Starting capture for " + str(len(results)) + " new result.")
-        else: glob.lib.msg.heading("Starting capture for " + str(len(results)) + " new results.")
-
-        for result_dir in results:
-            # Capture application profile for this result to db if not already present
-            glob.lib.msg.log("Capturing " + result_dir)
-            glob.lib.db.capture_application(os.path.join(glob.stg['pending_path'], result_dir))
-
-            glob.result_path = os.path.join(glob.stg['pending_path'], result_dir)
-            result, unit = validate_result(glob.result_path)
-
-            # If unable to get valid result, skipping this result
-            if result == "failed":
-                capture_failed(glob.result_path)
-                continue
-            
-            if result == "skipped":
-                capture_skipped(glob.result_path)
-                continue
-
-            glob.lib.msg.low("Result: " + str(result) + " " + unit)
-
-            # 1. Get insert_dict
-            insert_dict = get_insert_dict(glob.result_path, result, unit)
-
-            # If insert_dict failed
-            if not insert_dict:
-                capture_failed(glob.result_path)
-                continue
-
-            # 2. Insert result into db
-            glob.lib.msg.low("Inserting into database...")
-            glob.lib.db.capture_result(insert_dict)
-
-            # 3. Copy files to collection dir
-            glob.lib.msg.low("Sending provenance data...")
-            send_files(glob.result_path, insert_dict['resource_path'])
+        capture_batch(results)
 
-            # 4. Touch .capture-complete file
-            capture_complete(glob.result_path)
-            captured += 1
+    glob.lib.prof.report("capture")
 
-        glob.lib.msg.high(["", "Done. " + str(captured) + " results sucessfully captured"])
+    # Keep capturing as results complete
+    if glob.args.watch:
+        watch_results(results)
 
 # Test if search field is valid in results/models.py
 def test_search_field(field):
@@ -550,7 +876,7 @@ def list_results(glob_obj):
         if running:
             print("Found", len(running), "running benchmarks:")
             for result in running:
-                print("  " + result)
+                print("  " + result + get_prefetch_label(result))
         else:
             print("No running benchmarks found.")
         print()
@@ -567,12 +893,15 @@ def list_results(glob_obj):
             print("No complete benchmark results found.")
         print()
 
-    # Captured results
+    # Captured results, including those compacted into bundles
     if glob.args.listResults == 'captured' or glob.args.listResults == 'all':
-        if captured_list:
-            print("Found", len(captured_list), "captured benchmark results:")
+        bundled_list = get_bundled_results()
+        if captured_list or bundled_list:
+            print("Found", len(captured_list) + len(bundled_list), "captured benchmark results:")
             for result in captured_list:
                 print("  " + result)
+            for result, bundle in bundled_list:
+                print("  " + result + "  [" + os.path.basename(bundle) + "]")
         else:
             print("No captured benchmark results found.")
         print()
@@ -591,11 +920,138 @@ def list_results(glob_obj):
     if not glob.args.listResults in ['running', 'complete', 'captured', 'failed', 'all']:
         print("Invalid input, provide 'running', 'complete', 'captured', 'failed' or 'all'.")
 
+# Input asset prefetch progress for pending result, empty if not prefetched
+def get_prefetch_label(result):
+    status = glob.lib.files.get_prefetch_status(os.path.join(glob.stg['pending_path'], result))
+    if not status:
+        return ""
+
+    # Prefetcher on this host exited without finishing
+    if status['state'] == "running" and status['host'] == socket.gethostname():
+        try:
+            os.kill(status['pid'], 0)
+        except ProcessLookupError:
+            status['state'] = "interrupted"
+        except OSError:
+            pass
+
+    states = list(status['assets'].values())
+    if status['state'] == "running":
+        label = "prefetching " + str(states.count("ready")) + "/" + str(len(states)) + " assets"
+    elif status['state'] == "done":
+        label = "assets ready"
+    elif status['state'] == "interrupted":
+        label = "prefetch interrupted, " + str(states.count("ready")) + "/" + str(len(states)) + " assets ready"
+    else:
+        label = "prefetch failed: " + ", ".join([asset for asset in status['assets'] if status['assets'][asset] == "failed"])
+    return "  [" + label + "]"
+
+# Monthly bundle of compacted captured results
+def get_bundle_path(month):
+    return os.path.join(glob.stg['captured_path'], "results_" + month + ".zip")
+
+# List bundle files in captured dir
+def get_bundles():
+    return sorted(gb.glob(os.path.join(glob.stg['captured_path'], "results_*.zip")))
+
+# Result dir names in bundle, read from the zip central directory only
+def get_bundle_contents(bundle):
+    with zipfile.ZipFile(bundle) as zf:
+        return sorted(set([name.split("/")[0] for name in zf.namelist()]))
+
+# List of [result, bundle] for all compacted results
+def get_bundled_results():
+    bundled = []
+    for bundle in get_bundles():
+        try:
+            bundled += [[result, bundle] for result in get_bundle_contents(bundle)]
+        except (OSError, zipfile.BadZipFile) as e:
+            glob.lib.msg.warning("Unable to read results bundle " + glob.lib.rel_path(bundle) + ": " + str(e))
+    return bundled
+
+# Read single file of bundled result without unpacking the bundle
+def read_from_bundle(bundle, result, file_name):
+    with zipfile.ZipFile(bundle) as zf:
+        return zf.read(result + "/" + file_name).decode(errors='replace')
+
+# Add result directory to open bundle, paths stored relative to captured dir
+# Symlinks (eg. hw_report linked into the per-node cache, inputs linked into $BP_REPO) are left out, as are
+# input files staged into the result dir, listed in its .bp_staged, which are links or copies of $BP_REPO assets
+def add_to_bundle(zf, result):
+    result_path = os.path.join(glob.stg['captured_path'], result)
+
+    staged = set()
+    try:
+        with open(os.path.join(result_path, staging.staged_file), 'r') as f:
+            staged = set([os.path.normpath(os.path.join(result_path, line.strip())) for line in f if line.strip()])
+    except OSError:
+        pass
+
+    for root, dirs, files in os.walk(result_path):
+        for file_name in sorted(files):
+            file_path = os.path.normpath(os.path.join(root, file_name))
+            if os.path.islink(file_path) or file_path in staged or not os.path.isfile(file_path):
+                continue
+            zf.write(file_path, os.path.relpath(file_path, glob.stg['captured_path']).replace(os.sep, "/"))
+
+# Pack captured results older than N days into monthly zip bundles
+def compact_results(glob_obj):
+    global glob
+    glob = glob_obj
+
+    days = glob.args.compact
+    cutoff = time.time() - days * 86400
+
+    # Group by month of last modification (capture time)
+    months = {}
+    for result in glob.lib.get_captured_results():
+        mtime = os.path.getmtime(os.path.join(glob.stg['captured_path'], result))
+        if mtime < cutoff:
+            months.setdefault(datetime.fromtimestamp(mtime).strftime("%Y-%m"), []).append(result)
+
+    if not months:
+        print("No captured results older than " + str(days) + " days found.")
+        return
+
+    for month in sorted(months):
+        bundle = get_bundle_path(month)
+        tmp_bundle = bundle + ".tmp"
+
+        # Append to copy of existing bundle and swap it in, a failed run never leaves a broken bundle
+        existing = []
+        if os.path.isfile(bundle):
+            su.copyfile(bundle, tmp_bundle)
+            existing = get_bundle_contents(tmp_bundle)
+
+        packed = []
+        with zipfile.ZipFile(tmp_bundle, 'a', zipfile.ZIP_DEFLATED) as zf:
+            for result in sorted(months[month]):
+                if result in existing:
+                    glob.lib.msg.warning("Result " + result + " already in " + glob.lib.rel_path(bundle) + ", skipping.")
+                    continue
+                add_to_bundle(zf, result)
+                packed.append(result)
+
+        os.replace(tmp_bundle, bundle)
+
+        # Remove directories only once the bundle holding them is in place
+        for result in packed:
+            su.rmtree(os.path.join(glob.stg['captured_path'], result))
+
+        print("Packed " + str(len(packed)) + " results into " + glob.lib.rel_path(bundle))
+
 # Get list of result dirs matching search str
 def get_matching_results(result_path, result_str):
     matching_results = gb.glob(os.path.join(result_path, "*"+result_str+"*"))
     return matching_results
 
+# Print report sections
+def print_report(report_dict):
+    for section in report_dict:
+        print("[" + section + "]")
+        for key in report_dict[section]:
+            print(key.ljust(20) + report_dict[section][key])
+
 # Show info for local result
 def query_result(glob_obj, result_label):
     global glob
@@ -605,17 +1061,32 @@ def query_result(glob_obj, result_label):
     matching_dirs = get_matching_results(glob.stg['pending_path'],  result_label) + \
                     get_matching_results(glob.stg['captured_path'], result_label) + \
                     get_matching_results(glob.stg['failed_path'],   result_label)
+    matching_dirs = [x for x in matching_dirs if os.path.isdir(x)]
+
+    # Search bundles of compacted results
+    matching_bundled = [[result, bundle] for result, bundle in get_bundled_results() if result_label in result]
 
     # No result found
-    if not matching_dirs:
+    if not matching_dirs and not matching_bundled:
         glob.lib.msg.error("No matching result found matching '" + result_label + "'.")
 
     # Multiple results
-    elif len(matching_dirs) > 1:
+    elif len(matching_dirs) + len(matching_bundled) > 1:
         glob.lib.msg.error(["Multiple results found matching '" + result_label + "'"] + \
-                            sorted(["    " + x.split(glob.stg['sl'])[-1] for x in matching_dirs])+ \
+                            sorted(["    " + x.split(glob.stg['sl'])[-1] for x in matching_dirs] + \
+                                   ["    " + x[0] for x in matching_bundled])+ \
                             [""])
 
+    # Compacted result, read report from bundle
+    if matching_bundled:
+        result, bundle = matching_bundled[0]
+        print("Report for benchmark: " + result_label)
+        print("----------------------------------------")
+        print_report(glob.lib.report.read_string(read_from_bundle(bundle, result, glob.stg['bench_report_file'])))
+        print("----------------------------------------")
+        print("Captured result, archived in " + glob.lib.rel_path(bundle))
+        return
+
     result_path = os.path.join(glob.stg['pending_path'], matching_dirs[0])
     bench_report = os.path.join(result_path, "bench_report.txt")
 
@@ -629,11 +1100,7 @@ def query_result(glob_obj, result_label):
 
     # Read report and print it
     report_dict = glob.lib.report.read(bench_report)
-
-    for section in report_dict:
-        print("[" + section + "]")
-        for key in report_dict[section]:
-            print(key.ljust(20) + report_dict[section][key])
+    print_report(report_dict)
 
     print("----------------------------------------")
 
@@ -672,7 +1139,10 @@ def delete_results(result_list):
     time.sleep(glob.stg['timeout'])
     print("No going back now...")
     for result in result_list:
-        su.rmtree(result)
+        if os.path.isdir(result):
+            su.rmtree(result)
+        else:
+            os.remove(result)
     print("Done.")
 
 # Remove local result
@@ -694,34 +1164,37 @@ def remove_result(glob_obj):
         else:
             print("No failed results found.")
 
-    # Check all results for captured status and remove
+    # Check all results for captured status and remove, including bundles of compacted results
     elif glob.args.delResult[0] == 'captured':
-        if captured_list:
-            print("Found", len(captured_list), "captured results:")
-            print_results(captured_list)
-            delete_results([os.path.join(glob.stg['captured_path'], x) for x in captured_list])
+        bundles = get_bundles()
+        if captured_list or bundles:
+            print("Found", len(captured_list), "captured results and", len(bundles), "bundles:")
+            print_results(captured_list + [os.path.basename(x) for x in bundles])
+            delete_results([os.path.join(glob.stg['captured_path'], x) for x in captured_list] + bundles)
         else:
             print("No captured results found.")
 
     # Remove all results in ./results dir
     elif glob.args.delResult[0] == 'all':
 
+        bundles = get_bundles()
         all_results = pending_list + captured_list + failed_list
 
-        if all_results:
-            print("Found", len(all_results), " results:")
-            print_results(all_results)
+        if all_results or bundles:
+            print("Found", len(all_results), " results and", len(bundles), "bundles:")
+            print_results(all_results + [os.path.basename(x) for x in bundles])
             delete_results([os.path.join(glob.stg['pending_path'], x) for x in pending_list] +\
                             [os.path.join(glob.stg['captured_path'], x) for x in captured_list] +\
-                            [os.path.join(glob.stg['failed_path'], x) for x in failed_list])
+                            [os.path.join(glob.stg['failed_path'], x) for x in failed_list] + bundles)
         else:
             print("No results found.")
 
-    # Remove unique result matching input str
+    # Remove unique result matching input str, bundles are only removed as a whole with 'captured' or 'all'
     else:
         results = get_matching_results(glob.stg['pending_path'], glob.args.delResult[0]) +\
                   get_matching_results(glob.stg['captured_path'], glob.args.delResult[0]) +\
                   get_matching_results(glob.stg['failed_path'], glob.args.delResult[0])
+        results = [x for x in results if os.path.isdir(x)]
         if results:
             print("Found " + str(len(results)) + " matching results: ")
             for res in results:
@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+
+# Input asset staging, run by build/bench scripts in the job working directory
+# Each asset is fetched into $BP_REPO once, then copied or extracted into the current directory:
+#   - one downloader per asset across jobs/nodes, via an O_EXCL lock file in the repo with a heartbeat
+#   - HTTP(S) downloads resume from <asset>.part with range requests
+#   - assets are verified against SHA-256 digests from the cfg [files] section, verified digests are kept in <asset>.sha256
+#   - independent assets are fetched in parallel
+#   - archives are extracted once into a read-only cache in the repo, <repo>/.bp_extract/v1/<sha256>, using
+#     pigz/zstd/xz/lbzip2 for parallel decompression where available
+#   - working directories are populated from the repo and extraction cache with links (--link):
+#     auto     hardlink read-only files, otherwise reflink, copy across filesystems
+#     reflink  private copy-on-write copies where the filesystem supports FICLONE, otherwise copy
+#     symlink  symlink farm into the cache, each working directory is recorded as a reference to the asset
+#              and the asset is not evicted while the job using it has not finished
+#     copy     always copy
+#   - files placed are listed in <dest>/.bp_staged, so result bundles leave them out
+# Assets that are not URLs and not in the repo are fetched with gdown, as the 'stage' script did.
+# With --prefetch, assets are only fetched into the repo and their progress written to STATUS as JSON,
+# used by --bench to fill the repo from the login node while jobs wait in the queue.
+# Each use is appended to the repo journal, with --quota least recently used unpinned assets are evicted
+# once the repo exceeds QUOTA bytes. The repo index and eviction are also used by 'benchpro --repo'.
+# Assets added or removed are appended to the change journal, read by benchpro-repo-sync.
+# Journals are appended with single O_APPEND writes, which NFS does not make atomic across clients: concurrent
+# appends from different nodes can lose a line. A lost use line only makes an asset look older, and a lost change
+# line is caught by benchpro-repo-sync from the repo directory mtime or the weekly --full rescan.
+# Usage: staging.py --repo REPO [--jobs N] [--link MODE] [--quota BYTES] [--prefetch STATUS] [--sha256 NAME:DIGEST ...] ASSET [ASSET ...]
+
+# System Imports
+import argparse
+import concurrent.futures
+import fcntl
+import hashlib
+import json
+import os
+import shutil as su
+import socket
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Lock heartbeat and stale lock age (sec)
+heartbeat   = 10
+stale_age   = 300
+chunk_size  = 1 << 20
+retries     = 3
+# Assets used more recently than this (sec) are not evicted, they may be about to be copied
+min_age     = 600
+# Symlink references older than this (sec) are dropped, longer than any job runs
+ref_age     = 7 * 86400
+
+# Repo journal of asset uses ('<epoch> <name>' lines), list of pinned assets
+# and journal of changed assets ('<epoch> <add|del> <name>' lines)
+journal_file = ".bp_journal"
+pins_file    = ".bp_pins"
+changes_file = ".bp_changes"
+# Symlink references ('<asset>.<dest hash>' files holding the working directory) and the job completion
+# marker that ends them, done_marker in global_settings
+refs_dir     = ".bp_refs"
+done_marker  = ".bp_done"
+# Files placed in the working directory, relative paths, left out of result bundles
+staged_file  = ".bp_staged"
+# Extracted archives by archive digest, version changes if the layout does
+extract_dir  = os.path.join(".bp_extract", "v1")
+
+link_modes   = ["auto", "reflink", "symlink", "copy"]
+# ioctl from <linux/fs.h>
+FICLONE      = 0x40049409
+
+# Parallel decompressors by archive magic bytes, first found on PATH is used
+decompressors = [[b"\x1f\x8b",                 [["pigz", "-dc"]]],
+                 [b"\x28\xb5\x2f\xfd",         [["zstd", "-dc", "-T0"]]],
+                 [b"\xfd7zXZ\x00",             [["xz", "-dc", "-T0"]]],
+                 [b"BZh",                      [["lbzip2", "-dc"], ["pbzip2", "-dc"]]]]
+
+def log(message):
+    print("stage: " + message, flush=True)
+
+# Asset name in repo: basename of URL path, otherwise the asset string
+def get_name(asset):
+    if "://" in asset:
+        return os.path.basename(urllib.parse.urlparse(asset).path)
+    return asset
+
+# SHA-256 of file
+def sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Check repo copy against expected digest, digest of a verified file is cached in <file>.sha256
+def verify(path, expected):
+    if not expected:
+        return True
+
+    sidecar = path + ".sha256"
+    try:
+        if os.path.getmtime(sidecar) >= os.path.getmtime(path):
+            with open(sidecar, 'r') as f:
+                if f.read().strip() == expected:
+                    return True
+    except OSError:
+        pass
+
+    # Directories can't be checksummed
+    if os.path.isdir(path):
+        return True
+
+    if sha256(path) != expected:
+        return False
+
+    write_digest(path, expected)
+    return True
+
+def write_digest(path, digest):
+    tmp = path + ".sha256." + str(os.getpid()) + ".tmp"
+    with open(tmp, 'w') as f:
+        f.write(digest + "\n")
+    os.replace(tmp, path + ".sha256")
+
+# Digest of repo file, from <file>.sha256 if written after the file, otherwise computed and cached
+def get_digest(path):
+    try:
+        if os.path.getmtime(path + ".sha256") >= os.path.getmtime(path):
+            with open(path + ".sha256", 'r') as f:
+                return f.read().strip()
+    except OSError:
+        pass
+    digest = sha256(path)
+    write_digest(path, digest)
+    return digest
+
+# Per-asset lock file in repo, held by one downloader
+class asset_lock(object):
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self.last_beat = 0
+
+    # Try take lock, removing it if its holder stopped updating it
+    def acquire(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(self.path) > stale_age:
+                    log("removing stale lock " + self.path)
+                    os.remove(self.path)
+            except OSError:
+                pass
+            return False
+
+        os.write(fd, (socket.gethostname() + " " + str(os.getpid()) + "\n").encode())
+        os.close(fd)
+        self.last_beat = time.time()
+        return True
+
+    # Refresh lock mtime so waiters know download is progressing
+    def beat(self):
+        if time.time() - self.last_beat > heartbeat:
+            os.utime(self.path)
+            self.last_beat = time.time()
+
+    # Refresh lock from background thread during work with no progress callback, set returned event to stop
+    def keep_alive(self):
+        stop = threading.Event()
+        def run():
+            while not stop.wait(heartbeat):
+                try:
+                    os.utime(self.path)
+                except OSError:
+                    return
+        threading.Thread(target=run, daemon=True).start()
+        return stop
+
+    def release(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+# Download URL to part file, resuming from its current size if the server accepts range requests
+def download(url, part, lock):
+
+    offset = os.path.getsize(part) if os.path.isfile(part) else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", "bytes=" + str(offset) + "-")
+
+    try:
+        response = urllib.request.urlopen(request, timeout=60)
+    except urllib.error.HTTPError as e:
+        # Part file already complete
+        if e.code == 416 and offset:
+            return
+        raise
+
+    with response:
+        # Server ignored range, start over
+        if offset and response.status != 206:
+            offset = 0
+        elif offset:
+            log("resuming " + os.path.basename(part) + " at " + str(offset) + " bytes")
+
+        length = response.headers.get("Content-Length")
+        with open(part, 'ab' if offset else 'wb') as f:
+            for chunk in iter(lambda: response.read(chunk_size), b""):
+                f.write(chunk)
+                lock.beat()
+
+            # Dropped connection, keep part file to resume from
+            if length and f.tell() < offset + int(length):
+                raise OSError("connection closed after " + str(f.tell()) + " of " + str(offset + int(length)) + " bytes")
+
+# Fetch asset into repo, holding its lock
+def fetch(asset, path, expected, lock):
+
+    part = path + ".part"
+    for attempt in range(1, retries + 1):
+        try:
+            if "://" in asset:
+                download(asset, part, lock)
+            else:
+                # No progress callback from gdown, keep lock fresh while it runs
+                stop = lock.keep_alive()
+                try:
+                    subprocess.run(["gdown", asset, "-O", part, "--quiet"], check=True)
+                finally:
+                    stop.set()
+        except (OSError, urllib.error.URLError, subprocess.CalledProcessError) as e:
+            log("attempt " + str(attempt) + " for " + asset + " failed: " + str(e))
+            time.sleep(attempt)
+            continue
+
+        if verify(part, expected):
+            os.chmod(part, 0o444)
+            os.replace(part, path)
+            if expected:
+                os.replace(part + ".sha256", path + ".sha256")
+            record_change(os.path.dirname(path), "add", os.path.basename(path))
+            return
+
+        log("checksum mismatch for " + asset + ", discarding download")
+        os.remove(part)
+
+    raise RuntimeError("unable to fetch " + asset + " after " + str(retries) + " attempts")
+
+# Make sure asset is present and verified in repo, returns repo path
+def ensure_in_repo(asset, repo, expected):
+
+    path = os.path.join(repo, get_name(asset))
+    lock = asset_lock(path)
+
+    while True:
+        if os.path.exists(path) and not os.path.exists(lock.path):
+            if verify(path, expected):
+                return path
+            log("repo copy of " + asset + " fails checksum, fetching again")
+            if lock.acquire():
+                os.remove(path)
+                lock.release()
+            continue
+
+        if lock.acquire():
+            try:
+                # Another job may have finished while we waited
+                if not (os.path.exists(path) and verify(path, expected)):
+                    start = time.time()
+                    fetch(asset, path, expected, lock)
+                    log("fetched " + asset + " in " + str(round(time.time() - start, 1)) + "s")
+            finally:
+                lock.release()
+            return path
+
+        # Another job is fetching
+        time.sleep(5)
+
+def read_magic(path):
+    with open(path, 'rb') as f:
+        return f.read(6)
+
+# Tar archive, plain or compressed, Python's tarfile can't read zstd so those are recognized by name
+def is_archive(path):
+    if not os.path.isfile(path):
+        return False
+    if read_magic(path).startswith(b"\x28\xb5\x2f\xfd"):
+        return ".tar" in os.path.basename(path) or path.endswith(".tzst")
+    return tarfile.is_tarfile(path)
+
+# Parallel decompression command for archive, or None
+def get_decompressor(path):
+    magic = read_magic(path)
+    for prefix, cmds in decompressors:
+        if magic.startswith(prefix):
+            for cmd in cmds:
+                if su.which(cmd[0]):
+                    return cmd
+    return None
+
+# Extract archive into empty directory
+def extract(path, dest):
+    tar = su.which("tar")
+    decompressor = get_decompressor(path)
+
+    if tar and decompressor:
+        decomp = subprocess.Popen(decompressor + [path], stdout=subprocess.PIPE)
+        untar = subprocess.run([tar, "-xf", "-", "-C", dest, "--no-same-owner"], stdin=decomp.stdout)
+        decomp.stdout.close()
+        if decomp.wait() or untar.returncode:
+            raise RuntimeError("extracting " + path + " with " + decompressor[0] + " failed")
+    elif tar:
+        subprocess.run([tar, "-xf", path, "-C", dest, "--no-same-owner"], check=True)
+    else:
+        with tarfile.open(path) as archive:
+            if hasattr(tarfile, "data_filter"):
+                archive.extractall(dest, filter="data")
+            else:
+                archive.extractall(dest)
+
+# Remove write permission from tree, cached files are shared by hardlinks
+def make_read_only(root):
+    for parent, dirs, files in os.walk(root, topdown=False):
+        for name in files:
+            path = os.path.join(parent, name)
+            if not os.path.islink(path):
+                os.chmod(path, os.stat(path).st_mode & ~0o222)
+        os.chmod(parent, os.stat(parent).st_mode & ~0o222)
+
+# Path of cached extraction of archive in repo, extracted once under a lock if missing
+def extract_cached(path, repo):
+    root = os.path.join(repo, extract_dir, get_digest(path))
+    lock = asset_lock(root)
+
+    while not os.path.isdir(root):
+        os.makedirs(os.path.dirname(root), exist_ok=True)
+        if not lock.acquire():
+            time.sleep(2)
+            continue
+
+        stop = lock.keep_alive()
+        try:
+            if not os.path.isdir(root):
+                start = time.time()
+                tmp = root + "." + str(os.getpid()) + ".tmp"
+                os.makedirs(tmp)
+                extract(path, tmp)
+                make_read_only(tmp)
+                os.rename(tmp, root)
+                log("extracted " + os.path.basename(path) + " in " + str(round(time.time() - start, 1)) + "s")
+        finally:
+            stop.set()
+            lock.release()
+
+    return root
+
+# Private copy-on-write copy, raises OSError where unsupported
+def reflink(src, dest):
+    with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+# Populate dest file from repo or cache file
+def link_file(src, dest, mode):
+    if os.path.lexists(dest):
+        os.remove(dest)
+
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dest)
+        return
+    if mode == "symlink":
+        os.symlink(src, dest)
+        return
+
+    # Hardlinks share the inode, so only for files that can't be modified through them
+    if mode == "auto" and not os.stat(src).st_mode & 0o222:
+        try:
+            os.link(src, dest)
+            return
+        except OSError:
+            pass
+
+    # Copies are private, so writable
+    if mode in ["auto", "reflink"]:
+        try:
+            reflink(src, dest)
+            os.chmod(dest, os.stat(src).st_mode | 0o200)
+            return
+        except OSError:
+            if os.path.lexists(dest):
+                os.remove(dest)
+
+    su.copyfile(src, dest)
+    os.chmod(dest, os.stat(src).st_mode | 0o200)
+
+# Populate dest directory from repo or cache directory, returns list of paths placed
+def link_tree(src, dest, mode):
+    placed = []
+    for parent, dirs, files in os.walk(src):
+        target = os.path.join(dest, os.path.relpath(parent, src))
+        os.makedirs(target, exist_ok=True)
+        for name in files + [name for name in dirs if os.path.islink(os.path.join(parent, name))]:
+            link_file(os.path.join(parent, name), os.path.join(target, name), mode)
+            placed.append(os.path.join(target, name))
+    return placed
+
+# Populate dest with repo asset, archives from extraction cache, returns list of paths placed
+def place(path, dest, repo, mode):
+    if is_archive(path):
+        return link_tree(extract_cached(path, repo), dest, mode)
+    elif os.path.isdir(path):
+        return link_tree(path, os.path.join(dest, os.path.basename(path)), mode)
+    link_file(path, os.path.join(dest, os.path.basename(path)), mode)
+    return [os.path.join(dest, os.path.basename(path))]
+
+# Record placed files in dest, single O_APPEND write as assets are staged in parallel
+def record_staged(dest, placed):
+    fd = os.open(os.path.join(dest, staged_file), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o664)
+    try:
+        os.write(fd, "".join([os.path.relpath(path, dest) + "\n" for path in placed]).encode())
+    finally:
+        os.close(fd)
+
+# Prefetch progress, written to status file on each change
+class status_file(object):
+    def __init__(self, path, assets):
+        self.path   = path
+        self.lock   = threading.Lock()
+        self.status = {'host':      socket.gethostname(),
+                       'pid':       os.getpid(),
+                       'state':     "running",
+                       'started':   time.time(),
+                       'updated':   time.time(),
+                       'assets':    dict([[get_name(asset), "waiting"] for asset in assets])}
+        self.write()
+
+    def write(self):
+        with open(self.path + ".tmp", 'w') as f:
+            json.dump(self.status, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def set(self, asset, state):
+        with self.lock:
+            self.status['assets'][get_name(asset)] = state
+            self.status['updated'] = time.time()
+            self.write()
+
+    def finish(self, failed):
+        with self.lock:
+            self.status['state'] = "failed" if failed else "done"
+            self.status['updated'] = time.time()
+            self.write()
+
+def prefetch_asset(asset, repo, checksums, status):
+    status.set(asset, "fetching")
+    try:
+        path = ensure_in_repo(asset, repo, checksums.get(get_name(asset)))
+        record_use(repo, get_name(asset))
+        if is_archive(path):
+            status.set(asset, "extracting")
+            extract_cached(path, repo)
+    except Exception:
+        status.set(asset, "failed")
+        raise
+    status.set(asset, "ready")
+
+# Append line to repo journal file, single O_APPEND write so concurrent jobs don't interleave
+def append_line(repo, journal, line):
+    fd = os.open(os.path.join(repo, journal), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o664)
+    try:
+        os.write(fd, (str(int(time.time())) + " " + line + "\n").encode())
+    finally:
+        os.close(fd)
+
+def record_use(repo, name):
+    append_line(repo, journal_file, name)
+
+def record_change(repo, op, name):
+    append_line(repo, changes_file, op + " " + name)
+
+# Repo entries that are assets, not journal, lock, partial download or checksum files
+def is_asset(name):
+    return not name.startswith(".") and not name.endswith((".sha256", ".lock", ".part", ".tmp"))
+
+def get_size(path):
+    if not os.path.isdir(path) or os.path.islink(path):
+        return os.lstat(path).st_size
+    size = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return size
+
+def read_pins(repo):
+    try:
+        with open(os.path.join(repo, pins_file), 'r') as f:
+            return set([line.strip() for line in f if line.strip()])
+    except OSError:
+        return set()
+
+# Last use of each asset from journal
+def read_journal(repo):
+    last_used = {}
+    try:
+        with open(os.path.join(repo, journal_file), 'r') as f:
+            for line in f:
+                fields = line.split(" ", 1)
+                if len(fields) == 2 and fields[0].isdigit():
+                    name = fields[1].rstrip("\n")
+                    last_used[name] = max(last_used.get(name, 0), int(fields[0]))
+    except OSError:
+        pass
+    return last_used
+
+# Record working directory as user of asset, its symlinks point into the repo
+def record_ref(repo, name, dest):
+    os.makedirs(os.path.join(repo, refs_dir), exist_ok=True)
+    ref = os.path.join(repo, refs_dir, name + "." + hashlib.sha1(dest.encode()).hexdigest()[:16])
+    with open(ref, 'w') as f:
+        f.write(dest + "\n")
+
+# Assets symlinked from working directories of unfinished jobs, references of finished jobs are removed
+# A reference ends once its directory has a completion marker or is gone (captured or removed), or after ref_age
+def read_refs(repo):
+    path = os.path.join(repo, refs_dir)
+    try:
+        refs = os.listdir(path)
+    except OSError:
+        return set()
+
+    linked = set()
+    now = time.time()
+    for ref in refs:
+        ref_path = os.path.join(path, ref)
+        try:
+            with open(ref_path, 'r') as f:
+                dest = f.read().strip()
+            age = now - os.path.getmtime(ref_path)
+        except OSError:
+            continue
+
+        if os.path.isdir(dest) and not os.path.exists(os.path.join(dest, done_marker)) and age < ref_age:
+            linked.add(ref.rsplit(".", 1)[0])
+            continue
+        try:
+            os.remove(ref_path)
+        except OSError:
+            pass
+    return linked
+
+# Index of repo assets: name -> size, last use (journal, or mtime if never staged), pinned, being fetched,
+# symlinked from an unfinished job
+def read_index(repo):
+    journal = read_journal(repo)
+    pins    = read_pins(repo)
+    linked  = read_refs(repo)
+    index   = {}
+    for name in os.listdir(repo):
+        if not is_asset(name):
+            continue
+        path = os.path.join(repo, name)
+        extracted = get_extracted(repo, path)
+        try:
+            index[name] = {'size':      get_size(path) + (get_size(extracted) if extracted else 0),
+                           'last_used': max(journal.get(name, 0), int(os.lstat(path).st_mtime)),
+                           'pinned':    name in pins,
+                           'locked':    os.path.exists(path + ".lock"),
+                           'linked':    name in linked}
+        except OSError:
+            continue
+    return index
+
+# Extraction cache of repo file, if any
+def get_extracted(repo, path):
+    try:
+        with open(path + ".sha256", 'r') as f:
+            root = os.path.join(repo, extract_dir, f.read().strip())
+    except OSError:
+        return None
+    return root if os.path.isdir(root) else None
+
+# Remove extracted tree, made writable again first
+def remove_extracted(root):
+    for parent, dirs, files in os.walk(root):
+        os.chmod(parent, os.stat(parent).st_mode | 0o200)
+    su.rmtree(root, ignore_errors=True)
+
+# Remove asset, its checksum file and its extraction from repo
+def remove_asset(repo, name):
+    path = os.path.join(repo, name)
+    extracted = get_extracted(repo, path)
+    if extracted:
+        remove_extracted(extracted)
+    if os.path.isdir(path) and not os.path.islink(path):
+        su.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    try:
+        os.remove(path + ".sha256")
+    except FileNotFoundError:
+        pass
+    record_change(repo, "del", name)
+
+# Remove least recently used unpinned assets until repo is within quota (bytes), returns list of [name, size]
+def evict(repo, quota, keep=(), dry_run=False):
+    index = read_index(repo)
+    total = sum([index[name]['size'] for name in index])
+
+    evicted = []
+    now = time.time()
+    for name in sorted(index, key=lambda name: index[name]['last_used']):
+        if total <= quota:
+            break
+        entry = index[name]
+        if entry['pinned'] or entry['locked'] or entry['linked'] or name in keep or now - entry['last_used'] < min_age:
+            continue
+        if not dry_run:
+            remove_asset(repo, name)
+        total -= entry['size']
+        evicted.append([name, entry['size']])
+
+    return evicted
+
+# Rewrite journal with last use of each remaining asset, temp file swapped in
+def compact_journal(repo, index):
+    tmp = os.path.join(repo, journal_file + "." + str(os.getpid()) + ".tmp")
+    with open(tmp, 'w') as f:
+        for name in sorted(index, key=lambda name: index[name]['last_used']):
+            f.write(str(index[name]['last_used']) + " " + name + "\n")
+    os.replace(tmp, os.path.join(repo, journal_file))
+
+def stage_asset(asset, repo, dest, checksums, mode):
+    path = ensure_in_repo(asset, repo, checksums.get(get_name(asset)))
+    record_use(repo, get_name(asset))
+    if mode == "symlink":
+        record_ref(repo, get_name(asset), os.path.abspath(dest))
+    record_staged(dest, place(path, dest, repo, mode))
+    log("staged " + get_name(asset))
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage input assets via $BP_REPO")
+    parser.add_argument("--repo", required=True)
+    parser.add_argument("--dest", default=os.getcwd())
+    parser.add_argument("--jobs", type=int, default=4)
+    parser.add_argument("--link", choices=link_modes, default="auto")
+    parser.add_argument("--quota", type=int, default=0)
+    parser.add_argument("--prefetch", default=None)
+    parser.add_argument("--sha256", nargs='*', default=[])
+    parser.add_argument("assets", nargs='+')
+    args = parser.parse_args()
+
+    checksums = dict([entry.rsplit(":", 1) for entry in args.sha256])
+    args.repo = os.path.abspath(args.repo)
+    os.makedirs(args.repo, exist_ok=True)
+
+    status = status_file(args.prefetch, args.assets) if args.prefetch else None
+
+    failed = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        if status:
+            futures = {pool.submit(prefetch_asset, asset, args.repo, checksums, status): asset for asset in args.assets}
+        else:
+            futures = {pool.submit(stage_asset, asset, args.repo, args.dest, checksums, args.link): asset for asset in args.assets}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                log("failed to stage " + futures[future] + ": " + str(e))
+                failed += 1
+
+    # Make room for what was just fetched
+    if args.quota:
+        for name, size in evict(args.repo, args.quota, keep=[get_name(asset) for asset in args.assets]):
+            log("evicted " + name + " (" + str(size) + " bytes) from repo")
+
+    if status:
+        status.finish(failed)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
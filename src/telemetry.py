@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+# Lightweight node telemetry sampler, launched in the background by the benchmark script on each node
+# Samples /proc/stat, /proc/meminfo, /proc/net/dev and /proc/diskstats into fixed-width binary records:
+#   <dir>/<host>.bin  - packed little-endian records, no header
+#   <dir>/<host>.json - record layout (NumPy descr), interval and sampler CPU overhead
+# Read with NumPy: np.fromfile(bin_file, dtype=np.dtype([tuple(f) for f in meta['descr']]))
+# Usage: telemetry.py <output_dir> <interval_sec>
+
+# System Imports
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import time
+
+# Record fields, CPU in jiffies, memory in kB, network/disk in bytes
+fields = [['time',          '<f8'],
+          ['cpu_user',      '<u8'],
+          ['cpu_nice',      '<u8'],
+          ['cpu_system',    '<u8'],
+          ['cpu_idle',      '<u8'],
+          ['cpu_iowait',    '<u8'],
+          ['cpu_irq',       '<u8'],
+          ['cpu_softirq',   '<u8'],
+          ['cpu_steal',     '<u8'],
+          ['mem_total',     '<u8'],
+          ['mem_available', '<u8'],
+          ['net_rx',        '<u8'],
+          ['net_tx',        '<u8'],
+          ['disk_read',     '<u8'],
+          ['disk_write',    '<u8']]
+
+record = struct.Struct("<d" + "Q" * (len(fields) - 1))
+names  = [field[0] for field in fields]
+
+# Block devices to count, partitions and virtual devices would double count IO
+def get_disks():
+    try:
+        return set([dev for dev in os.listdir("/sys/block") if not dev.startswith(("loop", "ram", "zram", "dm-", "md"))])
+    except OSError:
+        return set()
+
+# Read whole proc file from open descriptor
+def read_fd(fd):
+    os.lseek(fd, 0, os.SEEK_SET)
+    chunks = []
+    while True:
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+# Take one sample, returns packed record
+def sample(fds, disks):
+
+    # Aggregate CPU line: cpu user nice system idle iowait irq softirq steal ...
+    cpu = read_fd(fds['stat']).split(b"\n", 1)[0].split()[1:9]
+    cpu = [int(val) for val in cpu] + [0] * (8 - len(cpu))
+
+    mem = {}
+    for line in read_fd(fds['meminfo']).split(b"\n"):
+        if line.startswith((b"MemTotal:", b"MemAvailable:")):
+            mem[line.split(b":")[0]] = int(line.split()[1])
+
+    net_rx = net_tx = 0
+    for line in read_fd(fds['net']).split(b"\n")[2:]:
+        if b":" not in line:
+            continue
+        dev, vals = line.split(b":", 1)
+        if dev.strip() == b"lo":
+            continue
+        vals = vals.split()
+        net_rx += int(vals[0])
+        net_tx += int(vals[8])
+
+    # Sectors are 512 bytes regardless of device block size
+    disk_read = disk_write = 0
+    for line in read_fd(fds['disk']).split(b"\n"):
+        vals = line.split()
+        if len(vals) > 9 and vals[2].decode() in disks:
+            disk_read  += int(vals[5]) * 512
+            disk_write += int(vals[9]) * 512
+
+    return record.pack(time.time(), *(cpu + [mem.get(b"MemTotal", 0), mem.get(b"MemAvailable", 0),
+                                             net_rx, net_tx, disk_read, disk_write]))
+
+# Write record layout and sampler overhead
+def write_meta(meta_file, interval, samples, start):
+    cpu_time = sum(os.times()[:2])
+    wall     = max(time.time() - start, 1e-9)
+    with open(meta_file + ".tmp", 'w') as f:
+        json.dump({'descr':         fields,
+                   'record_size':   record.size,
+                   'interval':      interval,
+                   'samples':       samples,
+                   'clk_tck':       os.sysconf("SC_CLK_TCK"),
+                   'cpu_time':      cpu_time,
+                   'overhead_pct':  100. * cpu_time / wall}, f)
+    os.replace(meta_file + ".tmp", meta_file)
+
+# Sample until terminated or the launching job script exits
+def run(output_dir, interval):
+
+    os.makedirs(output_dir, exist_ok=True)
+    host      = socket.gethostname().split(".")[0]
+    bin_file  = os.path.join(output_dir, host + ".bin")
+    meta_file = os.path.join(output_dir, host + ".json")
+
+    # Keep proc files open, each sample is a seek + read
+    fds = {'stat':      os.open("/proc/stat", os.O_RDONLY),
+           'meminfo':   os.open("/proc/meminfo", os.O_RDONLY),
+           'net':       os.open("/proc/net/dev", os.O_RDONLY),
+           'disk':      os.open("/proc/diskstats", os.O_RDONLY)}
+    disks = get_disks()
+
+    # SIGTERM from the job script ends the loop cleanly, it is held pending and taken while waiting between
+    # samples, so the sampler stops at once instead of sleeping out the interval
+    signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGTERM])
+
+    ppid    = os.getppid()
+    start   = time.time()
+    samples = 0
+    write_meta(meta_file, interval, samples, start)
+
+    with open(bin_file, 'ab', buffering=0) as f:
+        while os.getppid() == ppid:
+            f.write(sample(fds, disks))
+            samples += 1
+
+            # Fixed schedule, no drift from sampling time
+            delay = start + samples * interval - time.time()
+            if signal.sigtimedwait([signal.SIGTERM], max(delay, 0)):
+                break
+
+        # Final sample so deltas cover the whole run
+        f.write(sample(fds, disks))
+        samples += 1
+
+    write_meta(meta_file, interval, samples, start)
+
+# Read records from one node file, returns list of dicts
+def read_records(bin_file):
+    with open(bin_file, 'rb') as f:
+        data = f.read()
+    data = data[:len(data) - len(data) % record.size]
+    return [dict(zip(names, vals)) for vals in record.iter_unpack(data)]
+
+# Reduce node records to summary metrics
+def summarize_node(records):
+
+    def busy(rec):
+        return rec['cpu_user'] + rec['cpu_nice'] + rec['cpu_system'] + rec['cpu_irq'] + rec['cpu_softirq'] + rec['cpu_steal']
+
+    def total(rec):
+        return busy(rec) + rec['cpu_idle'] + rec['cpu_iowait']
+
+    first, last = records[0], records[-1]
+    span = total(last) - total(first)
+
+    return {'cpu_util_mean':    100. * (busy(last) - busy(first)) / span if span > 0 else 0.,
+            'mem_peak_kb':      max([rec['mem_total'] - rec['mem_available'] for rec in records]),
+            'net_rx_bytes':     last['net_rx'] - first['net_rx'],
+            'net_tx_bytes':     last['net_tx'] - first['net_tx'],
+            'disk_read_bytes':  last['disk_read'] - first['disk_read'],
+            'disk_write_bytes': last['disk_write'] - first['disk_write']}
+
+# Reduce all node files in telemetry dir to job summary: mean CPU utilization, peak memory, summed IO
+def summarize(output_dir):
+
+    nodes = []
+    if os.path.isdir(output_dir):
+        for bin_file in sorted(os.listdir(output_dir)):
+            if bin_file.endswith(".bin"):
+                records = read_records(os.path.join(output_dir, bin_file))
+                if len(records) > 1:
+                    nodes.append(summarize_node(records))
+
+    if not nodes:
+        return {}
+
+    summary = {'telemetry_nodes':  len(nodes),
+               'cpu_util_mean':    round(sum([node['cpu_util_mean'] for node in nodes]) / len(nodes), 2),
+               'mem_peak_kb':      max([node['mem_peak_kb'] for node in nodes])}
+    for key in ['net_rx_bytes', 'net_tx_bytes', 'disk_read_bytes', 'disk_write_bytes']:
+        summary[key] = sum([node[key] for node in nodes])
+
+    return summary
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: " + sys.argv[0] + " <output_dir> <interval_sec>")
+        sys.exit(1)
+    run(sys.argv[1], float(sys.argv[2]))
@@ -3,20 +3,11 @@
 # System Imports
 import configparser as cp
 import os
-from packaging import version
 import shutil as sh
 import subprocess
 import sys
 import time
 
-db = True
-try:
-    import psycopg2
-    from psycopg2 import sql
-except ImportError:
-    db = False
-    print("No psycopg2 module available, db access will not be available!")
-
 glob = None
 
 # ANSI escape squence for text color
@@ -145,8 +136,18 @@ def check_db_access(glob):
             " from this server")
         return False
 
+# Return True if psycopg2 is available (imported on demand, to keep CLI startup fast)
+def psycopg2_available():
+    try:
+        import psycopg2
+        return True
+    except ImportError:
+        print("No psycopg2 module available, db access will not be available!")
+        return False
+
 # Confirm database connection
 def check_db_connect(glob):
+    import psycopg2
     try:
         conn = psycopg2.connect(
             dbname=glob.stg['db_name'],
@@ -230,7 +231,7 @@ def check_setup(glob_obj):
     connection = check_db_access(glob)
 
     # Check db connection
-    if db and connection:
+    if connection and psycopg2_available():
         check_db_connect(glob)
     else:
         print(bcolors.WARN, "database access check disabled")
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+# Early-abort watchdog, launched in the background by build/bench scripts before the main command
+# Follows the job output files and stops the main command, instead of letting it hold its nodes until the time limit, when:
+#   stalled  no output (or no line matching --heartbeat) for --stall seconds
+#   fatal    a line matches --fatal
+# The reason is written to --reason as key=value lines, then every descendant of the job script except the
+# watchdog and --exclude'd processes (eg. the telemetry sampler) is sent SIGTERM, and SIGKILL after --grace seconds.
+# The job script then carries on to its epilog with the killed command's exit status.
+# Stops on SIGTERM or when the job script exits.
+# Usage: watchdog.py --parent PID --output FILE [--output FILE] --reason FILE [--stall SEC] [--heartbeat REGEX] [--fatal REGEX]
+
+# System Imports
+import argparse
+import os
+import re
+import signal
+import sys
+import time
+
+# Parent PID of each process, from /proc
+def get_parents():
+    parents = {}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(os.path.join("/proc", pid, "stat"), 'r') as f:
+                # Command name may contain spaces, fields after it are fixed
+                parents[int(pid)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return parents
+
+# Descendants of root, skipping the subtrees of excluded PIDs
+def get_descendants(root, exclude):
+    parents = get_parents()
+    children = {}
+    for pid, ppid in parents.items():
+        children.setdefault(ppid, []).append(pid)
+
+    found = []
+    stack = [root]
+    while stack:
+        for pid in children.get(stack.pop(), []):
+            if pid not in exclude:
+                found.append(pid)
+                stack.append(pid)
+    return found
+
+def signal_all(pids, signum):
+    for pid in pids:
+        try:
+            os.kill(pid, signum)
+        except OSError:
+            pass
+
+# Stop main command of job script
+def abort(parent, exclude, grace):
+    targets = get_descendants(parent, exclude)
+    signal_all(targets, signal.SIGTERM)
+
+    deadline = time.time() + grace
+    while time.time() < deadline:
+        targets = [pid for pid in targets if os.path.exists(os.path.join("/proc", str(pid)))]
+        if not targets:
+            return
+        time.sleep(1)
+    signal_all(get_descendants(parent, exclude), signal.SIGKILL)
+
+def write_reason(reason_file, reason, detail):
+    with open(reason_file + ".tmp", 'w') as f:
+        f.write("reason=" + reason + "\n")
+        f.write("detail=" + detail.replace("\n", " ") + "\n")
+        f.write("time=" + str(int(time.time())) + "\n")
+    os.replace(reason_file + ".tmp", reason_file)
+
+# New complete lines of followed file since last read, offsets start at the size when the watchdog started
+def read_lines(path, offsets):
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return []
+
+    offset = offsets.setdefault(path, size)
+    if size < offset:
+        offset = 0
+    if size == offset:
+        return []
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(size - offset)
+
+    # Hold back partial last line, unless it is long enough to be a progress bar
+    end = data.rfind(b"\n") + 1
+    if not end and len(data) < 4096:
+        return []
+    end = end or len(data)
+    offsets[path] = offset + end
+    return data[:end].decode(errors='replace').splitlines()
+
+def run(args):
+    heartbeat = re.compile(args.heartbeat) if args.heartbeat else None
+    fatal     = re.compile(args.fatal) if args.fatal else None
+    exclude   = set([os.getpid()] + args.exclude)
+
+    # SIGTERM is held pending and taken while waiting between checks, so the watchdog stops at once
+    signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGTERM])
+
+    offsets = {}
+    for path in args.output:
+        read_lines(path, offsets)
+
+    last_progress = time.time()
+    while os.getppid() == args.parent:
+        if signal.sigtimedwait([signal.SIGTERM], args.interval):
+            break
+
+        for path in args.output:
+            for line in read_lines(path, offsets):
+                if fatal and fatal.search(line):
+                    write_reason(args.reason, "fatal", line.strip()[:500])
+                    abort(args.parent, exclude, args.grace)
+                    return
+                if not heartbeat or heartbeat.search(line):
+                    last_progress = time.time()
+
+        if args.stall and time.time() - last_progress > args.stall:
+            write_reason(args.reason, "stalled", "no " + ("heartbeat" if heartbeat else "output") + \
+                            " for " + str(int(time.time() - last_progress)) + "s")
+            abort(args.parent, exclude, args.grace)
+            return
+
+def main():
+    parser = argparse.ArgumentParser(description="Abort stalled or failing BenchPRO job steps")
+    parser.add_argument("--parent", type=int, required=True)
+    parser.add_argument("--output", action='append', required=True)
+    parser.add_argument("--reason", required=True)
+    parser.add_argument("--stall", type=float, default=0)
+    parser.add_argument("--heartbeat", default="")
+    parser.add_argument("--fatal", default="")
+    parser.add_argument("--exclude", type=int, action='append', default=[])
+    parser.add_argument("--interval", type=float, default=5)
+    parser.add_argument("--grace", type=float, default=30)
+    run(parser.parse_args())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())